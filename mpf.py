@@ -53,6 +53,10 @@ parser.add_option("-o", "--optimized",
                   action="store_true", dest="optimized", default=False,
                   help="Enables performance optimized game loop")
 
+parser.add_option("-p", "--profile",
+                  action="store_true", dest="profile", default=False,
+                  help="Enables the handler profiler")
+
 parser.add_option("-x", "--nohw",
                   action="store_false", dest="physical_hw", default=True,
                   help="Specifies physical game hardware is not connected")
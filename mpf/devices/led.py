@@ -9,7 +9,7 @@
 import time
 
 from mpf.system.device import Device
-from mpf.system.tasks import Task
+from mpf.system.led_framebuffer import LEDFramebuffer, LEDState
 from mpf.system.utility_functions import Util
 
 
@@ -21,6 +21,9 @@ class LED(Device):
     single element (single color), or three element (RGB), though dual element
     (red/green) and quad-element (RGB + UV) also exist and can be used.
 
+    The color, fade and priority state of all the LEDs is kept in the
+    machine's LEDFramebuffer. Each LED is a view into it via its index.
+
     """
 
     config_section = 'leds'
@@ -31,6 +34,9 @@ class LED(Device):
     def device_class_init(cls, machine):
         machine.validate_machine_config_section('led_settings')
 
+        if not getattr(machine, 'led_framebuffer', None):
+            machine.led_framebuffer = LEDFramebuffer(machine)
+
     def __init__(self, machine, name, config, collection=None, validate=True):
         config['number_str'] = str(config['number']).upper()
         super(LED, self).__init__(machine, name, config, collection,
@@ -42,19 +48,13 @@ class LED(Device):
 
         self.hw_driver = self.platform.configure_led(self.config)
 
-        self.fade_in_progress = False
-        self.fade_task = None
-        self.fade_destination_color = [0.0, 0.0, 0.0]
-        self.fade_end_time = None
+        self.framebuffer = self.machine.led_framebuffer
+        self.index = self.framebuffer.add_led(self)
+        self.hw_fade = self.platform.features.get('hw_led_fade', False)
+        # whether fades are handed to the hardware
 
-        self.state = {  # current state of this LED
-                        'color': [0.0, 0.0, 0.0],
-                        'priority': 0,
-                        'destination_color': [0.0, 0.0, 0.0],
-                        'destination_time': 0.0,
-                        'start_color': [0.0, 0.0, 0.0],
-                        'start_time': 0.0
-                     }
+        # current state of this LED
+        self.state = LEDState(self.framebuffer, self.index)
 
         self.cache = {  # cached state of last manual command
                         'color': [0.0, 0.0, 0.0],
@@ -101,6 +101,11 @@ class LED(Device):
             value.append(1.0)
 
         self.config['brightness_compensation'] = value
+        self.framebuffer.set_compensation(self.index, value)
+
+    @property
+    def fade_in_progress(self):
+        return self.index in self.framebuffer.fading
 
     def color(self, color, fade_ms=None, brightness_compensation=True,
               priority=0, cache=True, force=False, blend=False):
@@ -165,10 +170,10 @@ class LED(Device):
 
         if brightness_compensation:
             color = self.compensate(color)
-
-        # make sure we have a list of three ints
-        color = [int(x) for x in color]
-        color += [0] * (3-len(color))
+        else:
+            # make sure we have a list of three ints
+            color = [int(x) for x in color]
+            color += [0] * (3-len(color))
 
         if fade_ms is None:
             if self.config['fade_ms'] is not None:
@@ -185,24 +190,18 @@ class LED(Device):
                                   "based on this global default fade", fade_ms)
             # potentional optimization make this not conditional
 
-        current_time = time.time()
-
         # update our state
         self.state['priority'] = priority
 
         if fade_ms:
-            self.state['destination_color'] = color
-            self.state['destination_time'] = current_time + (fade_ms / 1000.0)
-            self.state['start_color'] = self.state['color']
-            self.state['start_time'] = current_time
-            self._setup_fade()
+            self.framebuffer.start_fade(self.index, color, fade_ms / 1000.0,
+                                        self.hw_fade)
 
             if self.debug:
-                print "we have a fade to set up"
+                self.log.debug("Fading to color %s over %sms", color, fade_ms)
 
         else:
-            self.hw_driver.color(color)
-            self.state['color'] = color
+            self.framebuffer.set_color(self.index, color)
 
             if self.debug:
                 self.log.debug("Setting Color: %s", color)
@@ -277,82 +276,15 @@ class LED(Device):
         color.
 
         Args:
-            color: a 3-item color list of ints
+            color: a color list of up to 3 ints
 
         Returns:
-            The brightness-compensated 3-item color list of ints
+            A new brightness-compensated 3-item color list of ints
         """
-
-        global_settings = self.machine.config['led_settings']
-
-        color[0] = (int(color[0] *
-                    self.config['brightness_compensation'][0] *
-                    global_settings['brightness_compensation'][0]))
-        color[1] = (int(color[1] *
-                    self.config['brightness_compensation'][1] *
-                    global_settings['brightness_compensation'][1]))
-        color[2] = (int(color[2] *
-                    self.config['brightness_compensation'][2] *
-                    global_settings['brightness_compensation'][2]))
-
-        return color
-
-    def _setup_fade(self):
-        self.fade_in_progress = True
-
-        if not self.fade_task:
-            if self.debug:
-                print "setting up fade task"
-            self.fade_task = Task.create(self._fade_task)
-        elif self.debug:
-                print "already have a fade task"
-
-    def _fade_task(self):
-        while self.fade_in_progress:
-
-            if self.debug:
-                print "fade_in_progress fade_task"
-                print "state", self.state
-
-            state = self.state
-
-            # figure out the ratio of how far along we are
-            ratio = ((time.time() - state['start_time']) /
-                     (state['destination_time'] - state['start_time']))
-
-            new_color = list()
-
-            if self.debug:
-                print "ratio", ratio
-
-            if ratio >= 1.0:  # fade is done
-                self.fade_in_progress = False
-                new_color = state['destination_color']
-
-            else:
-                new_color.append(int(((state['destination_color'][0] - state['start_color'][0]) * ratio) + state['start_color'][0]))
-                new_color.append(int(((state['destination_color'][1] - state['start_color'][1]) * ratio) + state['start_color'][1]))
-                new_color.append(int(((state['destination_color'][2] - state['start_color'][2]) * ratio) + state['start_color'][2]))
-
-            if self.debug:
-                print "new color", new_color
-
-            self.color(color=new_color, fade_ms=0,
-                       brightness_compensation=False,
-                       priority=state['priority'], cache=False)
-
-            yield
-
-        if self.debug:
-            print "fade_in_progress just ended"
-            print "killing fade task"
-
-        self.fade_task = None
-        raise StopIteration()
+        return self.framebuffer.compensate(self.index, color)
 
     def _kill_fade(self):
-        self.fade_in_progress = False
-
+        self.framebuffer.stop_fade(self.index)
 
 
 # The MIT License (MIT)
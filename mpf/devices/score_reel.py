@@ -277,7 +277,7 @@ class ScoreReelGroup(Device):
         self.machine.events.add_handler('init_phase_4',
                                         self.initialize)
 
-        self.machine.events.add_handler('timer_tick', self.tick)
+        self.machine.timing.add_tick_subscriber(self.tick)
 
         # Need to hook this in case reels aren't done when ball ends
         self.machine.events.add_handler('ball_ending', self._ball_ending, 900)
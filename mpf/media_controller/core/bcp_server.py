@@ -20,6 +20,9 @@ import threading
 import time
 import traceback
 
+from mpf.system.bcp_codec import decode_command_string
+from mpf.system.bcp_framing import BCPReceiveBuffer, FRAME_MARKER
+
 
 class BCPServer(threading.Thread):
     """Parent class for the BCP Server thread.
@@ -27,9 +30,9 @@ class BCPServer(threading.Thread):
     Args:
         mc: A reference to the main MediaController instance.
         receiving_queue: A shared Queue() object which holds incoming BCP
-            commands.
-        sending_queue: A shared Queue() object which holds outgoing BCP
-            commands.
+            commands, as lists of decoded (command, kwargs) tuples.
+        sending_queue: A shared FrameMailbox() object which holds outgoing
+            BCP commands and DMD frames.
 
     """
 
@@ -80,6 +83,7 @@ class BCPServer(threading.Thread):
                 self.log.info("Waiting for a connection...")
                 self.mc.events.post('client_disconnected')
                 self.mc.pc_connected = False
+                self.mc.dmd_encoder.reset()
                 self.connection, client_address = self.socket.accept()
 
                 self.log.info("Received connection from: %s:%s",
@@ -89,15 +93,15 @@ class BCPServer(threading.Thread):
                                     port=client_address[1])
                 self.mc.pc_connected = True
 
-                # Receive the data in small chunks and retransmit it
+                # A new buffer for each connection so a partial command from
+                # the last client isn't glued onto the first one of this one
+                receive_buffer = BCPReceiveBuffer()
+
                 while True:
                     try:
-                        data = self.connection.recv(4096)
-                        if data:
-                            commands = data.split("\n")
-                            for cmd in commands:
-                                if cmd:
-                                    self.process_received_message(cmd)
+                        if receive_buffer.recv_into(self.connection):
+                            self.process_received_messages(
+                                receive_buffer.get_messages())
                         else:
                             # no more data
                             break
@@ -118,6 +122,10 @@ class BCPServer(threading.Thread):
         """ Stops and shuts down the BCP server."""
         if not self.done:
             self.log.info("Socket thread stopping.")
+            self.log.info("DMD frames: %(frames_sent)s sent, %(frames_dropped)s "
+                          "dropped. Avg latency %(avg_latency_ms)sms, max "
+                          "latency %(max_latency_ms)sms",
+                          self.sending_queue.get_stats())
             self.sending_queue.put('goodbye')
             time.sleep(1)  # give it a chance to send goodbye before quitting
             self.done = True
@@ -133,11 +141,23 @@ class BCPServer(threading.Thread):
             while not self.done:
                 msg = self.sending_queue.get()
 
-                if not msg.startswith('dmd_frame'):
-                    self.log.debug('Sending "%s"', msg)
+                if type(msg) is tuple:  # raw DMD frame
+                    msg = self.mc.dmd_encoder.encode(msg[1])
+
+                    if not msg:
+                        continue
+
+                if msg.startswith(FRAME_MARKER):
+                    # binary frames carry their own length
+                    data = msg
+                else:
+                    if not msg.startswith('dmd_frame'):
+                        self.log.debug('Sending "%s"', msg)
+
+                    data = msg + '\n'
 
                 try:
-                    self.connection.sendall(msg + '\n')
+                    self.connection.sendall(data)
                 except (AttributeError, socket.error):
                     pass
                     # Do we just keep on trying, waiting until a new client
@@ -154,15 +174,27 @@ class BCPServer(threading.Thread):
             msg = ''.join(line for line in lines)
             self.mc.crash_queue.put(msg)
 
-    def process_received_message(self, message):
-        """Puts a received BCP message into the receiving queue.
+    def process_received_messages(self, messages):
+        """Decodes received BCP messages and puts them into the receiving
+        queue as one list of (command, kwargs) tuples.
 
         Args:
-            message: The incoming BCP message
+            messages: List of (type, data) tuples from
+                BCPReceiveBuffer.get_messages().
 
         """
-        self.log.debug('Received "%s"', message)
-        self.receive_queue.put(message)
+        commands = list()
+
+        for message_type, message in messages:
+            if message_type != 'command':
+                self.log.warning("Received unexpected %s frame", message_type)
+                continue
+
+            self.log.debug('Received "%s"', message)
+            commands.append(decode_command_string(message))
+
+        if commands:
+            self.receive_queue.put(commands)
 
 
 # The MIT License (MIT)
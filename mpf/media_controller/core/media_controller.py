@@ -20,6 +20,7 @@ from mpf.media_controller.core import *
 from mpf.media_controller.core.bcp_server import BCPServer
 from mpf.system.config import Config, CaseInsensitiveDict
 from mpf.system.events import EventManager
+from mpf.system.frame_mailbox import FrameMailbox
 from mpf.system.timing import Timing
 from mpf.system.tasks import Task, DelayManager
 from mpf.system.player import Player
@@ -27,6 +28,7 @@ from mpf.system.assets import AssetManager
 from mpf.system.utility_functions import Util
 from mpf.system.file_manager import FileManager
 import mpf.system.bcp as bcp
+from mpf.system.bcp_framing import DMDFrameEncoder
 import version
 
 
@@ -70,7 +72,7 @@ class MediaController(object):
         self.pygame_allowed_events = list()
         self.socket_thread = None
         self.receive_queue = Queue.Queue()
-        self.sending_queue = Queue.Queue()
+        self.sending_queue = FrameMailbox()
         self.crash_queue = Queue.Queue()
         self.modes = CaseInsensitiveDict()
         self.player_list = list()
@@ -86,6 +88,7 @@ class MediaController(object):
         self._pc_assets_to_load = 0
         self._pc_total_assets = 0
         self.pc_connected = False
+        self.dmd_encoder = DMDFrameEncoder()
 
         Task.create(self._check_crash_queue)
 
@@ -282,8 +285,8 @@ class MediaController(object):
             pygame.init()
             self.pygame = True
 
-            self.events.add_handler('timer_tick', self.get_pygame_events,
-                                    priority=1000)
+            self.timing.add_tick_subscriber(self.get_pygame_events,
+                                            priority=1000)
             self.events.add_handler('timer_tick', self.asset_loading_counter)
 
             self.events.post('pygame_initialized')
@@ -311,7 +314,7 @@ class MediaController(object):
 
     def get_pygame_events(self):
         """Gets (and dispatches) Pygame events. Automatically called every
-        machine loop via the timer_tick event.
+        machine loop as a tick subscriber.
         """
         for event in pygame.event.get():
             if event.type in self.registered_pygame_handlers:
@@ -355,12 +358,17 @@ class MediaController(object):
     def send_dmd_frame(self, data):
         """Sends a DMD frame to the BCP client.
 
+        Frames which are the same as the last one aren't sent, and if the
+        client reads binary frames, frames which changed are sent as deltas.
+
         Args:
             data: A 4096-length raw byte string.
         """
 
-        dmd_string = 'dmd_frame?' + data
-        self.sending_queue.put(dmd_string)
+        # The frame is encoded by the sending thread since deltas have to be
+        # against the last frame that was actually sent, and frames waiting
+        # in the sending queue are dropped when a newer one is put in.
+        self.sending_queue.put_frame('dmd', ('dmd', data))
 
     def _timer_init(self):
         self.HZ = 30
@@ -433,16 +441,23 @@ class MediaController(object):
     def get_from_queue(self):
         """Gets and processes all queued up incoming BCP commands."""
         while not self.receive_queue.empty():
-            cmd, kwargs = bcp.decode_command_string(
-                self.receive_queue.get(False))
-            self._process_command(cmd, **kwargs)
+            for cmd, kwargs in self.receive_queue.get(False):
+                self._process_command(cmd, **kwargs)
 
     def bcp_hello(self, **kwargs):
         """Processes an incoming BCP 'hello' command."""
         try:
             if LooseVersion(kwargs['version']) == (
                     LooseVersion(version.__bcp_version__)):
-                self.send('hello', version=version.__bcp_version__)
+                # only send binary frames if the client said it can read
+                # them, since older clients only understand 'dmd_frame?'
+                if kwargs.get('framing') == 'binary':
+                    self.dmd_encoder.reset(binary=True)
+                    self.send('hello', version=version.__bcp_version__,
+                              framing='binary')
+                else:
+                    self.dmd_encoder.reset()
+                    self.send('hello', version=version.__bcp_version__)
             else:
                 self.send('hello', version='unknown protocol version')
         except KeyError:
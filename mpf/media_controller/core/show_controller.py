@@ -54,7 +54,7 @@ class ShowController(object):
         # regardless of any processing lag.
 
         # register for events
-        self.machine.events.add_handler('timer_tick', self._tick)
+        self.machine.timing.add_tick_subscriber(self._tick)
         self.machine.events.add_handler('init_phase_5',
                                         self._initialize)
 
@@ -470,7 +470,7 @@ class Track(object):
         for track in range(self.config['simultaneous_sounds']):
             self.create_channel(machine, global_channel_list)
 
-        machine.events.add_handler('timer_tick', self._tick)
+        machine.timing.add_tick_subscriber(self._tick)
 
     def __repr__(self):
         return '<Track.{}>'.format(self.name)
@@ -22,7 +22,7 @@ class PlayfieldLights(object):
         self.surface = pygame.Surface((205, 460))  # in tenths of inches
         self.surface.fill((0, 0, 0))
 
-        self.machine.events.add_handler('timer_tick', self.tick)
+        self.machine.timing.add_tick_subscriber(self.tick)
 
     def update(self, surface):
         pa = pygame.PixelArray(surface)
@@ -42,6 +42,10 @@ NET_LATEST_FW = '0.90'
 RGB_LATEST_FW = '0.87'
 IO_LATEST_FW = '0.89'
 
+HEX_BYTES = dict((x, '%02x' % x) for x in range(256))
+# precomputed hex strings of the 0-255 LED color values. It's a dict so
+# values out of that range (including negative ones) raise KeyError.
+
 
 class HardwarePlatform(Platform):
     """Platform class for the FAST hardware controller.
@@ -69,6 +73,7 @@ class HardwarePlatform(Platform):
         self.features['hw_rule_coil_delay'] = True  # todo
         self.features['variable_recycle_time'] = True  # todo
         self.features['variable_debounce_time'] = True  # todo
+        self.features['hw_led_fade'] = True
         # Make the platform features available to everyone
         self.machine.config['platform'] = self.features
         # ----------------------------------------------------------------------
@@ -80,8 +85,18 @@ class HardwarePlatform(Platform):
         self.fast_nodes = list()
         self.connection_threads = set()
         self.receive_queue = Queue.Queue()
+        self.switch_events = list()  # (num, state, debounced, timestamp)
+        self.received_timestamp = None
         self.fast_leds = set()
+        self.dirty_leds = set()
+        self.led_bytes_sent = 0
+        self.led_bytes_per_sec = 0
+        self.led_stats_time = 0
+        self.next_led_refresh = 0
+        self.led_fade_ms = 0  # the last fade rate sent with 'RF:'
         self.flag_led_tick_registered = False
+        self.dirty_lights = dict()  # NET commands: values to send on update
+        self.flag_light_tick_registered = False
         self.fast_io_boards = list()
         self.waiting_for_switch_data = False
 
@@ -92,6 +107,7 @@ class HardwarePlatform(Platform):
                     watchdog: ms|1000
                     default_debounce_open: ms|30
                     default_debounce_close: ms|30
+                    led_refresh: ms|1000
                     debug: boolean|False
                     '''
 
@@ -299,11 +315,18 @@ class HardwarePlatform(Platform):
     def __repr__(self):
         return '<Platform.FAST>'
 
-    def process_received_message(self, msg):
+    def process_received_message(self, msg, timestamp=None):
         """Sends an incoming message from the FAST controller to the proper
         method for servicing.
 
+        Args:
+            msg: The message string.
+            timestamp: Optional time.time() when the message was read from the
+                serial port. The receive methods can get it from
+                self.received_timestamp.
+
         """
+        self.received_timestamp = timestamp
 
         if msg[2:3] == ':':
             cmd = msg[0:2]
@@ -348,24 +371,102 @@ class HardwarePlatform(Platform):
             self.rgb_connection.send('RA:000000')  # turn off all LEDs
 
     def update_leds(self):
-        """Updates all the LEDs connected to a FAST controller. This is done
-        once per game loop for efficiency (i.e. all LEDs are sent as a single
+        """Updates the LEDs connected to a FAST controller. This is done once
+        per game loop for efficiency (i.e. all LEDs are sent as a single
         update rather than lots of individual ones).
 
-        Also, every LED is updated every loop, even if it doesn't change. This
-        is in case some interference causes a LED to change color. Since we
-        update every loop, it will only be the wrong color for one tick.
+        Only the LEDs which changed color since the last update are sent.
+        Every 'led_refresh' ms (from the 'fast:' config section) all the LEDs
+        are sent, even if they didn't change. This is in case some
+        interference causes a LED to change color. A 'led_refresh' of 0 sends
+        every LED every loop. (LEDs which are fading are left out of the
+        refresh until their fade is done.)
+
+        The fade rate of the RGB processor applies to all the RS: commands
+        which follow it, so LEDs are sent in groups by their fade time, with
+        an 'RF:' command in front of each group whose fade time is different
+        from the last one sent.
+
+        The number of bytes per second sent to the RGB processor is written
+        to the 'fast_rgb_bytes_per_sec' machine variable once a second.
 
         """
+        now = time.time()
+        dirty_leds = self.dirty_leds
+
+        if now - self.led_stats_time >= 1.0:
+            self._update_led_stats(now)
+
+        if now >= self.next_led_refresh:
+            self.next_led_refresh = now + self.config['led_refresh'] / 1000.0
+
+            for led in self.fast_leds:
+                if led not in dirty_leds and led.fade_end <= now:
+                    led.fade_ms = 0
+                    dirty_leds.add(led)
+
+        if not dirty_leds:
+            return
+
+        groups = dict()
 
-        msg = 'RS:'
+        for led in dirty_leds:
+            groups.setdefault(led.fade_ms, list()).append(led)
 
-        for led in self.fast_leds:
-            msg += (led.number + led.current_color + ',')  # todo change to join
+        # send the group with the current fade rate first to save an 'RF:'
+        for fade_ms in sorted(groups,
+                              key=lambda x: (x != self.led_fade_ms, x)):
+            if fade_ms != self.led_fade_ms:
+                self._send_led_message('RF:' + format(fade_ms, 'x'))
+                self.led_fade_ms = fade_ms
 
-        msg = msg[:-1]  # trim the final comma
+            self._send_led_message('RS:' + ','.join(
+                [led.number + led.current_color for led in groups[fade_ms]]))
 
+        dirty_leds.clear()
+
+    def update_lights(self):
+        """Sends the matrix light and GI changes to the NET processor. This is
+        done once per game loop, after the light controller's update.
+
+        Each light or GI string gets one command with its latest value, even
+        if it changed several times during the loop, and all the commands
+        are sent as a single serial write.
+
+        """
+        if not self.dirty_lights:
+            return
+
+        self.net_connection.send('\r'.join(
+            [cmd + value for cmd, value in self.dirty_lights.iteritems()]))
+
+        self.dirty_lights.clear()
+
+    def _register_light_tick(self):
+        if not self.flag_light_tick_registered:
+            self.machine.timing.add_tick_subscriber(self.update_lights,
+                                                    priority=0)
+            self.flag_light_tick_registered = True
+
+    def _send_led_message(self, msg):
         self.rgb_connection.send(msg)
+        self.led_bytes_sent += len(msg) + 1  # +1 for the <CR>
+
+    def _update_led_stats(self, now):
+        if not self.led_stats_time:  # first update
+            self.machine.create_machine_var('fast_rgb_bytes_per_sec', 0,
+                                            silent=True)
+            self.led_stats_time = now
+            return
+
+        self.led_bytes_per_sec = int(self.led_bytes_sent /
+                                     (now - self.led_stats_time))
+        self.machine.set_machine_var('fast_rgb_bytes_per_sec',
+                                     self.led_bytes_per_sec)
+        self.log.debug("RGB processor: %s bytes/sec", self.led_bytes_per_sec)
+
+        self.led_bytes_sent = 0
+        self.led_stats_time = now
 
     def get_hw_switch_states(self):
         self.hw_switch_data = None
@@ -404,21 +505,24 @@ class HardwarePlatform(Platform):
     def receive_wd(self, msg):
         pass
 
+    # Switch changes are collected here and sent to the switch controller as
+    # one batch at the end of tick()
+
     def receive_nw_open(self, msg):
-        self.machine.switch_controller.process_switch(state=0,
-                                                      num=(msg, 1))
+        self.switch_events.append(((msg, 1), 0, True,
+                                   self.received_timestamp))
 
     def receive_nw_closed(self, msg):
-        self.machine.switch_controller.process_switch(state=1,
-                                                      num=(msg, 1))
+        self.switch_events.append(((msg, 1), 1, True,
+                                   self.received_timestamp))
 
     def receive_local_open(self, msg):
-        self.machine.switch_controller.process_switch(state=0,
-                                                      num=(msg, 0))
+        self.switch_events.append(((msg, 0), 0, True,
+                                   self.received_timestamp))
 
     def receive_local_closed(self, msg):
-        self.machine.switch_controller.process_switch(state=1,
-                                                      num=(msg, 0))
+        self.switch_events.append(((msg, 0), 1, True,
+                                   self.received_timestamp))
 
     def receive_sa(self, msg):
 
@@ -564,7 +668,7 @@ class HardwarePlatform(Platform):
             sys.exit()
 
         if not self.flag_led_tick_registered:
-            self.machine.events.add_handler('timer_tick', self.update_leds)
+            self.machine.timing.add_tick_subscriber(self.update_leds)
             self.flag_led_tick_registered = True
 
         # if the LED number is in <channel> - <led> format, convert it to a
@@ -581,7 +685,7 @@ class HardwarePlatform(Platform):
         else:
             config['number'] = Util.normalize_hex_string(config['number'])
 
-        this_fast_led = FASTDirectLED(config['number'])
+        this_fast_led = FASTDirectLED(config['number'], self.dirty_leds)
         self.fast_leds.add(this_fast_led)
 
         return this_fast_led
@@ -598,7 +702,9 @@ class HardwarePlatform(Platform):
         if self.machine_type == 'wpc':  # translate switch number to FAST switch
             config['number'] = self.wpc_gi_map.get(config['number_str'].upper())
 
-        return (FASTGIString(config['number'], self.net_connection.send),
+        self._register_light_tick()
+
+        return (FASTGIString(config['number'], self.dirty_lights),
                 config['number'])
 
     def configure_matrixlight(self, config):
@@ -617,7 +723,9 @@ class HardwarePlatform(Platform):
         else:
             config['number'] = Util.normalize_hex_string(config['number'])
 
-        return (FASTMatrixLight(config['number'], self.net_connection.send),
+        self._register_light_tick()
+
+        return (FASTMatrixLight(config['number'], self.dirty_lights),
                 config['number'])
 
     def configure_dmd(self):
@@ -637,7 +745,13 @@ class HardwarePlatform(Platform):
 
     def tick(self):
         while not self.receive_queue.empty():
-            self.process_received_message(self.receive_queue.get(False))
+            self.process_received_message(*self.receive_queue.get(False))
+
+        if self.switch_events:
+            switch_events = self.switch_events
+            self.switch_events = list()
+            self.machine.switch_controller.process_switch_batch(switch_events,
+                                                                platform=self)
 
         self.net_connection.send(self.watchdog_command)
 
@@ -1031,7 +1145,7 @@ class FASTDriver(object):
             self.send(cmd)
 
 class FASTGIString(object):
-    def __init__(self, number, sender):
+    def __init__(self, number, dirty_lights):
         """A FAST GI string in a WPC machine.
 
         TODO: Need to implement the enable_relay and control which strings are
@@ -1039,42 +1153,43 @@ class FASTGIString(object):
         """
         self.log = logging.getLogger('FASTGIString.0x' + str(number))
         self.number = number
-        self.send = sender
+        self.command = 'GI:' + self.number + ','
+        self.dirty_lights = dirty_lights  # commands to send on the next update
 
     def off(self):
         self.log.debug("Turning Off GI String")
-        self.send('GI:' + self.number + ',00')
+        self.dirty_lights[self.command] = '00'
         self.last_time_changed = time.time()
 
     def on(self, brightness=255, fade_ms=0, start=0):
         if brightness >= 255:
             self.log.debug("Turning On GI String")
-            self.send('GI:' + self.number + ',FF')
+            self.dirty_lights[self.command] = 'FF'
         elif brightness == 0:
             self.off()
         else:
-            brightness = str(hex(brightness))[2:]
-            self.send('GI:' + self.number + ',' + brightness)
+            self.dirty_lights[self.command] = str(hex(brightness))[2:]
 
         self.last_time_changed = time.time()
 
 
 class FASTMatrixLight(object):
 
-    def __init__(self, number, sender):
+    def __init__(self, number, dirty_lights):
         self.log = logging.getLogger('FASTMatrixLight')
         self.number = number
-        self.send = sender
+        self.command = 'L1:' + self.number + ','
+        self.dirty_lights = dirty_lights  # commands to send on the next update
 
     def off(self):
         """Disables (turns off) this matrix light."""
-        self.send('L1:' + self.number + ',00')
+        self.dirty_lights[self.command] = '00'
         self.last_time_changed = time.time()
 
     def on(self, brightness=255, fade_ms=0, start=0):
         """Enables (turns on) this driver."""
         if brightness >= 255:
-            self.send('L1:' + self.number + ',FF')
+            self.dirty_lights[self.command] = 'FF'
         elif brightness == 0:
             self.off()
         else:
@@ -1086,11 +1201,14 @@ class FASTMatrixLight(object):
 
 class FASTDirectLED(object):
 
-    def __init__(self, number):
+    def __init__(self, number, dirty_leds):
         self.log = logging.getLogger('FASTLED')
         self.number = number
+        self.dirty_leds = dirty_leds  # set of LEDs to send on the next update
 
         self.current_color = '000000'
+        self.fade_ms = 0
+        self.fade_end = 0
 
         # All FAST LEDs are 3 element RGB
 
@@ -1111,25 +1229,41 @@ class FASTDirectLED(object):
             color: a 3-item list of integers representing R, G, and B values,
             0-255 each.
         """
-
-        self.current_color = self.rgb_to_hex(color)
-        # todo this is crazy inefficient right now. todo change it so it can use
-        # hex strings as the color throughout
+        self._set_color(color, 0)
 
     def fade(self, color, fade_ms):
-        # todo
-        # not yet implemented. For now we'll just immediately set the color
-        self.color(color)
+        """Fades this LED to the color passed. The fade is done by the RGB
+        processor.
+
+        Args:
+            color: a 3-item list of integers representing R, G, and B values,
+            0-255 each.
+            fade_ms: How long the fade should take, in ms.
+        """
+        self._set_color(color, int(fade_ms))
+
+    def _set_color(self, color, fade_ms):
+        try:
+            new_color = (HEX_BYTES[color[0]] + HEX_BYTES[color[1]] +
+                         HEX_BYTES[color[2]])
+        except (KeyError, TypeError):
+            new_color = self.rgb_to_hex([max(0, min(255, int(x)))
+                                         for x in color])
+
+        if new_color != self.current_color:
+            self.current_color = new_color
+            self.fade_ms = fade_ms
+            self.fade_end = time.time() + fade_ms / 1000.0
+            self.dirty_leds.add(self)
 
     def disable(self):
         """Disables (turns off) this LED instantly. For multi-color LEDs it
         turns all elements off.
         """
-
-        self.current_color = '000000'
+        self.color((0, 0, 0))
 
     def enable(self):
-        self.current_color = 'ffffff'
+        self.color((255, 255, 255))
 
 
 class FASTDMD(object):
@@ -1143,7 +1277,7 @@ class FASTDMD(object):
 
         self.dmd_frame = bytearray()
 
-        self.machine.events.add_handler('timer_tick', self.tick)
+        self.machine.timing.add_tick_subscriber(self.tick)
 
     def update(self, data):
 
@@ -1357,11 +1491,15 @@ class SerialCommunicator(object):
                 while self.serial_connection:
                     msg = self.serial_io.readline()[:-1]  # strip the \r
 
+                    # timestamp it here so switch changes have the time they
+                    # came in rather than the time the platform processes them
+                    timestamp = time.time()
+
                     if debug:
                         self.platform.log.info("Received: %s", msg)
 
                     if msg not in self.ignored_messages:
-                        self.receive_queue.put(msg)
+                        self.receive_queue.put((msg, timestamp))
 
             except Exception:
                 exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -11,11 +11,11 @@
 
 import logging
 import socket
-from Queue import Queue
 import threading
 import sys
 import traceback
 
+from mpf.system.frame_mailbox import FrameMailbox
 from mpf.system.platform import Platform
 
 
@@ -90,14 +90,20 @@ class OpenPixelClient(object):
         self.log = logging.getLogger('OpenPixelClient')
 
         self.machine = machine
-        self.dirty = True
+        self.dirty_channels = set()
         self.update_every_tick = False
-        self.sending_queue = Queue()
+        self.sending_queue = FrameMailbox()
         self.sending_thread = None
         self.channels = list()
+        """List of one bytearray per channel which holds the complete OPC
+        message for that channel (the 4-byte header followed by 3 bytes per
+        pixel). Pixel colors are written right into these, and they're passed
+        to the sending thread as-is.
+        """
 
-        self.machine.events.add_handler('timer_tick', self.tick, 1000000)
+        self.machine.timing.add_tick_subscriber(self.tick, 1000000)
         # todo should this be highest priority? Or lowest??
+        self.machine.events.add_handler('shutdown', self._log_stats)
 
         self.sending_thread = OPCThread(self.machine, self.sending_queue,
                                         config)
@@ -117,19 +123,31 @@ class OpenPixelClient(object):
         we make sure we have 19 items on the list before it.
 
         """
-        if len(self.channels) < channel + 1:
-
-            channels_to_add = channel + 1 - len(self.channels)
-
-            self.channels = (
-                self.channels + [list() for i in range(channels_to_add)])
-
-        if len(self.channels[channel]) < led + 1:
-
-            leds_to_add = led + 1 - len(self.channels[channel])
-
-            self.channels[channel] = (
-                self.channels[channel] + [(0, 0, 0) for i in range(leds_to_add)])
+        while len(self.channels) < channel + 1:
+            self.channels.append(self._build_message(len(self.channels), 0))
+
+        frame = self.channels[channel]
+
+        if len(frame) < 4 + (led + 1) * 3:
+            frame.extend(bytearray(4 + (led + 1) * 3 - len(frame)))
+            self._set_header(frame, channel)
+            self.dirty_channels.add(channel)
+
+    def _build_message(self, channel, num_pixels):
+        # Returns a new bytearray of an OPC 'set pixel colors' message for
+        # num_pixels black pixels.
+        frame = bytearray(4 + num_pixels * 3)
+        self._set_header(frame, channel)
+        return frame
+
+    def _set_header(self, frame, channel):
+        # Writes the OPC header (channel, command 0, and the 16-bit length of
+        # the pixel data) to the start of the frame.
+        length = len(frame) - 4
+        frame[0] = channel
+        frame[1] = 0
+        frame[2] = length >> 8
+        frame[3] = length & 0xff
 
     def set_pixel_color(self, channel, pixel, color):
         """Sets an invidual pixel color.
@@ -140,16 +158,32 @@ class OpenPixelClient(object):
             color: 3-item list or tuple of (red, green, blue) color values, each
                 an integer between 0-255.
         """
-        self.channels[channel][pixel] = color
-        self.dirty = True
+        frame = self.channels[channel]
+        offset = 4 + pixel * 3
+
+        try:
+            frame[offset] = color[0]
+            frame[offset + 1] = color[1]
+            frame[offset + 2] = color[2]
+        except (ValueError, TypeError):
+            # out of range or not ints, so clamp them
+            for i in range(3):
+                frame[offset + i] = min(255, max(0, int(color[i])))
+
+        self.dirty_channels.add(channel)
 
     def tick(self):
-        """Called once per machine loop to update the pixels."""
-        if self.update_every_tick or self.dirty:
-            for channel_index, pixel_list in enumerate(self.channels):
-                self.update_pixels(pixel_list, channel_index)
+        """Called once per machine loop to send the channels whose pixels
+        changed (or all the channels if update_every_tick is True)."""
+        if self.update_every_tick:
+            for channel, frame in enumerate(self.channels):
+                self.sending_queue.put_frame(channel, frame)
+
+        elif self.dirty_channels:
+            for channel in self.dirty_channels:
+                self.sending_queue.put_frame(channel, self.channels[channel])
 
-            self.dirty = False
+        self.dirty_channels.clear()
 
     def update_pixels(self, pixels, channel=0):
         """Send the list of pixel colors to the OPC server
@@ -161,28 +195,24 @@ class OpenPixelClient(object):
                 pixel on the channel, the second item is the second one, etc.
             channel: Which OPC channel the pixel data will be written to.
 
-        Returns:
-            True on success. False if it was unable to connect to the OPC
-            server.
-
         Note that you must send color data for all the pixels in a channel (or
         all the pixels up until the point you want. e.g. if you have 30 LEDs on
         the channel and you just want to update LED #10, then you need to send
         pixel data for the first 10 pixels.)
 
+        This builds and sends a new message. It doesn't change the pixel
+        colors that MPF is tracking for the channel.
+
         """
+        frame = self._build_message(channel, len(pixels))
+
+        for offset, (r, g, b) in enumerate(pixels):
+            offset = 4 + offset * 3
+            frame[offset] = min(255, max(0, int(r)))
+            frame[offset + 1] = min(255, max(0, int(g)))
+            frame[offset + 2] = min(255, max(0, int(b)))
 
-        # Build the OPC message
-        len_hi_byte = int(len(pixels)*3 / 256)
-        len_lo_byte = (len(pixels)*3) % 256
-        header = chr(channel) + chr(0) + chr(len_hi_byte) + chr(len_lo_byte)
-        pieces = [header]
-        for r, g, b in pixels:
-            r = min(255, max(0, int(r)))
-            g = min(255, max(0, int(g)))
-            b = min(255, max(0, int(b)))
-            pieces.append(chr(r) + chr(g) + chr(b))
-        self.send(''.join(pieces))
+        self.sending_queue.put_frame(channel, frame)
 
     def send(self, message):
         """Puts a message on the queue to be sent to the OPC server.
@@ -190,16 +220,31 @@ class OpenPixelClient(object):
         Args:
             message: The raw message you want to send. No processing is done on
                 this. It's sent however it comes in.
+
+        Messages sent this way are always delivered in order. Pixel frames
+        are put in the queue with put_frame() instead, which only keeps the
+        newest frame of each channel if the sending thread falls behind.
+
+        Channel frames are passed to the sending thread without being copied,
+        so if a pixel changes before the thread gets to a frame, the frame is
+        sent with that newer pixel color. Since the frame for the next tick
+        would contain it anyway, that's harmless.
         """
         self.sending_queue.put(message)
 
+    def _log_stats(self):
+        self.log.info("OPC frames: %(frames_sent)s sent, %(frames_dropped)s "
+                      "dropped, avg latency %(avg_latency_ms)sms, max latency "
+                      "%(max_latency_ms)sms", self.sending_queue.get_stats())
+
 
 class OPCThread(threading.Thread):
     """Base class for the thread that connects to the OPC server.
 
     Args:
         machine: The main ``MachineController`` instance.
-        queue: The Queue() object that receives OPC messages for the OPC server.
+        queue: The FrameMailbox() object that receives OPC messages for the OPC
+            server.
         config: Dictionary of configuration settings.
 
     The OPC connection is handled in a separate thread so it doesn't bog down
@@ -277,7 +322,7 @@ class OPCThread(threading.Thread):
                     message = self.sending_queue.get()
 
                     try:
-                        self.socket.send(message)
+                        self.socket.sendall(message)
                     except (IOError, AttributeError):
                         self.log.warning('Connection to OPC server lost.')
                         self.socket = None
@@ -286,7 +331,7 @@ class OPCThread(threading.Thread):
                     self.connect()
                     # don't want to build up stale pixel data while we're not
                     # connected
-                    self.sending_queue.queue.clear()
+                    self.sending_queue.clear_frames()
                     self.log.warning('Discarding stale pixel data from the queue.')
 
         except Exception:
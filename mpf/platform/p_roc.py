@@ -131,6 +131,9 @@ class HardwarePlatform(Platform):
             or self.machine_type == pinproc.MachineTypeSternSAM\
             or self.machine_type == pinproc.MachineTypePDB
 
+        self.dirty_lights = dict()  # driver numbers: True for on, False off
+        self.flag_light_tick_registered = False
+
     def __repr__(self):
         return '<Platform.P-ROC>'
 
@@ -170,7 +173,13 @@ class HardwarePlatform(Platform):
         if device_type in ['coil', 'flasher']:
             proc_driver_object = PROCDriver(proc_num, self.proc, config, self.machine)
         elif device_type == 'light':
-            proc_driver_object = PROCMatrixLight(proc_num, self.proc)
+            proc_driver_object = PROCMatrixLight(proc_num, self.proc,
+                                                 self.dirty_lights)
+
+            if not self.flag_light_tick_registered:
+                self.machine.timing.add_tick_subscriber(self.update_lights,
+                                                        priority=0)
+                self.flag_light_tick_registered = True
 
         if 'polarity' in config:
             state = proc_driver_object.proc.driver_get_state(config['number'])
@@ -294,6 +303,28 @@ class HardwarePlatform(Platform):
         """Configures a hardware DMD connected to a classic P-ROC."""
         return PROCDMD(self.proc, self.machine)
 
+    def update_lights(self):
+        """Sends the matrix light and GI changes to the P-ROC. This is done
+        once per game loop, after the light controller's update.
+
+        Each light or GI string gets one driver command with its latest state,
+        even if it changed several times during the loop, and the commands
+        are flushed to the P-ROC together.
+
+        """
+        if not self.dirty_lights:
+            return
+
+        for number, state in self.dirty_lights.iteritems():
+            if state:
+                self.proc.driver_schedule(number=number, schedule=0xffffffff,
+                                          cycle_seconds=0, now=True)
+            else:
+                self.proc.driver_disable(number)
+
+        self.dirty_lights.clear()
+        self.proc.flush()
+
     def tick(self):
         """Checks the P-ROC for any events (switch state changes or notification
         that a DMD frame was updated).
@@ -302,7 +333,14 @@ class HardwarePlatform(Platform):
 
         """
         # Get P-ROC events (switches & DMD frames displayed)
-        for event in self.proc.get_events():
+        switch_events = list()  # (num, state, debounced, timestamp)
+
+        events = self.proc.get_events()
+        # The P-ROC's own event times aren't in the time.time() timebase, so
+        # switch changes are stamped with the time they were read instead
+        timestamp = time.time()
+
+        for event in events:
             event_type = event['type']
             event_value = event['value']
             if event_type == 99:  # CTRL-C to quit todo does this go here?
@@ -310,23 +348,21 @@ class HardwarePlatform(Platform):
             elif event_type == pinproc.EventTypeDMDFrameDisplayed:
                 pass
             elif event_type == pinproc.EventTypeSwitchClosedDebounced:
-                self.machine.switch_controller.process_switch(state=1,
-                                                              num=event_value)
+                switch_events.append((event_value, 1, True, timestamp))
             elif event_type == pinproc.EventTypeSwitchOpenDebounced:
-                self.machine.switch_controller.process_switch(state=0,
-                                                              num=event_value)
+                switch_events.append((event_value, 0, True, timestamp))
             elif event_type == pinproc.EventTypeSwitchClosedNondebounced:
-                self.machine.switch_controller.process_switch(state=1,
-                                                              num=event_value,
-                                                              debounced=False)
+                switch_events.append((event_value, 1, False, timestamp))
             elif event_type == pinproc.EventTypeSwitchOpenNondebounced:
-                self.machine.switch_controller.process_switch(state=0,
-                                                              num=event_value,
-                                                              debounced=False)
+                switch_events.append((event_value, 0, False, timestamp))
             else:
                 self.log.warning("Received unrecognized event from the P-ROC. "
                                  "Type: %s, Value: %s", event_type, event_value)
 
+        if switch_events:
+            self.machine.switch_controller.process_switch_batch(switch_events,
+                                                                platform=self)
+
         self.proc.watchdog_tickle()
         self.proc.flush()
 
@@ -554,9 +590,21 @@ class PDBLED(object):
                             self.normalize_color(color[2]))
 
     def fade(self, color, fade_ms):
-        # todo
-        # not implemented. For now we'll just immediately set the color
-        self.color(color, fade_ms)
+        """Fades this LED to the color passed. The fade is done by the PD-LED
+        board.
+
+        Args:
+            color: a 3-item list of integers representing R, G, and B values,
+            0-255 each.
+            fade_ms: How long the fade should take, in ms.
+        """
+
+        self.proc.led_fade(self.board, self.address[0],
+                           self.normalize_color(color[0]), fade_ms)
+        self.proc.led_fade(self.board, self.address[1],
+                           self.normalize_color(color[1]), fade_ms)
+        self.proc.led_fade(self.board, self.address[2],
+                           self.normalize_color(color[2]), fade_ms)
 
     def disable(self):
         """Disables (turns off) this LED instantly. For multi-color LEDs it
@@ -910,21 +958,21 @@ class PROCDriver(object):
 
 class PROCMatrixLight(object):
 
-    def __init__(self, number, proc_driver):
+    def __init__(self, number, proc_driver, dirty_lights):
         self.log = logging.getLogger('PROCMatrixLight')
         self.number = number
         self.proc = proc_driver
+        self.dirty_lights = dirty_lights  # states to send on the next update
 
     def off(self):
         """Disables (turns off) this driver."""
-        self.proc.driver_disable(self.number)
+        self.dirty_lights[self.number] = False
         self.last_time_changed = time.time()
 
     def on(self, brightness=255, fade_ms=0, start=0):
         """Enables (turns on) this driver."""
         if brightness >= 255:
-            self.proc.driver_schedule(number=self.number, schedule=0xffffffff,
-                                      cycle_seconds=0, now=True)
+            self.dirty_lights[self.number] = True
         elif brightness == 0:
             self.off()
         else:
@@ -1337,7 +1385,7 @@ class PROCDMD(object):
 
             self.proc.dmd_update_config(high_cycles=dmd_timing)
 
-        self.machine.events.add_handler('timer_tick', self.tick)
+        self.machine.timing.add_tick_subscriber(self.tick)
 
     def update(self, data):
         """Updates the DMD with a new frame.
@@ -12,8 +12,8 @@ import serial
 import sys
 import threading
 import traceback
-from Queue import Queue
 from mpf.system.config import Config
+from mpf.system.frame_mailbox import FrameMailbox
 from mpf.system.platform import Platform
 
 
@@ -48,15 +48,17 @@ class HardwarePlatform(Platform):
         if self.config['use_separate_thread']:
             self.update = self.update_separate_thread
 
-            self.queue = Queue()
+            self.queue = FrameMailbox()
+            # only the newest frame is kept if the serial port falls behind
+            self.machine.events.add_handler('shutdown', self._log_stats)
 
             self.dmd_thread = threading.Thread(target=self.dmd_sender_thread)
             self.dmd_thread.daemon = True
             self.dmd_thread.start()
         else:
             self.update = self.update_non_thread
-            self.machine.events.add_handler('timer_tick', self.tick,
-                                            priority=0)  # p0 so this runs last
+            self.machine.timing.add_tick_subscriber(self.tick, priority=0)
+            # p0 so this runs last
 
         return self
 
@@ -67,7 +69,12 @@ class HardwarePlatform(Platform):
             pass
 
     def update_separate_thread(self, data):
-        self.queue.put(bytearray(data))
+        self.queue.put_frame('dmd', bytearray(data))
+
+    def _log_stats(self):
+        self.log.info("DMD frames: %(frames_sent)s sent, %(frames_dropped)s "
+                      "dropped, avg latency %(avg_latency_ms)sms, max latency "
+                      "%(max_latency_ms)sms", self.queue.get_stats())
 
     def tick(self):
         self.serial_port.write(bytearray([0x01]))
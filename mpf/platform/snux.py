@@ -134,7 +134,7 @@ class Snux(object):
         self.machine.timing.add(
             Timer(callback=self.flash_diag_led, frequency=0.5))
 
-        self.machine.events.add_handler('timer_tick', self._tick)
+        self.machine.timing.add_tick_subscriber(self._tick)
 
     def _validate_config(self):
         self.system11_config = self.machine.config_processor.process_config2(
@@ -145,7 +145,7 @@ class Snux(object):
             'snux', snux)
 
     def _tick(self):
-        # Called based on the timer_tick event
+        # Called every tick as a tick subscriber
         if self.a_side_queue:
             self._service_a_side()
         elif self.c_side_queue:
@@ -18,11 +18,14 @@ import socket
 import threading
 import sys
 import traceback
-import urllib
-import urlparse
 from Queue import Queue
 import copy
 
+from mpf.system.bcp_codec import (decode_command_string,
+                                  encode_command_string,
+                                  encode_typed_command_string)
+from mpf.system.bcp_framing import BCPReceiveBuffer, DMDFrameDecoder
+from mpf.system.frame_mailbox import FrameMailbox
 from mpf.system.player import Player
 from mpf.system.utility_functions import Util
 from mpf.devices.shot import Shot
@@ -30,73 +33,6 @@ from mpf.system.light_controller import ExternalShow
 import version
 
 
-def decode_command_string(bcp_string):
-    """Decodes a BCP command string into separate command and paramter parts.
-
-    Args:
-        bcp_string: The incoming UTF-8, URL encoded BCP command string.
-
-    Returns:
-        A tuple of the command string and a dictionary of kwarg pairs.
-
-    Example:
-        Input: trigger?name=hello&foo=Foo%20Bar
-        Output: ('trigger', {'name': 'hello', 'foo': 'Foo Bar'})
-
-    Note that BCP commands and parameter names are not case-sensitive and will
-    be converted to lowercase. Parameter values are case sensitive, and case
-    will be preserved.
-
-    """
-    bcp_command = urlparse.urlsplit(bcp_string)
-    try:
-        kwargs = urlparse.parse_qs(bcp_command.query)
-
-    except AttributeError:
-        kwargs = dict()
-
-    return (bcp_command.path.lower(),
-            dict((k.lower(), urllib.unquote(v[0]))
-                for k,v in kwargs.iteritems()))
-
-
-def encode_command_string(bcp_command, **kwargs):
-    """Encodes a BCP command and kwargs into a valid BCP command string.
-
-    Args:
-        bcp_command: String of the BCP command name.
-        **kwargs: Optional pair(s) of kwargs which will be appended to the
-            command.
-
-    Returns:
-        A string.
-
-    Example:
-        Input: encode_command_string('trigger', {'name': 'hello', 'foo': 'Bar'})
-        Output: trigger?name=hello&foo=Bar
-
-    Note that BCP commands and parameter names are not case-sensitive and will
-    be converted to lowercase. Parameter values are case sensitive, and case
-    will be preserved.
-
-    """
-
-    kwarg_string = ''
-
-    try:
-        for k, v in kwargs.iteritems():
-            kwarg_string += (urllib.quote(k.lower(), '') + '=' +
-                             urllib.quote(str(v), '') + '&')
-
-        kwarg_string = kwarg_string[:-1]
-
-    except (TypeError, AttributeError):
-        pass
-
-    return unicode(urlparse.urlunparse((None, None, bcp_command.lower(), None,
-                                        kwarg_string, None)), 'utf-8')
-
-
 class BCP(object):
     """The parent class for the BCP client.
 
@@ -172,6 +108,22 @@ class BCP(object):
         self.external_show_queue = Queue()
         self.light_controller_connected = False
 
+        # Send ints, floats and bools as typed values. Only for hosts which
+        # decode them, like this version of the media controller.
+        self.typed_values = self.config.get('typed_values', False)
+
+        # Outgoing messages are collected here and sent to the clients in one
+        # batch each tick, or sooner if there are flush_bytes of them.
+        self.outgoing = list()
+        self.outgoing_bytes = 0
+        self.flush_bytes = self.config.get('flush_bytes', 16384)
+
+        # Player variable and score messages which are sent more than once in
+        # a tick can be merged into one with the latest value.
+        self.coalesce_player_vars = self.config.get(
+            'coalesce_player_variables', False)
+        self.coalesced = dict()  # (command, name, player_num): (index, prev)
+
         # Add the following to the set of events that already have mpf mc
         # triggers since these are all posted on the mc side already
         self.mpfmc_trigger_events.add('timer_tick')
@@ -242,7 +194,8 @@ class BCP(object):
 
         self.machine.events.add_handler('init_phase_2',
                                         self._setup_bcp_connections)
-        self.machine.events.add_handler('timer_tick', self.get_bcp_messages)
+        self.machine.timing.add_tick_subscriber(self.get_bcp_messages)
+        self.machine.timing.add_tick_subscriber(self.flush, priority=0)
         self.machine.events.add_handler('player_add_success',
                                         self.bcp_player_added)
         self.machine.events.add_handler('machine_reset_phase_1',
@@ -544,37 +497,98 @@ class BCP(object):
             The BCP command that will be sent will be this:
                 trigger?ball=1&string=hello
 
-        """
+        The message is sent with the rest of this tick's messages when
+        flush() is called.
 
-        bcp_string = encode_command_string(bcp_command, **kwargs)
+        """
 
-        for client in self.bcp_clients:
-            client.send(bcp_string)
+        if self.bcp_clients:
+            if (self.coalesce_player_vars and
+                    bcp_command in ('player_variable', 'player_score')):
+                self._send_coalesced(bcp_command, kwargs)
+            else:
+                self._add_to_outgoing(self._encode(bcp_command, kwargs))
 
         if callback:
             callback()
 
+    def _encode(self, bcp_command, kwargs):
+        if self.typed_values:
+            return encode_typed_command_string(bcp_command, **kwargs)
+        else:
+            return encode_command_string(bcp_command, **kwargs)
+
+    def _add_to_outgoing(self, bcp_string):
+        self.outgoing.append(bcp_string)
+        self.outgoing_bytes += len(bcp_string) + 1
+
+        if self.outgoing_bytes >= self.flush_bytes:
+            self.flush()
+
+    def _send_coalesced(self, bcp_command, kwargs):
+        key = (bcp_command, kwargs.get('name'), kwargs.get('player_num'))
+
+        if key not in self.coalesced:
+            self.coalesced[key] = (len(self.outgoing),
+                                   kwargs.get('prev_value'))
+            self._add_to_outgoing(self._encode(bcp_command, kwargs))
+            return
+
+        # replace the earlier message, keeping its place in line and its
+        # prev_value so the change covers the whole tick
+        index, prev_value = self.coalesced[key]
+        kwargs['prev_value'] = prev_value
+
+        try:
+            kwargs['change'] = kwargs['value'] - prev_value
+        except TypeError:
+            kwargs['change'] = kwargs['value'] != prev_value
+
+        bcp_string = self._encode(bcp_command, kwargs)
+        self.outgoing_bytes += len(bcp_string) - len(self.outgoing[index])
+        self.outgoing[index] = bcp_string
+
+    def flush(self):
+        """Sends the outgoing messages to all the BCP clients as one batch.
+
+        This is called every tick, and from send() when there are more than
+        flush_bytes waiting.
+
+        """
+        if not self.outgoing:
+            return
+
+        batch = '\n'.join(self.outgoing)
+        self.outgoing = list()
+        self.outgoing_bytes = 0
+        self.coalesced.clear()
+
+        for client in self.bcp_clients:
+            client.send(batch)
+
     def get_bcp_messages(self):
         """Retrieves and processes new BCP messages from the receiving queue.
 
         """
         while not self.receive_queue.empty():
-            cmd, kwargs = self.receive_queue.get(False)
+            for cmd, kwargs in self.receive_queue.get(False):
 
-            self.log.debug("Processing command: %s %s", cmd, kwargs)
+                self.log.debug("Processing command: %s %s", cmd, kwargs)
 
-            # todo convert to try. Haven't done it yet though because I couldn't
-            # figure out how to make it not swallow exceptions and it was
-            # getting annoying to troubleshoot
-            if cmd in self.bcp_receive_commands:
-                self.bcp_receive_commands[cmd](**kwargs)
-            else:
-                self.log.warning("Received invalid BCP command: %s", cmd)
-                self.send('error', message='invalid command',
-                          command=cmd)
+                # todo convert to try. Haven't done it yet though because I
+                # couldn't figure out how to make it not swallow exceptions and
+                # it was getting annoying to troubleshoot
+                if cmd in self.bcp_receive_commands:
+                    self.bcp_receive_commands[cmd](**kwargs)
+                else:
+                    self.log.warning("Received invalid BCP command: %s", cmd)
+                    self.send('error', message='invalid command',
+                              command=cmd)
 
     def shutdown(self):
         """Prepares the BCP clients for MPF shutdown."""
+        self.flush()
+
         for client in self.bcp_clients:
             client.stop()
 
@@ -933,7 +947,7 @@ class BCPClientSocket(object):
         name: String name this client.
         config: A dictionary containing the configuration for this client.
         receive_queue: The shared Queue() object that holds incoming BCP
-            messages.
+            messages, as lists of decoded (command, kwargs) tuples.
 
     """
 
@@ -949,13 +963,14 @@ class BCPClientSocket(object):
         self.config = self.machine.config_processor.process_config2(
             'bcp:connections', config, 'bcp:connections')
 
-        self.sending_queue = Queue()
+        self.sending_queue = FrameMailbox()
         self.receive_thread = None
         self.sending_thread = None
         self.socket = None
         self.connection_attempts = 0
         self.attempt_socket_connection = True
         self.send_goodbye = True
+        self.binary_frames = False
 
         self.bcp_commands = {'hello': self.receive_hello,
                              'goodbye': self.receive_goodbye,
@@ -1029,6 +1044,9 @@ class BCPClientSocket(object):
     def stop(self):
         """Stops and shuts down the socket client."""
         self.log.info("Stopping socket client")
+        self.log.info("Sent %(messages_sent)s messages, avg latency "
+                      "%(avg_latency_ms)sms, max latency %(max_latency_ms)sms",
+                      self.sending_queue.get_stats())
 
         if self.socket:
             if self.send_goodbye:
@@ -1042,7 +1060,8 @@ class BCPClientSocket(object):
         """Sends a message to the BCP host.
 
         Args:
-            message: String of the message to send.
+            message: String of the message to send, or of several messages
+                separated by newlines.
 
         """
 
@@ -1059,7 +1078,7 @@ class BCPClientSocket(object):
 
         """
 
-        socket_bytes = ''
+        dmd_byte_length = None
 
         if 'dmd' in self.machine.config:
 
@@ -1081,89 +1100,68 @@ class BCPClientSocket(object):
                            self.machine.config['dmd']['height'],
                            bytes_per_pixel, dmd_byte_length)
 
-            try:
-                while self.socket:
-
-                    socket_bytes += self.get_from_socket()
-
-                    if socket_bytes:
-
-                        while socket_bytes.startswith('dmd_frame'):
-                            # trim the `dmd_frame?` so we have just the data
-                            socket_bytes = socket_bytes[10:]
-
-                            while len(socket_bytes) < dmd_byte_length:
-                                # If we don't have the full data, loop until we
-                                # have it.
-                                socket_bytes += self.get_from_socket()
+        receive_buffer = BCPReceiveBuffer(legacy_frame_length=dmd_byte_length)
+        dmd_decoder = DMDFrameDecoder()
 
-                            # trim the dmd bytes for the dmd data
-                            dmd_data = socket_bytes[:dmd_byte_length]
-                            # Save the rest. This is +1 over the last step
-                            # since we need to skip the \n separator
-                            socket_bytes = socket_bytes[dmd_byte_length+1:]
-                            self.machine.bcp.dmd.update(dmd_data)
+        try:
+            while self.socket:
 
-                        if '\n' in socket_bytes:
-                            message, socket_bytes = socket_bytes.split('\n', 1)
+                if not self.receive_from_socket(receive_buffer):
+                    break
 
-                            self.log.debug('Received "%s"', message)
-                            cmd, kwargs = decode_command_string(message)
+                # everything from one read goes to the main thread together
+                commands = list()
 
-                            if cmd in self.bcp_commands:
-                                self.bcp_commands[cmd](**kwargs)
-                            else:
-                                self.receive_queue.put((cmd, kwargs))
+                for message_type, data in receive_buffer.get_messages():
 
-            except Exception:
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                lines = traceback.format_exception(exc_type, exc_value,
-                                                   exc_traceback)
-                msg = ''.join(line for line in lines)
-                self.machine.crash_queue.put(msg)
+                    if message_type == 'dmd_frame':
+                        data = dmd_decoder.keyframe(data)
+                    elif message_type == 'dmd_delta':
+                        data = dmd_decoder.delta(data)
 
-        else:
-            try:
-                while self.socket:
+                    if message_type in ('dmd_frame', 'dmd_delta'):
+                        if data and self.machine.bcp.dmd:
+                            self.machine.bcp.dmd.update(data)
+                        continue
 
-                    socket_bytes += self.get_from_socket()
+                    self.log.debug('Received "%s"', data)
+                    cmd, kwargs = decode_command_string(data)
 
-                    if socket_bytes and '\n' in socket_bytes:
-                            message, socket_bytes = socket_bytes.split('\n', 1)
+                    if cmd in self.bcp_commands:
+                        self.bcp_commands[cmd](**kwargs)
+                    else:
+                        commands.append((cmd, kwargs))
 
-                            self.log.debug('Received "%s"', message)
-                            cmd, kwargs = decode_command_string(message)
-
-                            if cmd in self.bcp_commands:
-                                self.bcp_commands[cmd](**kwargs)
-                            else:
-                                self.receive_queue.put((cmd, kwargs))
-
-            except Exception:
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                lines = traceback.format_exception(exc_type, exc_value,
-                                                   exc_traceback)
-                msg = ''.join(line for line in lines)
-                self.machine.crash_queue.put(msg)
+                if commands:
+                    self.receive_queue.put(commands)
 
+        except Exception:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            lines = traceback.format_exception(exc_type, exc_value,
+                                               exc_traceback)
+            msg = ''.join(line for line in lines)
+            self.machine.crash_queue.put(msg)
 
-    def get_from_socket(self, num_bytes=8192):
-        """Reads and returns whatever data is sitting in the receiving socket.
+    def receive_from_socket(self, receive_buffer):
+        """Reads whatever data is sitting in the receiving socket into a
+        receive buffer.
 
         Args:
-            num_bytes: Int of the max number of bytes to read.
+            receive_buffer: The BCPReceiveBuffer to read into.
 
         Returns:
-            The data in raw string format.
+            The number of bytes read, or zero if the socket was closed.
 
         """
         try:
-            socket_bytes = self.socket.recv(num_bytes)
+            num_bytes = receive_buffer.recv_into(self.socket)
         except:
+            num_bytes = 0
+
+        if not num_bytes:
             self.socket = None
-            socket_bytes = None
 
-        return socket_bytes
+        return num_bytes
 
     def sending_loop(self):
         """Sending loop which transmits data from the sending queue to the
@@ -1193,6 +1191,11 @@ class BCPClientSocket(object):
         """Processes incoming BCP 'hello' command."""
         self.log.debug('Received BCP Hello from host with kwargs: %s', kwargs)
 
+        # binary frames can always be received, this just logs whether the
+        # host will send them
+        self.binary_frames = kwargs.get('framing') == 'binary'
+        self.log.debug("Host uses binary frames: %s", self.binary_frames)
+
     def receive_goodbye(self):
         """Processes incoming BCP 'goodbye' command."""
         self.send_goodbye = False
@@ -1208,7 +1211,8 @@ class BCPClientSocket(object):
         self.send(encode_command_string('hello',
                                         version=version.__bcp_version__,
                                         controller_name='Mission Pinball Framework',
-                                        controller_version=version.__version__))
+                                        controller_version=version.__version__,
+                                        framing='binary'))
 
     def send_goodbye(self):
         """Sends BCP 'goodbye' command."""
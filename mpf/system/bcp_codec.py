@@ -0,0 +1,246 @@
+"""Encodes and decodes BCP command strings."""
+# bcp_codec.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# The Backbox Control Protocol was conceived and developed by:
+# Quinn Capen
+# Kevin Kelm
+# Gabe Knuth
+# Brian Madden
+# Mike ORourke
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# BCP commands look like URLs without the scheme and host, for example
+# trigger?name=hello&foo=Foo%20Bar. Every parameter name and value is quoted
+# the way urllib.quote(x, '') does it, so only letters, digits and '_.-' are
+# sent as-is. Decoding works like urlparse.parse_qs() and accepts both '&'
+# and ';' between parameters and '+' for spaces.
+#
+# Typed values are sent as <type>:<quoted value>, like int:5 or bool:True.
+# Since a ':' in a string value is always quoted to %3A, a raw ':' can only
+# mean a typed value, so decoding doesn't need to know whether the sender
+# used typed values or not.
+
+import string
+
+_ALWAYS_SAFE = string.ascii_letters + string.digits + '_.-'
+
+_QUOTE = dict((chr(i), chr(i) if chr(i) in _ALWAYS_SAFE else '%{:02X}'.format(i))
+              for i in range(256))
+
+_UNQUOTE = dict((a + b, chr(int(a + b, 16)))
+                for a in string.hexdigits for b in string.hexdigits)
+
+_TYPES = {'int': int,
+          'float': float,
+          'bool': {'True': True, 'False': False}.__getitem__}
+
+
+def _quote(value):
+    if not value.translate(None, _ALWAYS_SAFE):
+        return value
+
+    return ''.join(map(_QUOTE.__getitem__, value))
+
+
+def _unquote(value):
+    if '+' in value:
+        value = value.replace('+', ' ')
+
+    if '%' not in value:
+        return value
+
+    parts = value.split('%')
+
+    for i in xrange(1, len(parts)):
+        part = parts[i]
+
+        try:
+            parts[i] = _UNQUOTE[part[:2]] + part[2:]
+        except KeyError:
+            parts[i] = '%' + part
+
+    return ''.join(parts)
+
+
+def _encode_value(value, typed):
+    value_type = type(value)
+
+    if value_type is str:
+        return _quote(value)
+
+    elif value_type is unicode:
+        return _quote(value.encode('utf-8'))
+
+    elif typed:
+        # bool first, since bools are ints too
+        if value_type is bool:
+            return 'bool:' + str(value)
+        elif value_type is int or value_type is long:
+            return 'int:' + _quote(str(value))
+        elif value_type is float:
+            return 'float:' + _quote(repr(value))
+
+    return _quote(str(value))
+
+
+def _decode_typed_value(value):
+    type_name, _, typed_value = value.partition(':')
+
+    if type_name in _TYPES:
+        try:
+            return _TYPES[type_name](_unquote(typed_value))
+        except (KeyError, ValueError):
+            pass
+
+    return _unquote(value)
+
+
+_quoted_names = dict()  # parameter name: quoted lowercase name + '='
+
+
+def _encode(bcp_command, kwargs, typed):
+    if not kwargs:
+        return bcp_command.lower()
+
+    parts = list()
+
+    for k, v in kwargs.iteritems():
+        try:
+            name = _quoted_names[k]
+        except KeyError:
+            name = _quote(k.lower()) + '='
+
+            if len(_quoted_names) < 1000:
+                _quoted_names[k] = name
+
+        value_type = type(v)
+
+        # strs and ints are by far the most common values, and ints never
+        # need quoting
+        if value_type is str:
+            parts.append(name + _quote(v))
+        elif value_type is int:
+            if typed:
+                parts.append(name + 'int:' + str(v))
+            else:
+                parts.append(name + str(v))
+        else:
+            parts.append(name + _encode_value(v, typed))
+
+    return bcp_command.lower() + '?' + '&'.join(parts)
+
+
+def encode_command_string(bcp_command, **kwargs):
+    """Encodes a BCP command and kwargs into a valid BCP command string.
+
+    Args:
+        bcp_command: String of the BCP command name.
+        **kwargs: Optional pair(s) of kwargs which will be appended to the
+            command.
+
+    Returns:
+        A string.
+
+    Example:
+        Input: encode_command_string('trigger', {'name': 'hello', 'foo': 'Bar'})
+        Output: trigger?name=hello&foo=Bar
+
+    Note that BCP commands and parameter names are not case-sensitive and will
+    be converted to lowercase. Parameter values are case sensitive, and case
+    will be preserved.
+
+    """
+    return _encode(bcp_command, kwargs, False)
+
+
+def encode_typed_command_string(bcp_command, **kwargs):
+    """Encodes a BCP command and kwargs into a valid BCP command string where
+    int, float and bool values keep their type.
+
+    This works like encode_command_string(), except values which are ints,
+    floats or bools are decoded by decode_command_string() as ints, floats
+    or bools instead of strings. Only use it if the receiver uses this
+    version of decode_command_string() or it will get strings like 'int:5'.
+
+    Example:
+        Input: encode_typed_command_string('player_score', value=100)
+        Output: player_score?value=int:100
+
+    """
+    return _encode(bcp_command, kwargs, True)
+
+
+def decode_command_string(bcp_string):
+    """Decodes a BCP command string into separate command and paramter parts.
+
+    Args:
+        bcp_string: The incoming UTF-8, URL encoded BCP command string.
+
+    Returns:
+        A tuple of the command string and a dictionary of kwarg pairs.
+
+    Example:
+        Input: trigger?name=hello&foo=Foo%20Bar
+        Output: ('trigger', {'name': 'hello', 'foo': 'Foo Bar'})
+
+    Note that BCP commands and parameter names are not case-sensitive and will
+    be converted to lowercase. Parameter values are case sensitive, and case
+    will be preserved. Values sent as typed values are returned as ints,
+    floats or bools.
+
+    """
+    if type(bcp_string) is unicode:
+        bcp_string = bcp_string.encode('utf-8')
+
+    bcp_command, _, query = bcp_string.partition('?')
+    kwargs = dict()
+
+    if query:
+        if ';' in query:
+            query = query.replace(';', '&')
+
+        # reversed so the first of any repeated parameters wins
+        for pair in reversed(query.split('&')):
+            key, equals, value = pair.partition('=')
+
+            if not equals:
+                continue
+
+            if ':' in value:
+                value = _decode_typed_value(value)
+            elif '%' in value or '+' in value:
+                value = _unquote(value)
+
+            if '%' in key or '+' in key:
+                key = _unquote(key)
+
+            kwargs[key.lower()] = value
+
+    return bcp_command.lower(), kwargs
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -0,0 +1,390 @@
+"""Binary framing and the receive buffer for BCP connections."""
+# bcp_framing.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# The Backbox Control Protocol was conceived and developed by:
+# Quinn Capen
+# Kevin Kelm
+# Gabe Knuth
+# Brian Madden
+# Mike ORourke
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# BCP is a line-based protocol, but DMD frames are large blocks of raw bytes.
+# By default they're sent as 'dmd_frame?' followed by the raw frame and a
+# newline, which means the receiver has to know the frame length up front.
+#
+# If both sides say "framing=binary" in their 'hello' commands, binary data
+# is sent in length-prefixed frames instead:
+#
+#     \x00 <1 byte frame type> <4 byte big endian payload length> <payload>
+#
+# No BCP command starts with a zero byte so binary frames and text commands
+# can be mixed on the same connection, and the receiver always knows how many
+# bytes to wait for.
+#
+# With binary framing, DMD frames which only change part of the display are
+# sent as DMD_DELTA frames holding just the changed bytes. The payload is a
+# list of runs, each an <4 byte offset> <4 byte length> header followed by the
+# new bytes for that part of the frame. Deltas always apply to the last frame
+# the receiver put together, and a full DMD_FRAME keyframe is sent at least
+# every few frames.
+
+import struct
+import threading
+
+FRAME_MARKER = '\x00'
+FRAME_HEADER = struct.Struct('!cBI')  # marker, frame type, payload length
+
+RUN_HEADER = struct.Struct('!II')  # offset, length
+
+DMD_FRAME = 1
+DMD_DELTA = 2
+FRAME_TYPES = {DMD_FRAME: 'dmd_frame',
+               DMD_DELTA: 'dmd_delta'}
+
+LEGACY_DMD_PREFIX = 'dmd_frame?'
+
+DMD_KEYFRAME_INTERVAL = 30
+DMD_BLOCK_SIZE = 16
+
+
+def encode_frame(frame_type, payload):
+    """Returns a binary BCP frame with a payload.
+
+    Args:
+        frame_type: Integer frame type, like DMD_FRAME.
+        payload: String of the raw bytes to send.
+
+    """
+    return FRAME_HEADER.pack(FRAME_MARKER, frame_type, len(payload)) + payload
+
+
+class BCPReceiveBuffer(object):
+    """Receive buffer for a BCP socket which splits the incoming bytes into
+    BCP commands and binary frames.
+
+    Data is read from the socket with recv_into() straight into a
+    preallocated bytearray, so incoming bytes aren't copied into new strings
+    until a complete command or frame is taken out of the buffer. Commands or
+    frames which are split across several reads stay in the buffer until the
+    rest arrives, and a frame can be anywhere in the buffer, not just at the
+    start of a read.
+
+    Both length-prefixed binary frames and legacy 'dmd_frame?' commands
+    followed by raw frame data are understood. The latter only if
+    legacy_frame_length is set since there's no other way to know where the
+    raw data ends.
+
+    Args:
+        size: Initial size of the buffer in bytes. It grows if a single frame
+            is bigger than this.
+        legacy_frame_length: Optional number of bytes of raw data which follow
+            a 'dmd_frame?' command. Default is None which treats 'dmd_frame?'
+            as a normal command.
+
+    """
+
+    def __init__(self, size=65536, legacy_frame_length=None):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # first byte that hasn't been parsed yet
+        self.end = 0  # end of the received data
+        self.legacy_frame_length = legacy_frame_length
+
+    def recv_into(self, sock):
+        """Reads whatever is waiting in a socket into the buffer.
+
+        Args:
+            sock: The socket to read from.
+
+        Returns:
+            The number of bytes read. Zero means the socket was closed.
+
+        """
+        if self.end == len(self.buffer):
+            self._make_room()
+
+        num_bytes = sock.recv_into(self.view[self.end:])
+        self.end += num_bytes
+        return num_bytes
+
+    def _make_room(self, needed=0):
+        # Moves the unparsed bytes to the start of the buffer, and grows the
+        # buffer if that's still not enough room for the bytes that are
+        # needed (or for at least one more byte)
+        pending = self.end - self.start
+
+        if max(needed, pending + 1) > len(self.buffer):
+            buffer = bytearray(max(len(self.buffer) * 2, needed))
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+
+        elif self.start:
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+
+        self.start = 0
+        self.end = pending
+
+    def get_messages(self):
+        """Returns a list of the complete items in the buffer and removes them
+        from it.
+
+        Each item is a tuple of (type, data). Type is 'command' with data of
+        the string of a BCP command (without the newline), or a frame type
+        name like 'dmd_frame' with data of the string of the frame's raw
+        bytes.
+
+        """
+        messages = list()
+        buffer = self.buffer
+        view = self.view
+        start = self.start
+        end = self.end
+        needed = 0  # bytes needed for an incomplete frame
+
+        while start < end:
+
+            if buffer[start] == 0:  # binary frame
+                if end - start < FRAME_HEADER.size:
+                    break
+
+                _, frame_type, length = FRAME_HEADER.unpack_from(buffer, start)
+                frame_end = start + FRAME_HEADER.size + length
+
+                if frame_end > end:
+                    needed = frame_end - start
+                    break
+
+                messages.append((FRAME_TYPES.get(frame_type, frame_type),
+                                 view[start + FRAME_HEADER.size:
+                                      frame_end].tobytes()))
+                start = frame_end
+                continue
+
+            if self.legacy_frame_length and buffer[start] == 100:  # 'd'
+                prefix_end = min(start + len(LEGACY_DMD_PREFIX), end)
+
+                if (buffer[start:prefix_end] ==
+                        LEGACY_DMD_PREFIX[:prefix_end - start]):
+
+                    if prefix_end - start < len(LEGACY_DMD_PREFIX):
+                        break  # wait for the rest of the prefix
+
+                    # the raw frame is followed by a newline
+                    frame_end = prefix_end + self.legacy_frame_length
+
+                    if frame_end + 1 > end:
+                        needed = frame_end + 1 - start
+                        break
+
+                    messages.append(('dmd_frame',
+                                     view[prefix_end:frame_end].tobytes()))
+                    start = frame_end + 1
+                    continue
+
+            line_end = buffer.find('\n', start, end)
+
+            if line_end == -1:
+                break
+
+            if line_end > start:
+                messages.append(('command', view[start:line_end].tobytes()))
+
+            start = line_end + 1
+
+        if start == end:
+            self.start = self.end = 0
+        else:
+            self.start = start
+
+            if needed > len(self.buffer) - start:
+                self._make_room(needed)
+
+        return messages
+
+
+class DMDFrameEncoder(object):
+    """Turns the DMD frames the media controller renders into the BCP
+    messages that are sent to MPF.
+
+    Frames which are the same as the last one sent are skipped. With binary
+    framing, frames that changed are sent as deltas which only have the
+    blocks of bytes that are different from the last frame. A full keyframe
+    is sent for the first frame, when a delta wouldn't be smaller, and at
+    least every keyframe_interval frames (even if nothing changed) so a
+    receiver which missed something catches up again.
+
+    encode() is called by the sending thread. reset() can be called from any
+    thread since it only asks for a reset which the next encode() does first.
+
+    Args:
+        keyframe_interval: Max number of frames between keyframes.
+        block_size: Number of bytes compared at a time when looking for
+            changes. Smaller blocks make smaller deltas but take longer to
+            find.
+
+    """
+
+    def __init__(self, keyframe_interval=DMD_KEYFRAME_INTERVAL,
+                 block_size=DMD_BLOCK_SIZE):
+        self.keyframe_interval = keyframe_interval
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.reset_request = None  # binary setting of the pending reset
+        self._reset(False)
+
+    def reset(self, binary=False):
+        """Forgets the last frame so the next frame is sent as a keyframe.
+        The reset happens at the start of the next encode() call.
+
+        Args:
+            binary: True if the receiver understands binary frames, False to
+                send legacy 'dmd_frame?' commands.
+
+        """
+        with self.lock:
+            self.reset_request = binary
+
+    def _reset(self, binary):
+        self.binary = binary
+        self.previous = None
+        self.frames_since_keyframe = 0
+
+    def encode(self, data):
+        """Returns the message to send for a DMD frame, or None if nothing
+        needs to be sent.
+
+        Args:
+            data: String of the raw frame data.
+
+        """
+        if self.reset_request is not None:
+            with self.lock:
+                binary = self.reset_request
+                self.reset_request = None
+
+            self._reset(binary)
+
+        previous = self.previous
+        self.frames_since_keyframe += 1
+
+        if (previous is None or len(data) != len(previous) or
+                self.frames_since_keyframe >= self.keyframe_interval):
+            return self._keyframe(data)
+
+        if data == previous:
+            return None
+
+        if not self.binary:
+            return self._keyframe(data)
+
+        delta = self._delta(previous, data)
+
+        if len(delta) >= len(data):
+            return self._keyframe(data)
+
+        self.previous = data
+        return encode_frame(DMD_DELTA, delta)
+
+    def _keyframe(self, data):
+        self.previous = data
+        self.frames_since_keyframe = 0
+
+        if self.binary:
+            return encode_frame(DMD_FRAME, data)
+        else:
+            return LEGACY_DMD_PREFIX + data
+
+    def _delta(self, previous, data):
+        block_size = self.block_size
+        chunk_size = block_size * 16
+        runs = list()
+        run_start = None
+
+        # compare big chunks first and only look for the changed blocks in
+        # the chunks which changed, since most of a frame is usually the same
+        for chunk in xrange(0, len(data), chunk_size):
+            if (data[chunk:chunk + chunk_size] ==
+                    previous[chunk:chunk + chunk_size]):
+                if run_start is not None:
+                    runs.append(RUN_HEADER.pack(run_start, chunk - run_start))
+                    runs.append(data[run_start:chunk])
+                    run_start = None
+                continue
+
+            for offset in xrange(chunk, min(chunk + chunk_size, len(data)),
+                                 block_size):
+                if (data[offset:offset + block_size] !=
+                        previous[offset:offset + block_size]):
+                    if run_start is None:
+                        run_start = offset
+
+                elif run_start is not None:
+                    runs.append(RUN_HEADER.pack(run_start,
+                                                offset - run_start))
+                    runs.append(data[run_start:offset])
+                    run_start = None
+
+        if run_start is not None:
+            runs.append(RUN_HEADER.pack(run_start, len(data) - run_start))
+            runs.append(data[run_start:])
+
+        return ''.join(runs)
+
+
+class DMDFrameDecoder(object):
+    """Puts full DMD frames back together from the keyframes and deltas sent
+    by a DMDFrameEncoder."""
+
+    def __init__(self):
+        self.frame = None
+
+    def keyframe(self, data):
+        """Stores a keyframe and returns it."""
+        self.frame = bytearray(data)
+        return data
+
+    def delta(self, payload):
+        """Applies a delta to the last frame and returns the new frame as a
+        string, or None if no keyframe was received yet."""
+        if self.frame is None:
+            return None
+
+        frame = self.frame
+        offset = 0
+
+        while offset < len(payload):
+            start, length = RUN_HEADER.unpack_from(payload, offset)
+            offset += RUN_HEADER.size
+            frame[start:start + length] = payload[offset:offset + length]
+            offset += length
+
+        return str(frame)
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -8,8 +8,9 @@
 
 import logging
 from collections import deque
+import itertools
 import random
-import uuid
+import time
 
 from mpf.system.utility_functions import Util
 
@@ -20,10 +21,17 @@ class EventManager(object):
         self.log = logging.getLogger("Events")
         self.machine = machine
         self.registered_handlers = {}
+        self.dispatch_table = {}
+        self.handler_keys = {}  # key: event
+        self._next_key = itertools.count(1)
         self.busy = False
         self.event_queue = deque([])
         self.callback_queue = deque([])
+        self.max_event_queue_depth = 0
+        self.max_callback_queue_depth = 0
+        # peak queue depths, reset by LoopMetrics each time it publishes
         self.registered_monitors = set()  # callbacks that get every event
+        self.profiler = None
 
         self.debug = True
 
@@ -71,8 +79,8 @@ class EventManager(object):
                 event-level ones will win.
 
         Returns:
-            A GUID reference to the handler which you can use to later remove
-            the handler via ``remove_handler_by_key``.
+            An integer reference to the handler which you can use to later
+            remove the handler via ``remove_handler_by_key``.
 
         For example:
         ``handler_list.append(events.add_handler('ev', self.test))``
@@ -89,22 +97,27 @@ class EventManager(object):
         if not event in self.registered_handlers:
             self.registered_handlers[event] = []
 
-        key = uuid.uuid4()
+        key = next(self._next_key)
 
         # An event 'handler' in our case is a tuple with 4 elements:
-        # the handler method, priority, dict of kwargs, & uuid key
+        # the handler method, priority, dict of kwargs, & integer key
+
+        # Insert the handler after all the existing handlers with the same or
+        # a higher priority so the list stays sorted without re-sorting it
+        handler_list = self.registered_handlers[event]
+        index = len(handler_list)
+        while index and handler_list[index - 1][1] < priority:
+            index -= 1
+        handler_list.insert(index, (handler, priority, kwargs, key))
+
+        self.handler_keys[key] = event
+        self._compile_event(event)
 
-        self.registered_handlers[event].append((handler, priority, kwargs, key))
         if self.debug:
             self.log.debug("Registered %s as a handler for '%s', priority: %s, "
                            "kwargs: %s",
                            (str(handler).split(' '))[2], event, priority, kwargs)
 
-        # Sort the handlers for this event based on priority. We do it now
-        # so the list is pre-sorted so we don't have to do that with each
-        # event post.
-        self.registered_handlers[event].sort(key=lambda x: x[1], reverse=True)
-
         return key
 
     def add_monitor(self, monitor):
@@ -172,15 +185,10 @@ class EventManager(object):
 
         if event in self.registered_handlers:
             if kwargs:
-            # slice the full list [:] to make a copy so we can delete from the
-            # original while iterating
-                for rh in self.registered_handlers[event][:]:
-                    if rh[0] == handler and rh[2] == kwargs:
-                        self.registered_handlers[event].remove(rh)
+                self._remove_handlers(event, lambda rh: rh[0] == handler and
+                                      rh[2] == kwargs)
             else:
-                for rh in self.registered_handlers[event][:]:
-                    if rh[0] == handler:
-                        self.registered_handlers[event].remove(rh)
+                self._remove_handlers(event, lambda rh: rh[0] == handler)
 
         self.add_handler(event, handler, priority, **kwargs)
 
@@ -192,15 +200,8 @@ class EventManager(object):
             method : The method whose handlers you want to remove.
         """
 
-        for event, handler_list in self.registered_handlers.iteritems():
-            for handler_tup in handler_list[:]:  # copy via slice
-                if handler_tup[0] == method:
-                    handler_list.remove(handler_tup)
-                    if self.debug:
-                        self.log.debug("Removing method %s from event %s",
-                                   (str(method).split(' '))[2], event)
-
-        self._remove_event_if_empty(event)
+        for event in self.registered_handlers.keys():
+            self._remove_handlers(event, lambda rh: rh[0] == method)
 
     def remove_handler_by_event(self, event, handler):
         """Removes the handler you pass from the event you pass.
@@ -219,14 +220,7 @@ class EventManager(object):
         event = event.lower()
 
         if event in self.registered_handlers:
-            for handler_tup in self.registered_handlers[event][:]:
-                if handler_tup[0] == handler:
-                    self.registered_handlers[event].remove(handler_tup)
-                    if self.debug:
-                        self.log.debug("Removing method %s from event %s",
-                                   (str(handler).split(' '))[2], event)
-
-        self._remove_event_if_empty(event)
+            self._remove_handlers(event, lambda rh: rh[0] == handler)
 
     def remove_handler_by_key(self, key):
         """Removes a registered event handler by key.
@@ -235,15 +229,10 @@ class EventManager(object):
             key: The key of the handler you want to remove
         """
 
-        for event, handler_list in self.registered_handlers.iteritems():
-            for handler_tup in handler_list[:]:  # copy via slice
-                if handler_tup[3] == key:
-                    handler_list.remove(handler_tup)
-                    if self.debug:
-                        self.log.debug("Removing method %s from event %s",
-                                   (str(handler_tup[0]).split(' '))[2], event)
+        event = self.handler_keys.get(key)
 
-        self._remove_event_if_empty(event)
+        if event in self.registered_handlers:
+            self._remove_handlers(event, lambda rh: rh[3] == key)
 
     def remove_handlers_by_keys(self, key_list):
         """Removes multiple event handlers based on a passed list of keys
@@ -254,6 +243,27 @@ class EventManager(object):
         for key in key_list:
             self.remove_handler_by_key(key)
 
+    def _remove_handlers(self, event, match):
+        # Removes the handlers for this event which match, then recompiles
+        # the event's dispatch tuple if anything was removed.
+
+        handler_list = self.registered_handlers[event]
+        remaining = [rh for rh in handler_list if not match(rh)]
+
+        if len(remaining) == len(handler_list):
+            return
+
+        for handler_tup in handler_list:
+            if match(handler_tup):
+                del self.handler_keys[handler_tup[3]]
+                if self.debug:
+                    self.log.debug("Removing method %s from event %s",
+                                   (str(handler_tup[0]).split(' '))[2], event)
+
+        handler_list[:] = remaining
+        self._remove_event_if_empty(event)
+        self._compile_event(event)
+
     def _remove_event_if_empty(self, event):
         # Checks to see if the event doesn't have any more registered handlers,
         # removes it if so.
@@ -264,6 +274,19 @@ class EventManager(object):
                     self.log.debug("Removing event %s since there are no more"
                                " handlers registered for it", event)
 
+    def _compile_event(self, event):
+        # Rebuilds the immutable dispatch tuple for this event. Each entry is
+        # (handler method, priority, kwargs), with kwargs set to None if the
+        # handler was registered without any so _process_event can skip the
+        # merge. This is only called when handlers are added or removed.
+
+        if event in self.registered_handlers:
+            self.dispatch_table[event] = tuple(
+                (rh[0], rh[1], rh[2] or None)
+                for rh in self.registered_handlers[event])
+        else:
+            self.dispatch_table.pop(event, None)
+
     def does_event_exist(self, event_name):
         """Checks to see if any handlers are registered for the event name that
         is passed.
@@ -431,6 +454,10 @@ class EventManager(object):
                            friendly_kwargs)
 
         self.event_queue.append((event, ev_type, callback, kwargs))
+
+        if len(self.event_queue) > self.max_event_queue_depth:
+            self.max_event_queue_depth = len(self.event_queue)
+
         if not self.busy:
             # process event queue right away
             self._process_event_queue()
@@ -465,29 +492,44 @@ class EventManager(object):
                     kwargs=kwargs)
 
         # Now let's call the handlers one-by-one, including any kwargs
-        if event in self.registered_handlers:
+        handlers = self.dispatch_table.get(event)
+
+        if handlers:
 
             if ev_type == 'queue' and callback:
                 queue = QueuedEvent(callback, **kwargs)
                 kwargs['queue'] = queue
 
-            for handler in self.registered_handlers[event][:]:
-                # use slice above so we don't process new handlers that came
-                # in while we were processing previous handlers
+            debug = self.debug and event != 'timer_tick'
+            profiler = self.profiler
+
+            # The dispatch tuple is replaced (not modified) when handlers are
+            # added or removed, so new handlers that come in while we're
+            # processing this event won't be called for it
+            for handler, priority, handler_kwargs in handlers:
 
                 # merge the post's kwargs with the registered handler's kwargs
                 # in case of conflict, posts kwargs will win
-                merged_kwargs = dict(handler[2].items() + kwargs.items())
+                if handler_kwargs:
+                    merged_kwargs = handler_kwargs.copy()
+                    merged_kwargs.update(kwargs)
+                else:
+                    merged_kwargs = kwargs
 
                 # log if debug is enabled and this event is not the timer tick
-                if self.debug and event != 'timer_tick':
+                if debug:
                     self.log.debug("%s (priority: %s) responding to event '%s'"
                                    " with args %s",
-                                   (str(handler[0]).split(' '))[2], handler[1],
+                                   (str(handler).split(' '))[2], priority,
                                    event, merged_kwargs)
 
                 # call the handler and save the results
-                result = handler[0](**merged_kwargs)
+                if profiler:
+                    start = time.time()
+                    result = handler(**merged_kwargs)
+                    profiler.record('event', event, handler, start)
+                else:
+                    result = handler(**merged_kwargs)
 
                 # If whatever handler we called returns False, we stop
                 # processing the remaining handlers for boolean or queue events
@@ -497,7 +539,7 @@ class EventManager(object):
                     # add a False result so our callbacl knows something failed
                     kwargs['ev_result'] = False
 
-                    if self.debug and event != 'timer_tick':
+                    if debug:
                         self.log.debug("Aborting future event processing")
 
                     break
@@ -530,6 +572,9 @@ class EventManager(object):
 
             self.callback_queue.append((callback, kwargs))
 
+            if len(self.callback_queue) > self.max_callback_queue_depth:
+                self.max_callback_queue_depth = len(self.callback_queue)
+
     def _process_event_queue(self):
         self.busy = True
         # Internal method which checks to see if there are any other events
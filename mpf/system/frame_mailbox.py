@@ -0,0 +1,162 @@
+"""Contains the FrameMailbox class which passes frames and messages from the
+main thread to a sending thread."""
+# frame_mailbox.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import threading
+import time
+from collections import deque
+
+
+class FrameMailbox(object):
+    """A queue for sending threads where only the newest frame of each channel
+    is kept.
+
+    Frames (DMD frames, LED pixel data, etc.) are put into the mailbox with
+    put_frame(). If a frame for that channel is still waiting to be sent, it's
+    replaced by the new one and counted as dropped, so a slow serial port or
+    socket means fewer frames are sent rather than an ever-growing backlog of
+    stale ones.
+
+    Control messages are put into the mailbox with put(). These are never
+    dropped and are delivered in the order they were put, ahead of any waiting
+    frames.
+
+    get() works like Queue.get() and blocks until there's something to send.
+    The number of frames and messages sent, the number of frames dropped, and
+    the time items waited in the mailbox are tracked and returned by
+    get_stats().
+
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.messages = deque()  # (message, time put)
+        self.frames = dict()  # k: channel, v: (frame, time put)
+        self.frame_order = deque()  # channels with frames, oldest first
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.messages_sent = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def put(self, message):
+        """Adds a control message to the mailbox.
+
+        Args:
+            message: The message. It's returned by get() as-is.
+
+        """
+        with self.condition:
+            self.messages.append((message, time.time()))
+            self.condition.notify()
+
+    def put_frame(self, channel, frame):
+        """Adds a frame to the mailbox, replacing the frame of this channel
+        that's waiting to be sent (if there is one).
+
+        Args:
+            channel: Any hashable which identifies the channel of this frame.
+            frame: The frame. It's returned by get() as-is.
+
+        """
+        with self.condition:
+            if channel in self.frames:
+                # the new frame takes the old one's place in line
+                self.frames_dropped += 1
+            else:
+                self.frame_order.append(channel)
+
+            self.frames[channel] = (frame, time.time())
+            self.condition.notify()
+
+    def get(self, block=True, timeout=None):
+        """Returns the next message or frame to send. Messages are returned
+        before frames.
+
+        Args:
+            block: Boolean which controls whether this method waits until
+                there's something to return. Default is True.
+            timeout: Optional number of seconds to wait for.
+
+        Returns:
+            The next message or frame, or None if there's nothing to return
+            when this method doesn't block or the timeout passes.
+
+        """
+        with self.condition:
+            if block and not self:
+                if timeout is None:
+                    while not self:
+                        self.condition.wait()
+                else:
+                    self.condition.wait(timeout)
+
+            if self.messages:
+                item, put_time = self.messages.popleft()
+                self.messages_sent += 1
+            elif self.frame_order:
+                item, put_time = self.frames.pop(self.frame_order.popleft())
+                self.frames_sent += 1
+            else:
+                return None
+
+            latency = time.time() - put_time
+            self.total_latency += latency
+
+            if latency > self.max_latency:
+                self.max_latency = latency
+
+            return item
+
+    def clear_frames(self):
+        """Drops all the frames that are waiting to be sent. Control messages
+        are kept."""
+        with self.condition:
+            self.frames_dropped += len(self.frames)
+            self.frames.clear()
+            self.frame_order.clear()
+
+    def __len__(self):
+        return len(self.messages) + len(self.frame_order)
+
+    def get_stats(self):
+        """Returns a dictionary of the counters of this mailbox."""
+        with self.condition:
+            count = self.frames_sent + self.messages_sent
+
+            return dict(frames_sent=self.frames_sent,
+                        frames_dropped=self.frames_dropped,
+                        messages_sent=self.messages_sent,
+                        pending=len(self),
+                        avg_latency_ms=round(self.total_latency / count * 1000,
+                                             3) if count else 0.0,
+                        max_latency_ms=round(self.max_latency * 1000, 3))
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
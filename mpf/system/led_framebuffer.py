@@ -0,0 +1,375 @@
+"""Contains the LEDFramebuffer class which holds the colors and fades of all
+the LEDs in a machine in contiguous arrays."""
+# led_framebuffer.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import array
+import logging
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class LEDFramebuffer(object):
+    """Central color buffer for all the LEDs in a machine.
+
+    The current colors, fade start and destination colors and times,
+    priorities and brightness compensation factors of all the LEDs are kept
+    in flat arrays (with three items per LED for the per-channel values)
+    rather than in dicts on each LED. LED devices just hold their index into
+    these arrays.
+
+    Fades are processed for all the fading LEDs at once by a single tick
+    subscriber instead of each LED running its own Task. If NumPy is installed
+    the arrays are NumPy arrays and the fades are vectorized, otherwise they're
+    arrays from the standard library 'array' module. LEDs on platforms with
+    the 'hw_led_fade' feature have their fades done by the hardware instead.
+
+    Args:
+        machine: The MachineController.
+        use_numpy: Optional boolean which forces (if NumPy is installed) or
+            prevents the use of NumPy. Default is to use it if it's installed.
+
+    """
+
+    channel_arrays = ('color', 'start_color', 'destination_color',
+                      'compensation')
+    led_arrays = ('start_time', 'destination_time', 'priority')
+
+    def __init__(self, machine, use_numpy=None):
+        self.log = logging.getLogger('LEDFramebuffer')
+        self.machine = machine
+
+        self.numpy = numpy is not None and use_numpy is not False
+
+        self.leds = list()
+        self.fading = set()  # indexes of the LEDs with fades in progress
+        self.buffers = dict()  # k: array name, v: NumPy array with room to grow
+
+        for name in self.channel_arrays + self.led_arrays:
+            setattr(self, name, self._new_array(0))
+
+        self.log.debug("Using %s arrays",
+                       'NumPy' if self.numpy else 'Python')
+
+        self.machine.timing.add_tick_subscriber(self.update, priority=0)
+
+    def __repr__(self):
+        return '<LEDFramebuffer>'
+
+    def _new_array(self, length, value=0.0):
+        if self.numpy:
+            return numpy.array([value] * length, dtype=numpy.float64)
+        else:
+            return array.array('d', [value] * length)
+
+    def add_led(self, led):
+        """Adds an LED to the buffer and returns its index.
+
+        Args:
+            led: The LED device. Fades call its hw_driver.color() method.
+
+        """
+        index = len(self.leds)
+        self.leds.append(led)
+
+        for name in self.channel_arrays:
+            value = 1.0 if name == 'compensation' else 0.0
+            self._extend(name, 3, value)
+
+        for name in self.led_arrays:
+            self._extend(name, 1, 0.0)
+
+        return index
+
+    def _extend(self, name, length, value):
+        if self.numpy:
+            # NumPy arrays can't grow in place, so each array is a view of a
+            # bigger buffer which is reallocated at double the size when it's
+            # full. Otherwise adding n LEDs would copy the arrays n times.
+            current = getattr(self, name)
+            old_size = len(current)
+            size = old_size + length
+            buffer = self.buffers.get(name)
+
+            if buffer is None or size > len(buffer):
+                buffer = numpy.empty(max(size, 2 * old_size),
+                                     dtype=numpy.float64)
+                buffer[:old_size] = current
+                self.buffers[name] = buffer
+
+            buffer[old_size:size] = value
+            setattr(self, name, buffer[:size])
+        else:
+            getattr(self, name).extend([value] * length)
+
+    def get_channels(self, name, index):
+        """Returns a list of the three channel values of an LED from one of the
+        per-channel arrays.
+
+        Args:
+            name: String name of the array, like 'color'.
+            index: The index of the LED.
+
+        """
+        start = index * 3
+        return [int(x) for x in getattr(self, name)[start:start + 3]]
+
+    def set_channels(self, name, index, values):
+        """Sets the three channel values of an LED in one of the per-channel
+        arrays.
+
+        Args:
+            name: String name of the array, like 'color'.
+            index: The index of the LED.
+            values: A list or tuple of three numbers.
+
+        """
+        start = index * 3
+        getattr(self, name)[start:start + 3] = self._new_channels(values)
+
+    def _new_channels(self, values):
+        if self.numpy:
+            return values
+        else:
+            return array.array('d', values)
+
+    def set_compensation(self, index, values):
+        """Sets the brightness compensation factors of an LED.
+
+        Args:
+            index: The index of the LED.
+            values: A list of three floats, which are multiplied by the global
+                brightness_compensation from the 'led_settings:' section.
+
+        """
+        global_values = (self.machine.config['led_settings']
+                         ['brightness_compensation'])
+
+        self.set_channels('compensation', index,
+                          [x * y for x, y in zip(values, global_values)])
+
+    def compensate(self, index, color):
+        """Returns a new list of the color with the brightness compensation of
+        an LED applied.
+
+        Args:
+            index: The index of the LED.
+            color: A list of up to three numbers. Missing items are zeros.
+
+        """
+        start = index * 3
+        compensation = self.compensation[start:start + 3]
+
+        return [int(color[i] * compensation[i]) if i < len(color) else 0
+                for i in range(3)]
+
+    def set_color(self, index, color):
+        """Sets an LED to a color right away, cancelling any fade that's in
+        progress.
+
+        Args:
+            index: The index of the LED.
+            color: A list of three ints.
+
+        """
+        self.fading.discard(index)
+        self.set_channels('color', index, color)
+        self.leds[index].hw_driver.color(color)
+
+    def start_fade(self, index, color, fade_secs, hardware=False):
+        """Starts fading an LED from its current color to a new color.
+
+        Args:
+            index: The index of the LED.
+            color: A list of three ints of the destination color.
+            fade_secs: How long the fade takes, in seconds.
+            hardware: Boolean which hands the fade to the LED's hardware via
+                its hw_driver.fade() method. In that case the LED's color in
+                the buffer is set to the destination color right away.
+                Otherwise the LED is updated on each tick until the fade is
+                done.
+
+        """
+        now = time.time()
+        start = index * 3
+
+        self.start_color[start:start + 3] = self.color[start:start + 3]
+        self.set_channels('destination_color', index, color)
+        self.start_time[index] = now
+        self.destination_time[index] = now + fade_secs
+
+        if hardware:
+            self.fading.discard(index)
+            self.set_channels('color', index, color)
+            self.leds[index].hw_driver.fade(color, int(fade_secs * 1000))
+        else:
+            self.fading.add(index)
+
+    def stop_fade(self, index):
+        """Stops the fade of an LED. It stays at its current color.
+
+        Args:
+            index: The index of the LED.
+
+        """
+        self.fading.discard(index)
+
+    def update(self):
+        """Processes the fades of all the fading LEDs. Called every tick."""
+        if not self.fading:
+            return
+
+        if self.numpy:
+            self._update_numpy()
+        else:
+            self._update_array()
+
+    def _update_array(self):
+        now = time.time()
+        done = list()
+
+        start_color = self.start_color
+        destination_color = self.destination_color
+
+        for index in self.fading:
+            start_time = self.start_time[index]
+            duration = self.destination_time[index] - start_time
+
+            if duration > 0:
+                ratio = (now - start_time) / duration
+            else:
+                ratio = 1.0
+
+            start = index * 3
+
+            if ratio >= 1.0:
+                done.append(index)
+                new_color = [int(x) for x in
+                             destination_color[start:start + 3]]
+            else:
+                new_color = [
+                    int((destination_color[i] - start_color[i]) * ratio +
+                        start_color[i]) for i in range(start, start + 3)]
+
+            self._apply(index, new_color)
+
+        self.fading.difference_update(done)
+
+    def _update_numpy(self):
+        now = time.time()
+        indexes = numpy.fromiter(self.fading, dtype=numpy.int64,
+                                 count=len(self.fading))
+
+        start_time = self.start_time[indexes]
+        duration = self.destination_time[indexes] - start_time
+        ratio = numpy.ones(len(indexes))
+        running = duration > 0
+        ratio[running] = (now - start_time[running]) / duration[running]
+        ratio = numpy.clip(ratio, 0.0, 1.0)
+
+        channels = (indexes * 3)[:, None] + numpy.arange(3)
+        start_color = self.start_color[channels]
+        new_colors = (start_color + (self.destination_color[channels] -
+                                     start_color) * ratio[:, None])
+        new_colors = new_colors.astype(numpy.int64)
+
+        changed = (new_colors != self.color[channels]).any(axis=1)
+
+        for index, new_color in zip(indexes[changed], new_colors[changed]):
+            self._apply(int(index), new_color.tolist())
+
+        self.fading.difference_update(indexes[ratio >= 1.0].tolist())
+
+    def _apply(self, index, color):
+        start = index * 3
+
+        if self.get_channels('color', index) != color:
+            self.color[start:start + 3] = self._new_channels(color)
+            self.leds[index].hw_driver.color(color)
+
+
+class LEDState(object):
+    """Dictionary-like view of the state of one LED in the LEDFramebuffer.
+
+    This is what an LED's 'state' attribute is, so the existing
+    led.state['color'], led.state['priority'], etc. still work.
+
+    """
+
+    channel_keys = ('color', 'destination_color', 'start_color')
+    time_keys = ('start_time', 'destination_time')
+
+    def __init__(self, framebuffer, index):
+        self.framebuffer = framebuffer
+        self.index = index
+
+    def __getitem__(self, key):
+        if key in self.channel_keys:
+            return self.framebuffer.get_channels(key, self.index)
+        elif key == 'priority':
+            return int(self.framebuffer.priority[self.index])
+        elif key in self.time_keys:
+            return float(getattr(self.framebuffer, key)[self.index])
+        else:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.channel_keys:
+            self.framebuffer.set_channels(key, self.index, value)
+        elif key == 'priority' or key in self.time_keys:
+            getattr(self.framebuffer, key)[self.index] = value
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return ['color', 'priority', 'destination_color', 'destination_time',
+                'start_color', 'start_time']
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -7,12 +7,17 @@
 # Documentation and more info at http://missionpinball.com/mpf
 
 
+import heapq
+import itertools
 import logging
 import time
 
 from mpf.system.assets import Asset, AssetManager
 from mpf.system.config import Config, CaseInsensitiveDict
 from mpf.system.file_manager import FileManager
+from mpf.system.show_baker import BakedShow
+from mpf.system.show_compiler import (ShowCache, ShowCompiler, TOCKS, LIGHTS,
+                                      LEDS)
 from mpf.system.timing import Timing
 from mpf.system.utility_functions import Util
 
@@ -31,6 +36,7 @@ class LightController(object):
     def __init__(self, machine):
         self.log = logging.getLogger("LightController")
         self.machine = machine
+        self.profiler = None
 
         self.light_queue = []
         self.led_queue = []
@@ -41,17 +47,53 @@ class LightController(object):
 
         self.registered_light_scripts = CaseInsensitiveDict()
 
-        self.light_update_list = []
-        self.led_update_list = []
+        self.show_cache = ShowCache(machine)
+
+        self.machine.validate_machine_config_section('light_controller')
+        self.config = self.machine.config['light_controller']
+
+        self.baked_bytes = 0
+        """Total bytes of frames of all the baked shows. Limited by the
+        light_controller: bake_max_kb setting."""
+
+        self.light_stacks = dict()
+        self.led_stacks = dict()
+        """Dicts of the priority stacks of the lights and LEDs that shows are
+        currently setting. Keys are the light or LED objects, values are lists
+        of [priority, source, value, fade_ms, blend] layers (one per show),
+        highest priority first. The top layer is what's visible.
+        """
+
+        self.dirty_lights = dict()
+        self.dirty_leds = dict()
+        """Dicts of the lights and LEDs whose top layer changed since the last
+        update. Values are None, or the priority of the layer that was removed
+        if the top layer was removed (which is used to decide whether the
+        light goes back to its cached manual setting).
+        """
+
+        self.running_shows = dict()
+        """Dict of the shows that are running. Keys are the show objects,
+        values are their current entries in show_schedule.
+        """
+
+        self.show_schedule = []
+        """Heap of (next_action_tick, priority, sequence, show) entries of the
+        running shows, so _tick() only has to look at the shows that step on
+        the current tick. Entries of shows that were stopped or rescheduled
+        are left in the heap and skipped when they come up.
+        """
+
+        self._schedule_sequence = itertools.count()
 
-        self.running_shows = []
         self.registered_tick_handlers = set()
 
         self.initialized = False
 
         self.queue = []
-        """A list of dicts which contains things that need to be serviced in the
-        future, including: (ot all are always used)
+        """A heap of (action_time, sequence, item) entries where each item is a
+        dict which contains things that need to be serviced in the future,
+        including: (ot all are always used)
             * lightname
             * priority
             * blend
@@ -78,7 +120,7 @@ class LightController(object):
         """
 
         # register for events
-        self.machine.events.add_handler('timer_tick', self._tick)
+        self.machine.timing.add_tick_subscriber(self._tick)
         self.machine.events.add_handler('init_phase_5',
                                         self._initialize)
 
@@ -358,16 +400,70 @@ class LightController(object):
         if show.sync_ms:
             show.next_action_tick = self.sync_ms_next_tick(show.sync_ms)
 
-        self.running_shows.append(show)
-        self.running_shows.sort(key=lambda x: x.priority)
+        self._schedule_show(show)
+
+    def _schedule_show(self, show):
+        # Adds a running show to the schedule at its next action tick. Shows
+        # with the same next action tick are advanced in priority order.
+        entry = (show.next_action_tick, show.priority,
+                 next(self._schedule_sequence), show)
+        self.running_shows[show] = entry
+        heapq.heappush(self.show_schedule, entry)
+
+    def _get_baked_show(self, show, tocks_per_sec):
+        # Returns the BakedShow of a show at a playback rate, baking it if
+        # needed, or None if the show has to be played live.
+        try:
+            return show.baked_shows[tocks_per_sec]
+        except KeyError:
+            pass
+
+        reason = BakedShow.can_bake(show)
+
+        if not reason:
+            size = BakedShow.count_bytes(show, tocks_per_sec, Timing.HZ)
+
+            if self.baked_bytes + size > self.config['bake_max_kb'] * 1024:
+                reason = ('its {} KB of frames would go over bake_max_kb '
+                          '({} KB already used)'.format(
+                              size / 1024, self.baked_bytes / 1024))
+
+        if reason:
+            self.log.debug("Playing show %s live instead of baked since %s",
+                           show.file_name, reason)
+            return None
+
+        baked = BakedShow(show, tocks_per_sec, Timing.HZ)
+        show.baked_shows[tocks_per_sec] = baked
+        self.baked_bytes += baked.bytes
+
+        self.log.info("Baked show %s at %s tocks/sec: %s frames, %s changes, "
+                      "%s bytes. Total baked: %s KB", show.file_name,
+                      tocks_per_sec, baked.num_frames, len(baked.changes),
+                      baked.bytes, self.baked_bytes / 1024)
+
+        return baked
+
+    def _unbake_show(self, show):
+        # Releases the frames of all the baked versions of a show
+        for baked in show.baked_shows.itervalues():
+            self.baked_bytes -= baked.bytes
+
+        show.baked_shows = dict()
+        show.baked = None
 
     def _end_show(self, show, reset=None):
         # Internal method which ends a running Show
 
-        self.running_shows = filter(lambda x: x != show, self.running_shows)
+        # its entry in the schedule is skipped when it comes up
+        self.running_shows.pop(show, None)
 
         if not show.hold:
             self.restore_lower_lights(show=show)
+        else:
+            # held lights keep their current state and priority
+            self._remove_layers(show, leds=show.led_states,
+                                lights=show.light_states, restore=False)
 
         if reset is None:
             this_reset = show.reset
@@ -396,51 +492,17 @@ class LightController(object):
         will just immediately override these restored settings.
 
         Args:
-            show: The show which will set the priority of the lights you want to
-                restore.
-            priority: An iteger value of the lights you want to restore.
-
-        In both cases it will only restore lights below the priority you pass,
-        skipping ones that are at the same value.
+            show: The show whose lights and LEDs you want to restore.
+            priority: Not used. The priority of the show's layers is used.
+
+        This removes this show's layer from each light and LED in the show. The
+        ones where it was the visible layer go back to the next layer down on
+        the next update, or to their cached manual setting if that's higher
+        than the remaining layers. Lights and LEDs that aren't in this show
+        aren't touched, so this doesn't have to resync any other shows.
         """
-
-        # set the priority we're working with.
-        if show:
-            priority = show.priority
-
-        # first force the restore of whatever the lights were manually set to
-
-        for light in show.light_states:
-
-            if light.debug:
-                light.log.debug("Found this light in a restore_lower_lights meth "
-                                "in show.light_states. Light cache priority: %s,"
-                                "ending show priority: %s", light.cache['priority'],
-                                priority)
-
-            if light.cache['priority'] <= priority:
-                light.restore()
-
-        for led in show.led_states:
-
-            if led.debug:
-                led.log.debug("Found this LED in a restore_lower_lights meth "
-                              "in show.led_states. LED cache priority: %s,"
-                              "ending show priority: %s", led.cache['priority'],
-                              priority)
-
-            if led.cache['priority'] <= priority:
-
-                led.restore()
-
-        # now see if there are other shows that have these lights in an active
-        # state
-        for other_show in self.running_shows:
-            if other_show.priority < priority:
-                other_show.resync()
-
-        # todo the above code could be better. It could only order the restores
-        # for the lights and leds that were in this show that just ended?
+        self._remove_layers(show, leds=show.led_states,
+                            lights=show.light_states)
 
     def register_tick_handler(self, handler):
         self.registered_tick_handlers.add(handler)
@@ -453,77 +515,148 @@ class LightController(object):
         # Runs once per machine loop and services any light updates that are
         # needed.
 
-        # Check the running Shows
-        for show in self.running_shows:
+        self.current_time = time.time()
+        tick_num = self.machine.tick_num
+        schedule = self.show_schedule
+        running_shows = self.running_shows
+
+        # Advance the running Shows whose next action is due
+        while schedule and schedule[0][0] <= tick_num:
+            entry = heapq.heappop(schedule)
+            show = entry[3]
+
+            if running_shows.get(show) is not entry:
+                continue  # stopped or rescheduled since this entry was added
+
             # we use a while loop so we can catch multiple action blocks
             # if the show tocked more than once since our last update
-            while show.next_action_tick <= self.machine.tick_num:
+            while show.next_action_tick <= tick_num:
 
-                # add the current location to the list to be serviced
-                # show.service_locations.append(show.current_location)
                 # advance the show to the current time
                 show.advance()
 
                 if show.ending:
                     break
 
+            # advance() removes the show from running_shows when it ends
+            if running_shows.get(show) is entry:
+                self._schedule_show(show)
+
+        profiler = self.profiler
+
         for handler in self.registered_tick_handlers:
-            handler()
+            if profiler:
+                start = time.time()
+                handler()
+                profiler.record('light_tick', None, handler, start)
+            else:
+                handler()
 
         # Check to see if we need to service any items from our queue. This can
         # be single commands or playlists
-
-        # Make a copy of the queue since we might delete items as we iterate
-        # through it
-        queue_copy = list(self.queue)
-
-        for item in queue_copy:
-            if item['action_time'] <= self.current_time:
-                # If the queue is for a fade, we ignore the current color
-                if item.get('fadeend', None):
-                    self._add_to_update_list({'lightname': item['lightname'],
-                                             'priority': item['priority'],
-                                             'blend': item.get('blend', None),
-                                             'fadeend': item.get('fadeend', None),
-                                             'dest_color': item.get('dest_color',
-                                                                    None)})
-                elif item.get('color', None):
-                    self._add_to_update_list({'lightname': item['lightname'],
-                                             'priority': item['priority'],
-                                             'color': item.get('color', None)})
-                elif item.get('playlist', None):
-                    item['playlist'].advance()
-
-                # We have to check again since one of these advances could have
-                # removed it already
-                if item in self.queue:
-                    self.queue.remove(item)
+        queue = self.queue
+
+        while queue and queue[0][0] <= self.current_time:
+            item = heapq.heappop(queue)[2]
+
+            # If the queue is for a fade, we ignore the current color
+            if item.get('fadeend', None):
+                self._add_to_update_list({'lightname': item['lightname'],
+                                         'priority': item['priority'],
+                                         'blend': item.get('blend', None),
+                                         'fadeend': item.get('fadeend', None),
+                                         'dest_color': item.get('dest_color',
+                                                                None)})
+            elif item.get('color', None):
+                self._add_to_update_list({'lightname': item['lightname'],
+                                         'priority': item['priority'],
+                                         'color': item.get('color', None)})
+            elif item.get('playlist', None):
+                item['playlist'].advance()
 
         self._do_update()
 
-    def _add_to_light_update_list(self, light, brightness, priority, blend):
-        # Adds an update to our update list, with intelligence that if the list
-        # already contains an update for this lightname at the same or lower
-        # priority, it deletes that one since there's not sense sending a light
-        # command that will be immediately overridden by a higher one.
-        for item in self.light_update_list:
-            if item['light'] == light and item['priority'] <= priority:
-                self.light_update_list.remove(item)
-        self.light_update_list.append({'light': light,
-                                       'brightness': brightness,
-                                       'priority': priority,
-                                       'blend': blend})  # remove blend?
-
-    def _add_to_led_update_list(self, led, color, fade_ms, priority, blend):
+    def _add_to_queue(self, item):
+        # Adds an item dict with an 'action_time' to the queue
+        heapq.heappush(self.queue, (item['action_time'],
+                                    next(self._schedule_sequence), item))
+
+    def _remove_from_queue(self, playlist):
+        # Removes all the queued items of a playlist. The queue is filtered in
+        # place since _tick() may be looping over it when a playlist stops.
+        self.queue[:] = [x for x in self.queue if x[2].get('playlist') is not
+                         playlist]
+        heapq.heapify(self.queue)
+
+    def _add_to_light_update_list(self, light, brightness, priority, blend,
+                                  source=None):
+        # Sets the layer of this source (typically a show) in this light's
+        # priority stack. The light is only updated if this layer ends up on
+        # top.
+        self._push_layer(self.light_stacks, self.dirty_lights, light, source,
+                         priority, brightness, 0, blend)
+
+    def _add_to_led_update_list(self, led, color, fade_ms, priority, blend,
+                                source=None):
         # See comment from above method
-        for item in self.led_update_list:
-            if item['led'] == led and item['priority'] <= priority:
-                self.led_update_list.remove(item)
-        self.led_update_list.append({'led': led,
-                                     'color': color,
-                                     'fade_ms': fade_ms,
-                                     'priority': priority,
-                                     'blend': blend})
+        self._push_layer(self.led_stacks, self.dirty_leds, led, source,
+                         priority, color, fade_ms, blend)
+
+    def _push_layer(self, stacks, dirty, device, source, priority, value,
+                    fade_ms, blend):
+        # Adds or updates the layer of source in the priority stack of device.
+        # A layer goes in front of the layers with the same or lower priority,
+        # so the latest update wins when shows have the same priority.
+
+        try:
+            stack = stacks[device]
+        except KeyError:
+            stack = stacks[device] = []
+
+        for i, layer in enumerate(stack):
+            if layer[1] is source:
+                del stack[i]
+                break
+
+        layer = [priority, source, value, fade_ms, blend]
+
+        for i, other in enumerate(stack):
+            if other[0] <= priority:
+                stack.insert(i, layer)
+                break
+        else:
+            i = len(stack)
+            stack.append(layer)
+
+        if not i and device not in dirty:
+            dirty[device] = None
+
+    def _remove_layers(self, source, leds=(), lights=(), restore=True):
+        # Removes the layers of source from the priority stacks of the leds and
+        # lights passed. Lights and LEDs where it was the top layer are marked
+        # dirty (unless restore is False), so the next update shows whatever is
+        # below it.
+
+        for stacks, dirty, devices in ((self.led_stacks, self.dirty_leds, leds),
+                                       (self.light_stacks, self.dirty_lights,
+                                        lights)):
+            for device in devices:
+                stack = stacks.get(device)
+
+                if not stack:
+                    continue
+
+                for i, layer in enumerate(stack):
+                    if layer[1] is source:
+                        del stack[i]
+
+                        if not i and restore and (dirty.get(device) is None or
+                                                  dirty[device] < layer[0]):
+                            dirty[device] = layer[0]
+                        break
+
+                if not stack:
+                    del stacks[device]
 
     def _add_to_event_queue(self, event):
         # Since events don't blend, this is easy
@@ -543,9 +676,9 @@ class LightController(object):
         self.flasher_queue.add(flasher)
 
     def _do_update(self):
-        if self.light_update_list:
+        if self.dirty_lights:
             self._update_lights()
-        if self.led_update_list:
+        if self.dirty_leds:
             self._update_leds()
         if self.coil_queue:
             self._fire_coils()
@@ -578,53 +711,65 @@ class LightController(object):
         self.flasher_queue = set()
 
     def _update_lights(self):
-        # Updates all the lights in the machine with whatever's in
-        # self.light_update_list. Updates with priority, so if the light is
-        # doing something at a higher priority, it won't have an effect
+        # Updates the lights whose top layer changed to whatever their top
+        # layer is now. Updates with priority, so if the light is doing
+        # something at a higher priority, it won't have an effect.
+
+        for light, removed_priority in self.dirty_lights.iteritems():
+            stack = self.light_stacks.get(light)
+
+            if (removed_priority is not None and
+                    light.cache['priority'] <= removed_priority):
+                # The show that was setting this light stopped, so go back to
+                # the next layer down, or to the cached manual setting if
+                # that's higher.
+                if stack and stack[0][0] >= light.cache['priority']:
+                    light.on(brightness=stack[0][2], priority=stack[0][0],
+                             cache=False, force=True)
+                else:
+                    light.restore()
 
-        for item in self.light_update_list:
-            item['light'].on(brightness=item['brightness'],
-                             priority=item['priority'],
-                             cache=False)
+            elif stack:
+                light.on(brightness=stack[0][2], priority=stack[0][0],
+                         cache=False)
 
-        self.light_update_list = []
+        self.dirty_lights = dict()
 
     def _update_leds(self):
-        # Updates the LEDs in the machine with whatever's in the update_list.
-
-        # The update_list is a list of dictionaries w/the following k/v pairs:
-        #   led
-        #   color
-        #   fade_ms
-        #   priority
-        #   blend
-
-        for item in self.led_update_list:
-            # Only perform the update if the priority is higher than whatever
-            # touched that led last.
-            if item['priority'] >= item['led'].state['priority']:
-
-                # Now we're doing the actual update.
-
-                if item['led'].debug:
-                    item['led'].log.debug("Applying update to LED from the Show "
-                                          "Controller")
-
-                item['led'].color(color=item['color'],
-                                  fade_ms=item['fade_ms'],
-                                  priority=item['priority'],
-                                  blend=item['blend'],
-                                  cache=False)
-
-            elif item['led'].debug:
-                item['led'].log.debug("Show Controller has an update for this "
-                                      "LED, but the update is priority %s while "
-                                      "the current priority of the LED is %s. "
-                                      "The update will not be applied.",
-                                      item['priority'],
-                                      item['led'].state['priority'])
-
-        self.led_update_list = []
+        # Updates the LEDs whose top layer changed to whatever their top layer
+        # is now. See _update_lights() for details.
+
+        for led, removed_priority in self.dirty_leds.iteritems():
+            stack = self.led_stacks.get(led)
+
+            if (removed_priority is not None and
+                    led.cache['priority'] <= removed_priority):
+
+                if stack and stack[0][0] >= led.cache['priority']:
+                    priority, _, color, _, blend = stack[0]
+                    led.color(color=color, fade_ms=0, priority=priority,
+                              blend=blend, cache=False, force=True)
+                else:
+                    led.restore()
+
+            elif stack and stack[0][0] >= led.state['priority']:
+
+                if led.debug:
+                    led.log.debug("Applying update to LED from the Show "
+                                  "Controller")
+
+                priority, _, color, fade_ms, blend = stack[0]
+                led.color(color=color, fade_ms=fade_ms,
+                          priority=priority, blend=blend, cache=False)
+
+            elif stack and led.debug:
+                led.log.debug("Show Controller has an update for this LED, but "
+                              "the update is priority %s while the current "
+                              "priority of the LED is %s. The update will not "
+                              "be applied.", stack[0][0],
+                              led.state['priority'])
+
+        self.dirty_leds = dict()
 
     def run_registered_script(self, script_name, **kwargs):
 
@@ -848,241 +993,57 @@ class Show(Asset):
         self.loaded = False
         self.notify_when_loaded = set()
         self.loaded_callbacks = list()
-        self.show_actions = list()
+        self.loaded_from_disk = False
+        self.show_steps = list()
+
+        self.baked = None  # the BakedShow this show is playing, if any
+        self.baked_shows = dict()  # BakedShows by tocks_per_sec
+        self.baked_change = None  # index of the next change in self.baked
 
     def do_load(self, callback, show_actions=None):
 
-        self.show_actions = list()
+        self.show_steps = list()
 
         self.asset_manager.log.debug("Loading Show %s", self.file_name)
 
-        if not show_actions:
-            show_actions = self.load_show_from_disk()
-
-        if type(show_actions) is not list:
-            self.asset_manager.log.warning("%s is not a valid YAML file. "
-                                           "Skipping show.", self.file_name)
-            return False
-
-        for step_num in range(len(show_actions)):
-            step_actions = dict()
-
-            step_actions['tocks'] = show_actions[step_num]['tocks']
-
-            # look for empty steps. If we find them we'll just add their tock
-            # time to the previous step.
-
-            if len(show_actions[step_num]) == 1:  # 1 because it still has tocks
-
-                show_actions[-1]['tocks'] += step_actions['tocks']
-                continue
-
-            # Lights
-            if ('lights' in show_actions[step_num] and
-                    show_actions[step_num]['lights']):
-
-                light_actions = dict()
-
-                for light in show_actions[step_num]['lights']:
+        compiler = ShowCompiler(self.machine, self.asset_manager.log)
+        show_cache = self.machine.light_controller.show_cache
+        compiled = None
 
-                    if 'tag|' in light:
-                        tag = light.split('tag|')[1]
-                        light_list = self.machine.lights.items_tagged(tag)
-                    else:  # create a single item list of the light object
-                        try:
-                            light_list = [self.machine.lights[light]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "light name '%s' in show. Skipping...", light)
-                            continue
-
-                    value = show_actions[step_num]['lights'][light]
-
-                    # convert / ensure lights are single ints
-                    if type(value) is str:
-                        value = Util.hex_string_to_int(
-                            show_actions[step_num]['lights'][light])
-
-                    if type(value) is int and value > 255:
-                        value = 255
-
-                    for light_ in light_list:
-                        light_actions[light_] = value
-
-                        # make sure this light is in self.light_states
-                        if light_ not in self.light_states:
-                            self.light_states[light_] = 0
-
-                step_actions['lights'] = light_actions
-
-            # Events
-            # make sure events is a list of strings
-            if ('events' in show_actions[step_num] and
-                    show_actions[step_num]['events']):
-
-                event_list = (Util.string_to_list(
-                    show_actions[step_num]['events']))
-
-                step_actions['events'] = event_list
-
-            # Coils
-            if ('coils' in show_actions[step_num] and
-                    show_actions[step_num]['coils']):
-
-                coil_actions = dict()
-
-                for coil in show_actions[step_num]['coils']:
-
-                    try:
-                        this_coil = self.machine.coils[coil]
-                    except:
-                        # this coil name is invalid
-                        self.asset_manager.log.warning("WARNING: Found invalid "
-                            "coil name '%s' in show. Skipping...", coil)
-                        continue
-
-                    value = show_actions[step_num]['coils'][coil]
-
-                    # process the value into a tuple which will be
-                    # value[0] = string of action type (pulse, pwm, etc)
-                    # value[1] = int / float of pulse value
-
-                    # split the value on '-p' to look for a power setting
-                    value = value.split('-p')
-
-                    # if there's no power setting, append 100
-                    if len(value) == 1:
-                        value.append(100)
-
-                    # convert the 0-100 value to 0.0-1.0 float
-                    value[1] = float(value[1]) / 100.0
-
-                    # convert value list into tuple
-                    value = (value[0], value[1])
-
-                    coil_actions[this_coil] = value
-
-                step_actions['coils'] = coil_actions
-
-            # Flashers
-            if ('flashers' in show_actions[step_num] and
-                    show_actions[step_num]['flashers']):
-
-                flasher_set = set()
-
-                for flasher in Util.string_to_list(
-                        show_actions[step_num]['flashers']):
-
-                    if 'tag|' in flasher:
-                        tag = flasher.split('tag|')[1]
-                        flasher_list = self.machine.flashers.items_tagged(tag)
-                    else:  # create a single item list of the flasher objects
-                        try:
-                            flasher_list = [self.machine.flashers[flasher]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "flasher name '%s' in show. Skipping...",
-                                flasher)
-                            continue
-
-                    for flasher_ in flasher_list:
-                        flasher_set.add(flasher_)
-
-                step_actions['flashers'] = flasher_set
-
-            # GI
-            if ('gis' in show_actions[step_num] and
-                    show_actions[step_num]['gis']):
-
-                gi_actions = dict()
-
-                for gi in show_actions[step_num]['gis']:
-
-                    if 'tag|' in gi:
-                        tag = gi.split('tag|')[1]
-                        gi_list = self.machine.gi.items_tagged(tag)
-                    else:  # create a single item list of the light object
-                        try:
-                            gi_list = [self.machine.gi[gi]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "GI name '%s' in show. Skipping...",
-                                gi)
-                            continue
-
-                    value = show_actions[step_num]['gis'][gi]
-
-                    # convert / ensure flashers are single ints
-                    if type(value) is str:
-                        value = Util.hex_string_to_int(value)
-
-                    if type(value) is int and value > 255:
-                        value = 255
-
-                    for gi_ in gi_list:
-                        gi_actions[gi_] = value
-
-                step_actions['gis'] = gi_actions
-
-            # LEDs
-            if ('leds' in show_actions[step_num] and
-                    show_actions[step_num]['leds']):
-
-                led_actions = dict()
-
-                for led in show_actions[step_num]['leds']:
-
-                    if 'tag|' in led:
-                        tag = led.split('tag|')[1]
-                        led_list = self.machine.leds.items_tagged(tag)
-                    else:  # create a single item list of the led object
-                        try:
-                            led_list = [self.machine.leds[led]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "LED name '%s' in show. Skipping...", led)
-                            continue
-
-                    value = show_actions[step_num]['leds'][led]
+        if not show_actions:
+            compiled = show_cache.load(self.file_name)
 
-                    # ensure led is list is of 4 ints: [r, g, b, fade_tocks]
-                    if type(value) is list:
-                        # ensure our list is exactly 4 items
-                        if len(value) < 4:
-                            # pad to 4 with zeros
-                            value.extend([0] * (4 - len(value)))
-                        elif len(value) > 4:
-                            value = value[0:4]
+            if not compiled:
+                show_actions = self.load_show_from_disk()
 
-                    fade = 0
+        if not compiled:
+            if type(show_actions) is not list:
+                self.asset_manager.log.warning("%s is not a valid YAML file. "
+                                               "Skipping show.", self.file_name)
+                return False
 
-                    if type(value) is str:
-                        if '-f' in value:
-                            fade = value.split('-f')
+            compiled = compiler.compile(show_actions)
 
-                    # convert our color of hexes to a list of ints
-                    value = Util.hex_string_to_list(value)
-                    value.append(fade)
+            if self.file_name and self.loaded_from_disk:
+                show_cache.save(self.file_name, compiled)
 
-                    for led_ in led_list:
-                        led_actions[led_] = value
+        self.show_steps = compiler.resolve(compiled)
 
-                        # make sure this led is in self.led_states
-                        if led_ not in self.led_states:
-                            self.led_states[led_] = {
-                                'current_color': [0, 0, 0],
-                                'destination_color': [0, 0, 0],
-                                'start_color': [0, 0, 0],
-                                'fade_start': 0,
-                                'fade_end': 0}
-
-                step_actions['leds'] = led_actions
+        for step in self.show_steps:
+            for light, _ in step[LIGHTS]:
+                self.light_states[light] = 0
 
-            self.show_actions.append(step_actions)
+            for led, _, _ in step[LEDS]:
+                self.led_states[led] = {
+                    'current_color': [0, 0, 0],
+                    'destination_color': [0, 0, 0],
+                    'start_color': [0, 0, 0],
+                    'fade_start': 0,
+                    'fade_end': 0}
 
         # count how many total locations are in the show. We need this later
         # so we can know when we're at the end of a show
-        self.total_locations = len(self.show_actions)
+        self.total_locations = len(self.show_steps)
 
         self.loaded = True
 
@@ -1093,11 +1054,12 @@ class Show(Asset):
         # why do we need this and the one above?
 
     def _unload(self):
-        self.show_actions = None
+        self.machine.light_controller._unbake_show(self)
+        self.show_steps = None
 
     def play(self, repeat=False, priority=0, blend=False, hold=None,
              tocks_per_sec=30, start_location=None, callback=None,
-             num_repeats=0, sync_ms=0, reset=True, **kwargs):
+             num_repeats=0, sync_ms=0, reset=True, bake=False, **kwargs):
         """Plays a Show. There are many parameters you can use here which
         affect how the show is played. This includes things like the playback
         speed, priority, whether this show blends with others, etc. These are
@@ -1151,6 +1113,13 @@ class Show(Asset):
                 documentation for details on how this works.
             reset: Boolean which controls whether this show will reset to its
                 first position once it ends. Default is True.
+            bake: Boolean which renders this show into a frame per tick at
+                this tocks_per_sec (once, the first time it's played at that
+                rate) and replays those frames instead of processing each
+                step. Only shows that repeat indefinitely and only have
+                lights and LEDs can be baked. Others are played normally, as
+                are shows whose frames would go over the light_controller:
+                bake_max_kb setting. Default is False.
             **kwargs: Not used, but included in case this method is used as an
                 event handler which might include additional kwargs.
         """
@@ -1165,7 +1134,8 @@ class Show(Asset):
                                     start_location=start_location,
                                     callback=callback,
                                     num_repeats=num_repeats,
-                                    sync_ms=sync_ms)
+                                    sync_ms=sync_ms,
+                                    bake=bake)
             self.load()
             return False
 
@@ -1185,6 +1155,13 @@ class Show(Asset):
         self.num_repeats = num_repeats
         self.sync_ms = sync_ms
         self.reset = reset
+        self.baked_change = None
+
+        if bake:
+            self.baked = self.machine.light_controller._get_baked_show(
+                self, tocks_per_sec)
+        else:
+            self.baked = None
 
         if start_location is not None:
             # if you don't specify a start location, it will start where it
@@ -1199,6 +1176,7 @@ class Show(Asset):
         self.machine.light_controller._run_show(self)
 
     def load_show_from_disk(self):
+        self.loaded_from_disk = True
         return FileManager.load(self.file_name)
 
     def add_loaded_callback(self, loaded_callback, **kwargs):
@@ -1259,9 +1237,47 @@ class Show(Asset):
         Note that you can't just update the show's tocks_per_second directly
         because we also need to update self.ticks_per_tock.
         """
+        old_tocks_per_sec = self.tocks_per_sec
         self.tocks_per_sec = tocks_per_sec
         self.ticks_per_tock = Timing.HZ/float(tocks_per_sec)
 
+        if self.baked:
+            self._change_baked_speed(old_tocks_per_sec)
+
+    def _change_baked_speed(self, old_tocks_per_sec):
+        # Switches a baked show to its BakedShow at the new rate, or to live
+        # playback if it can't be baked at that rate, keeping its place in
+        # the current step
+        old_baked = self.baked
+        light_controller = self.machine.light_controller
+        self.baked = light_controller._get_baked_show(self,
+                                                      self.tocks_per_sec)
+
+        if self.baked_change is None:  # hasn't started yet
+            return
+
+        tick_num = self.machine.tick_num
+
+        # the frame of the old baked show we're in right now
+        frame_num = int(old_baked.changes[self.baked_change][0] -
+                        (self.next_action_tick - tick_num)) % \
+            old_baked.num_frames
+        step, ticks = old_baked.step_position(frame_num)
+        ticks = int(ticks * old_tocks_per_sec / float(self.tocks_per_sec))
+
+        if self.baked:
+            self._start_baked(self.baked.step_frame(step, ticks))
+
+        else:
+            self.baked_change = None
+            self.current_location = (step + 1) % self.total_locations
+            self.next_action_tick = tick_num + max(BakedShow.step_ticks(
+                self.show_steps[step][TOCKS], self.tocks_per_sec,
+                Timing.HZ) - ticks, 1)
+
+        if self in light_controller.running_shows:
+            light_controller._schedule_show(self)
+
     def advance(self):
 
         # Internal method which advances the show to the next step
@@ -1269,6 +1285,10 @@ class Show(Asset):
             self.machine.light_controller._end_show(self)
             return
 
+        if self.baked:
+            self._advance_baked()
+            return
+
         action_loop_count = 0  # Tracks how many loops we've done in this call
         # Used to detect if a show is running too slow
 
@@ -1277,85 +1297,66 @@ class Show(Asset):
             action_loop_count += 1
 
             # Set the next action time & step to the next location
-            self.next_action_tick = ((self.show_actions[self.current_location]
-                                     ['tocks'] * self.ticks_per_tock) +
+            self.next_action_tick = ((self.show_steps[self.current_location]
+                                     [TOCKS] * self.ticks_per_tock) +
                                      self.machine.tick_num)
 
             if self.debug:
                 print "Current tick", self.machine.tick_num
                 print "Next Tick:", self.next_action_tick
-                print "current location tocks", self.show_actions[self.current_location]['tocks']
+                print "current location tocks", self.show_steps[self.current_location][TOCKS]
                 print "ticks per tock", self.ticks_per_tock
 
-        # create a dictionary of the current items of each type, combined with
-        # the show details, that we can throw up to our queue
-
-        for item_type, item_dict in (self.show_actions[self.current_location].
-                                     iteritems()):
-
-            if item_type == 'lights':
-
-                for light_obj, brightness in item_dict.iteritems():
-
-                    self.machine.light_controller._add_to_light_update_list(
-                        light=light_obj,
-                        brightness=brightness,
-                        priority=self.priority,
-                        blend=self.blend)
+        (_, lights, leds, events, coils, gis,
+         flashers) = self.show_steps[self.current_location]
+        light_controller = self.machine.light_controller
 
-                    # update the current state
-                    self.light_states[light_obj] = brightness
-
-            elif item_type == 'leds':
-
-                current_time = time.time()
-
-                for led_obj, led_dict in item_dict.iteritems():
-
-                    self.machine.light_controller._add_to_led_update_list(
-                        led=led_obj,
-                        color=[led_dict[0], led_dict[1], led_dict[2]],
-                        fade_ms=led_dict[3] * self.tocks_per_sec,
-                        priority=self.priority,
-                        blend=self.blend)
+        for light_obj, brightness in lights:
+            light_controller._add_to_light_update_list(
+                light=light_obj,
+                brightness=brightness,
+                priority=self.priority,
+                blend=self.blend,
+                source=self)
 
-                    # update the current state
+            # update the current state
+            self.light_states[light_obj] = brightness
 
-                    # grab the old current color
-                    prev_color = [led_dict[0], led_dict[1], led_dict[2]]
+        if leds:
+            current_time = time.time()
 
-                    self.led_states[led_obj] = {
-                            'current_color': prev_color,
-                            # todo need to calculate this for a restore
-                            'destination_color': [led_dict[0], led_dict[1],
-                                                  led_dict[2]],
-                            'start_color': prev_color,
-                            'fade_start': current_time,
-                            'fade_end': current_time + (led_dict[3] *
-                                                        self.tocks_per_sec)}
+        for led_obj, color, fade_tocks in leds:
+            fade_ms = fade_tocks * 1000.0 / self.tocks_per_sec
 
-            elif item_type == 'events':
+            light_controller._add_to_led_update_list(
+                led=led_obj,
+                color=color,
+                fade_ms=fade_ms,
+                priority=self.priority,
+                blend=self.blend,
+                source=self)
 
-                for event in item_dict:  # item_dict is actually a list here
-                    self.machine.light_controller._add_to_event_queue(event)
+            # update the current state
+            self.led_states[led_obj] = {
+                    'current_color': list(color),
+                    # todo need to calculate this for a restore
+                    'destination_color': list(color),
+                    'start_color': list(color),
+                    'fade_start': current_time,
+                    'fade_end': current_time + fade_ms / 1000.0}
 
-            elif item_type == 'coils':
+        for event in events:
+            light_controller._add_to_event_queue(event)
 
-                for coil_obj, coil_action in item_dict.iteritems():
-                    self.machine.light_controller._add_to_coil_queue(
-                        coil=coil_obj,
-                        action=coil_action)
+        for coil_obj, coil_action in coils:
+            light_controller._add_to_coil_queue(coil=coil_obj,
+                                                action=coil_action)
 
-            elif item_type == 'gis':
-                for gi, value in item_dict.iteritems():
-                    self.machine.light_controller._add_to_gi_queue(
-                        gi=gi,
-                        value=value)
+        for gi, value in gis:
+            light_controller._add_to_gi_queue(gi=gi, value=value)
 
-            elif item_type == 'flashers':
-                for flasher in item_dict:
-                    self.machine.light_controller._add_to_flasher_queue(
-                        flasher=flasher)
+        for flasher in flashers:
+            light_controller._add_to_flasher_queue(flasher=flasher)
 
         # increment this show's current_location pointer and handle repeats
 
@@ -1387,6 +1388,37 @@ class Show(Asset):
         if action_loop_count == self.total_locations:
             return
 
+    def _advance_baked(self):
+        # Pushes the lights and LEDs that change in the next frame of a baked
+        # show and schedules the frame after that
+        baked = self.baked
+
+        if self.baked_change is None:
+            # starting, so push the whole frame
+            self._start_baked(baked.step_frames[self.current_location])
+            return
+
+        frame_num, slots, ticks = baked.changes[self.baked_change]
+        baked.apply(self, frame_num, slots)
+
+        self.baked_change = (self.baked_change + 1) % len(baked.changes)
+        self.next_action_tick += ticks
+
+    def _start_baked(self, frame_num):
+        # Pushes a whole frame of a baked show and schedules the next change
+        baked = self.baked
+        baked.apply(self, frame_num)
+
+        if not baked.changes:  # nothing ever changes
+            self.baked_change = None
+            self.next_action_tick = float('inf')
+            return
+
+        self.baked_change = baked.first_change(frame_num)
+        self.next_action_tick = self.machine.tick_num + (
+            (baked.changes[self.baked_change][0] - frame_num) %
+            baked.num_frames or baked.num_frames)
+
     def resync(self):
         """Causes this show to do a one-time update to resync all the LEDs and
         lights in the show with where they should be now. This is used when a
@@ -1399,7 +1431,8 @@ class Show(Asset):
                 light=light_obj,
                 brightness=brightness,
                 priority=self.priority,
-                blend=self.blend)
+                blend=self.blend,
+                source=self)
 
         for led_obj, led_dict in self.led_states.iteritems():
             self.machine.light_controller._add_to_led_update_list(
@@ -1407,7 +1440,8 @@ class Show(Asset):
                 color=led_dict['current_color'],
                 fade_ms=0,
                 priority=self.priority,
-                blend=self.blend)
+                blend=self.blend,
+                source=self)
 
 
 class Playlist(object):
@@ -1636,9 +1670,7 @@ class Playlist(object):
                 # we stop the current show, we have to come back one.
                 action['show'].stop(hold=hold)
 
-        for item in self.machine.light_controller.queue:
-            if item['playlist'] == self:
-                self.machine.light_controller.queue.remove(item)
+        self.machine.light_controller._remove_from_queue(self)
         if reset:
             self.current_step_position = 0
             self.current_repeat_loop = 0
@@ -1716,7 +1748,7 @@ class Playlist(object):
         # if we don't have a trigger_show but we have a time value for this
         # step, set up the time to move on
         if step_time and not step_trigger_show:
-            self.machine.light_controller.queue.append({'playlist': self,
+            self.machine.light_controller._add_to_queue({'playlist': self,
                 'action_time': (self.machine.light_controller.current_time +
                                 step_time)})
 
@@ -1785,7 +1817,7 @@ class ExternalShow(object):
             self.external_show_queue.add(
                 (self.machine.light_controller._add_to_led_update_list,
                   (led, (color[0:2], color[2:4], color[4:6]), 0, self.priority,
-                   self.blend)
+                   self.blend, self)
                  )
             )
 
@@ -1794,7 +1826,7 @@ class ExternalShow(object):
         for light, brightness in zip(self.lights, Util.chunker(data, 2)):
             self.external_show_queue.add(
                 (self.machine.light_controller._add_to_light_update_list,
-                  (light, brightness, self.priority, self.blend)
+                  (light, brightness, self.priority, self.blend, self)
                 )
             )
 
@@ -1818,13 +1850,8 @@ class ExternalShow(object):
 
     def stop(self):
         # Called by worker thread
-        for led in self.leds:
-            if led.cache['priority'] <= self.priority:
-                led.restore()
-
-        for light in self.lights:
-            if light.cache['priority'] <= self.priority:
-                light.restore()
+        self.machine.light_controller._remove_layers(self, leds=self.leds,
+                                                     lights=self.lights)
 
         self.machine.light_controller.external_shows.remove(self)
 
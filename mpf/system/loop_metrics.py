@@ -0,0 +1,187 @@
+"""Contains the LoopMetrics class which watches how long machine ticks take and
+reports the health of the run loop."""
+# loop_metrics.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import bisect
+import json
+import logging
+import time
+
+from mpf.system.timing import Timing
+
+
+class LoopMetrics(object):
+    """Tick-overrun watchdog and run loop health metrics.
+
+    The MachineController reports the start and end of every machine tick
+    here. Ticks which take longer than the 'tick_overrun_ms' setting from the
+    'loop_metrics:' config section (default is one tick) are counted and post
+    a 'tick_overrun' event, so stalls can be seen while a game is running.
+
+    Every 'publish_secs' the current metrics are written to machine variables
+    (all prefixed with 'loop_'), which means they can be sent to the media
+    controller via the 'machine_variables:' setting in the 'bcp:' section. A
+    BCP host can also request all of them (including the tick duration
+    histogram) with a 'get?names=loop_metrics' command.
+
+    """
+
+    var_names = ('tick_rate', 'poll_rate', 'tick_ms_avg', 'tick_ms_max',
+                 'overruns', 'max_lateness_ms', 'ticks_dropped',
+                 'event_queue_max', 'callback_queue_max')
+
+    def __init__(self, machine):
+        self.log = logging.getLogger('LoopMetrics')
+        self.machine = machine
+
+        self.machine.validate_machine_config_section('loop_metrics')
+        self.config = self.machine.config['loop_metrics']
+
+        if self.config['tick_overrun_ms']:
+            self.overrun_secs = self.config['tick_overrun_ms'] / 1000.0
+        else:
+            self.overrun_secs = Timing.secs_per_tick
+
+        self.buckets = sorted(x / 1000.0 for x in
+                              self.config['histogram_buckets_ms'])
+        self.histogram = [0] * (len(self.buckets) + 1)
+        # the last slot counts the ticks longer than the largest bucket
+
+        self.overruns = 0
+        self.interval_start = time.time()
+        self.interval_ticks = 0
+        self.interval_polls = 0
+        self.interval_secs = 0.0
+        self.interval_max = 0.0
+        self.metrics = dict()
+
+        for name in self.var_names:
+            self.metrics[name] = 0
+            self.machine.create_machine_var('loop_' + name, 0, silent=True)
+
+        self.machine.events.add_handler('bcp_get_loop_metrics',
+                                        self.bcp_send_metrics)
+
+    def __repr__(self):
+        return '<LoopMetrics>'
+
+    def tick_complete(self, start):
+        """Records a machine tick. Called by the MachineController at the end
+        of timer_tick().
+
+        Args:
+            start: The time.time() the tick started.
+
+        """
+        now = time.time()
+        secs = now - start
+
+        self.histogram[bisect.bisect_left(self.buckets, secs)] += 1
+        self.interval_ticks += 1
+        self.interval_secs += secs
+
+        if secs > self.interval_max:
+            self.interval_max = secs
+
+        if secs > self.overrun_secs:
+            self.overruns += 1
+            self.log.debug("Tick %s took %sms", self.machine.tick_num,
+                           round(secs * 1000, 2))
+            self.machine.events.post('tick_overrun',
+                tick=self.machine.tick_num,
+                duration_ms=round(secs * 1000, 2),
+                lateness_ms=round(self.machine.tick_lateness * 1000, 2))
+
+        if now - self.interval_start >= self.config['publish_secs']:
+            self.publish(now)
+
+    def publish(self, now=None):
+        """Calculates the metrics of the interval since the last time this
+        method was called and writes them to the 'loop_' machine variables.
+
+        Args:
+            now: Optional time.time() of the end of the interval.
+
+        """
+        if now is None:
+            now = time.time()
+
+        machine = self.machine
+        elapsed = now - self.interval_start
+        polls = machine.platform_polls - self.interval_polls
+
+        metrics = self.metrics
+
+        if elapsed > 0:
+            metrics['tick_rate'] = round(self.interval_ticks / elapsed, 2)
+            metrics['poll_rate'] = round(polls / elapsed, 2)
+
+        if self.interval_ticks:
+            metrics['tick_ms_avg'] = round(
+                self.interval_secs / self.interval_ticks * 1000, 3)
+
+        metrics['tick_ms_max'] = round(self.interval_max * 1000, 3)
+        metrics['overruns'] = self.overruns
+        metrics['max_lateness_ms'] = round(machine.max_tick_lateness * 1000, 2)
+        metrics['ticks_dropped'] = machine.ticks_dropped
+        metrics['event_queue_max'] = machine.events.max_event_queue_depth
+        metrics['callback_queue_max'] = machine.events.max_callback_queue_depth
+
+        self.interval_start = now
+        self.interval_ticks = 0
+        self.interval_polls = machine.platform_polls
+        self.interval_secs = 0.0
+        self.interval_max = 0.0
+        machine.events.max_event_queue_depth = 0
+        machine.events.max_callback_queue_depth = 0
+
+        for name in self.var_names:
+            machine.set_machine_var('loop_' + name, metrics[name])
+
+    def get_histogram(self):
+        """Returns a list of (bucket, count) tuples of the tick durations,
+        where bucket is the upper limit of the bucket in ms. The last bucket
+        is None and counts the ticks which took longer than all the others."""
+        limits = [round(x * 1000, 3) for x in self.buckets] + [None]
+        return zip(limits, self.histogram)
+
+    def get_metrics(self):
+        """Returns a dictionary of the metrics of the last interval plus the
+        tick duration histogram."""
+        metrics = dict(self.metrics)
+        metrics['histogram'] = self.get_histogram()
+        return metrics
+
+    def bcp_send_metrics(self, **kwargs):
+        """Sends the metrics to the BCP hosts as a 'set' command with the
+        JSON-encoded metrics as the 'loop_metrics' parameter."""
+        self.machine.bcp.send('set',
+                              loop_metrics=json.dumps(self.get_metrics()))
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -56,6 +56,11 @@ class MachineController(object):
 
         self.loop_start_time = 0
         self.tick_num = 0
+        self.tick_lateness = 0.0
+        self.max_tick_lateness = 0.0
+        self.total_tick_lateness = 0.0
+        self.ticks_dropped = 0
+        self.platform_polls = 0
         self.physical_hw = options['physical_hw']
         self.done = False
         self.machine_path = None  # Path to this machine's folder root
@@ -389,6 +394,16 @@ class MachineController(object):
         #Main machine run loop with when the default platform interface
         #specifies the MPF should control the main timer
 
+        if self.config['timing']['loop_mode'] == 'sleep':
+            self._mpf_sleep_run_loop()
+        else:
+            self._mpf_deadline_run_loop()
+
+    def _mpf_sleep_run_loop(self):
+        # Legacy run loop which sleeps for a fixed hw_thread_sleep_ms, then
+        # polls the platform and checks whether a machine tick is due. Kept
+        # as a fallback via 'loop_mode: sleep' in the timing: config section.
+
         start_time = time.time()
         loops = 0
         secs_per_tick = timing.Timing.secs_per_tick
@@ -401,6 +416,7 @@ class MachineController(object):
                 time.sleep(sleep_sec)
                 self.default_platform.tick()
                 loops += 1
+                self.platform_polls += 1
                 if self.default_platform.next_tick_time <= time.time():  # todo change this
                     self.timer_tick()
                     self.default_platform.next_tick_time += secs_per_tick
@@ -416,6 +432,79 @@ class MachineController(object):
         except ZeroDivisionError:
             self.log.info("Hardware loop rate: 0 Hz")
 
+    def _mpf_deadline_run_loop(self):
+        # Run loop which tracks two deadlines (the next platform poll and the
+        # next machine tick) and sleeps until whichever one comes first, rather
+        # than waking up every hw_thread_sleep_ms to check.
+
+        start_time = time.time()
+        loops = 0
+        secs_per_tick = timing.Timing.secs_per_tick
+        poll_secs = self.config['timing']['hw_thread_sleep_ms'] / 1000.0
+        max_catchup_ticks = self.config['timing']['max_catchup_ticks']
+
+        self.default_platform.next_tick_time = time.time()
+        next_poll_time = self.default_platform.next_tick_time
+
+        try:
+            while self.done is False:
+                now = time.time()
+
+                if next_poll_time <= now:
+                    self.default_platform.tick()
+                    loops += 1
+                    self.platform_polls += 1
+                    next_poll_time = now + poll_secs
+                    now = time.time()
+
+                if self.default_platform.next_tick_time <= now:
+                    self._run_deadline_tick(now, secs_per_tick,
+                                            max_catchup_ticks)
+
+                sleep_secs = (min(next_poll_time,
+                                  self.default_platform.next_tick_time) -
+                              time.time())
+
+                if sleep_secs > 0:
+                    time.sleep(sleep_secs)
+
+        except KeyboardInterrupt:
+            pass
+
+        self.log_loop_rate()
+
+        try:
+            self.log.info("Hardware loop rate: %s Hz",
+                          round(loops / (time.time() - start_time), 2))
+        except ZeroDivisionError:
+            self.log.info("Hardware loop rate: 0 Hz")
+
+    def _run_deadline_tick(self, now, secs_per_tick, max_catchup_ticks):
+        # Runs one machine tick for the deadline run loop. If the loop has
+        # fallen more than max_catchup_ticks behind (because of a stall), the
+        # excess ticks are dropped so MPF doesn't burn through a backlog of
+        # ticks back-to-back. Ticks within the catch-up window run on the
+        # following passes through the loop.
+
+        lateness = now - self.default_platform.next_tick_time
+        ticks_behind = int(lateness / secs_per_tick)
+
+        if ticks_behind > max_catchup_ticks:
+            dropped = ticks_behind - max_catchup_ticks
+            self.ticks_dropped += dropped
+            self.default_platform.next_tick_time += dropped * secs_per_tick
+            self.log.debug("Run loop is %s ticks behind. Dropping %s ticks.",
+                           ticks_behind, dropped)
+
+        self.tick_lateness = lateness
+        self.total_tick_lateness += lateness
+
+        if lateness > self.max_tick_lateness:
+            self.max_tick_lateness = lateness
+
+        self.timer_tick()
+        self.default_platform.next_tick_time += secs_per_tick
+
     def timer_tick(self):
         """Called to "tick" MPF at a rate specified by the machine Hz setting.
 
@@ -424,11 +513,13 @@ class MachineController(object):
         let MPF drive.)
 
         """
+        start = time.time()
         self.tick_num += 1  # used to calculate the loop rate when MPF exits
         self.timing.timer_tick()  # notifies the timing module
         self.events.post('timer_tick')  # sends the timer_tick system event
         tasks.Task.timer_tick()  # notifies tasks
         tasks.DelayManager.timer_tick()
+        self.loop_metrics.tick_complete(start)
 
     def power_off(self):
         """Attempts to perform a power down of the pinball machine and ends MPF.
@@ -453,6 +544,16 @@ class MachineController(object):
         except ZeroDivisionError:
             self.log.info("Actual MPF loop rate: 0 Hz")
 
+        if self.tick_num:
+            self.log.info("Tick lateness: avg %sms, max %sms. Dropped ticks: "
+                          "%s", round(self.total_tick_lateness /
+                                      self.tick_num * 1000, 2),
+                          round(self.max_tick_lateness * 1000, 2),
+                          self.ticks_dropped)
+
+        self.switch_controller.log_ingestion_latency()
+        self.profiler.log_stats()
+
     def _loading_tick(self):
         if not self.asset_loader_complete:
 
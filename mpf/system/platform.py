@@ -35,6 +35,7 @@ class Platform(object):
         self.features['hw_timer'] = False
         self.features['hw_rule_coil_delay'] = False
         self.features['variable_recycle_time'] = False
+        self.features['hw_led_fade'] = False
 
         # todo change this to be dynamic for any overlay
         if self.machine.config['hardware']['driverboards'] == 'snux':
@@ -0,0 +1,271 @@
+"""Contains the Profiler class which measures how long the handlers for
+events, switches, delays, tasks and ticks take to run."""
+# profiler.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import json
+import logging
+import time
+from collections import deque
+
+from mpf.system.tasks import Task, DelayManager
+
+
+class Profiler(object):
+    """Opt-in profiler which records call counts and run times of handlers.
+
+    Profiling is enabled with the 'profiler: enabled' setting in the machine
+    config or with the -p command line option. When it's disabled, the
+    profiled call sites only check whether their 'profiler' attribute is set,
+    so the overhead is very low.
+
+    When it's enabled, the EventManager, SwitchController, DelayManager,
+    Task, LightController and Timing (tick subscribers) record how long each
+    handler they call takes. Times are inclusive, so if a handler posts an
+    event which is processed right away, the time of those handlers is part of
+    its time too.
+
+    The stats are logged (and optionally written to a file) when MPF shuts
+    down, and they can be requested by a BCP host with a 'get?names=profiler'
+    command.
+
+    """
+
+    def __init__(self, machine):
+        self.log = logging.getLogger('Profiler')
+        self.machine = machine
+
+        self.machine.validate_machine_config_section('profiler')
+        self.config = self.machine.config['profiler']
+
+        self.enabled = False
+        self.stats = dict()  # k: (category, detail, handler), v: HandlerStats
+        self.tick = 0
+        self.tick_worst_secs = 0.0
+        self.tick_worst = None
+        self.worst_ticks = deque(maxlen=self.config['worst_ticks'])
+        # (tick number, ms, handler name) of the slowest handler of each of the
+        # last ticks
+
+        self.machine.events.add_handler('bcp_get_profiler',
+                                        self.bcp_send_stats)
+
+        if self.config['enabled'] or self.machine.options.get('profile'):
+            self.enable()
+
+    def __repr__(self):
+        return '<Profiler>'
+
+    def enable(self):
+        """Starts profiling."""
+        self.log.info("Enabling the handler profiler")
+        self.enabled = True
+        self._set_profiler(self)
+
+    def disable(self):
+        """Stops profiling. The stats collected so far are kept."""
+        self.enabled = False
+        self._set_profiler(None)
+
+    def reset(self):
+        """Clears the stats collected so far."""
+        self.stats = dict()
+        self.tick_worst_secs = 0.0
+        self.tick_worst = None
+        self.worst_ticks.clear()
+
+    def _set_profiler(self, profiler):
+        self.machine.events.profiler = profiler
+        self.machine.switch_controller.profiler = profiler
+        self.machine.light_controller.profiler = profiler
+        self.machine.timing.profiler = profiler
+        Task.profiler = profiler
+        DelayManager.profiler = profiler
+
+    def record(self, category, detail, handler, start):
+        """Records a call of a handler.
+
+        Args:
+            category: String category of the handler, like 'event' or 'delay'.
+            detail: Optional extra info which is part of the key the stats are
+                recorded under, like the event name.
+            handler: The method which was called.
+            start: The time.time() the call started.
+
+        """
+        secs = time.time() - start
+        key = (category, detail, handler)
+
+        try:
+            stats = self.stats[key]
+        except KeyError:
+            stats = self.stats[key] = HandlerStats(
+                self._get_name(category, detail, handler),
+                self.config['samples'])
+
+        stats.add(secs)
+
+        if self.machine.tick_num != self.tick:
+            self._end_tick()
+            self.tick = self.machine.tick_num
+
+        if secs >= self.tick_worst_secs:
+            self.tick_worst_secs = secs
+            self.tick_worst = stats
+
+    def _end_tick(self):
+        if self.tick_worst:
+            self.tick_worst.worst_in_tick += 1
+            self.worst_ticks.append((self.tick,
+                                     round(self.tick_worst_secs * 1000, 3),
+                                     self.tick_worst.name))
+
+        self.tick_worst_secs = 0.0
+        self.tick_worst = None
+
+    def _get_name(self, category, detail, handler):
+        try:
+            obj = handler.__self__
+        except AttributeError:
+            name = getattr(handler, '__name__', repr(handler))
+        else:
+            # use the class name for objects without their own __repr__ so
+            # the names don't contain memory addresses
+            if type(obj).__repr__ is object.__repr__:
+                name = '{}.{}'.format(type(obj).__name__, handler.__name__)
+            else:
+                name = '{!r}.{}'.format(obj, handler.__name__)
+
+        if detail is not None:
+            return '{}|{}|{}'.format(category, detail, name)
+        else:
+            return '{}|{}'.format(category, name)
+
+    def get_stats(self, num=None):
+        """Returns a list of dictionaries with the stats of the profiled
+        handlers, sorted by their total time.
+
+        Args:
+            num: Optional int of how many handlers to return. Default is all
+                of them.
+
+        """
+        stats = sorted(self.stats.itervalues(), key=lambda x: x.total,
+                       reverse=True)
+
+        return [x.as_dict() for x in stats[:num]]
+
+    def log_stats(self):
+        """Writes the slowest handlers to the log and dumps all the stats to the
+        'dump_file' from the config (if there is one)."""
+        if not self.stats:
+            return
+
+        self.log.info("Handler profile (top %s by total time):",
+                      self.config['log_top'])
+
+        for stats in self.get_stats(self.config['log_top']):
+            self.log.info("%(name)s: count %(count)s, total %(total_ms)sms, "
+                          "mean %(mean_ms)sms, p99 %(p99_ms)sms, max "
+                          "%(max_ms)sms, slowest in %(worst_in_tick)s ticks",
+                          stats)
+
+        if self.config['dump_file']:
+            self.dump(self.config['dump_file'])
+
+    def dump(self, filename):
+        """Writes all the stats to a file.
+
+        Args:
+            filename: The name (and path) of the file to write.
+
+        """
+        self.log.info("Writing handler profile to %s", filename)
+
+        with open(filename, 'w') as f:
+            f.write('{:>10} {:>12} {:>10} {:>10} {:>10} {:>10}  {}\n'.format(
+                    'count', 'total ms', 'mean ms', 'p99 ms', 'max ms',
+                    'worst', 'handler'))
+
+            for stats in self.get_stats():
+                f.write('{count:>10} {total_ms:>12} {mean_ms:>10} {p99_ms:>10} '
+                        '{max_ms:>10} {worst_in_tick:>10}  {name}\n'.format(
+                        **stats))
+
+            f.write('\nSlowest handler of the last {} ticks:\n'.format(
+                    len(self.worst_ticks)))
+
+            for tick, ms, name in self.worst_ticks:
+                f.write('{:>10} {:>10}  {}\n'.format(tick, ms, name))
+
+    def bcp_send_stats(self, **kwargs):
+        """Sends the stats to the BCP hosts as a 'set' command with the JSON-
+        encoded stats as the 'profiler' parameter."""
+        self.machine.bcp.send('set', profiler=json.dumps(
+            dict(enabled=self.enabled,
+                 handlers=self.get_stats(self.config['bcp_top']),
+                 worst_ticks=list(self.worst_ticks))))
+
+
+class HandlerStats(object):
+    """Call count and run time statistics of a profiled handler."""
+
+    def __init__(self, name, samples):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.worst_in_tick = 0  # how many ticks this was the slowest handler
+        self.times = deque(maxlen=samples)  # the most recent run times
+
+    def add(self, secs):
+        self.count += 1
+        self.total += secs
+        self.times.append(secs)
+
+        if secs > self.max:
+            self.max = secs
+
+    def p99(self):
+        """Returns the 99th percentile of the recent run times."""
+        if not self.times:
+            return 0.0
+
+        times = sorted(self.times)
+        return times[min(len(times) - 1, int(len(times) * .99))]
+
+    def as_dict(self):
+        return dict(name=self.name,
+                    count=self.count,
+                    total_ms=round(self.total * 1000, 3),
+                    mean_ms=round(self.total / self.count * 1000, 3),
+                    p99_ms=round(self.p99() * 1000, 3),
+                    max_ms=round(self.max * 1000, 3),
+                    worst_in_tick=self.worst_in_tick)
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -0,0 +1,250 @@
+"""Renders looping shows into precomputed frame sequences."""
+# show_baker.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import bisect
+import math
+
+from mpf.system.show_compiler import (TOCKS, LIGHTS, LEDS, EVENTS, COILS, GIS,
+                                      FLASHERS)
+
+
+def _clamp(value):
+    return min(max(int(value), 0), 255)
+
+
+class BakedShow(object):
+    """A show rendered into one frame per machine tick at a fixed playback
+    rate.
+
+    Each frame holds the brightness of every light and the color of every LED
+    in the show, with LED fades already sampled at the tick rate. Frames are
+    bytearrays with one channel per light and three per LED, so a baked show
+    takes frames * channels bytes.
+
+    Along with the frames there's a list of the frames where something
+    changes, each with the slots that changed and the number of ticks until
+    the next change. A playing baked show only wakes up on those frames and
+    only pushes the lights and LEDs that changed.
+
+    Only shows which just set lights and LEDs can be baked. Use can_bake() to
+    check.
+
+    Args:
+        show: The loaded Show to bake.
+        tocks_per_sec: The playback rate to bake it at.
+        hz: The machine's tick rate.
+
+    """
+
+    def __init__(self, show, tocks_per_sec, hz):
+        self.tocks_per_sec = tocks_per_sec
+
+        self.slots = list()
+        """List of (device, channel, is_led) tuples, one per light and LED."""
+
+        slot_index = dict()
+        channels = 0
+
+        for light in show.light_states:
+            slot_index[light] = len(self.slots)
+            self.slots.append((light, channels, False))
+            channels += 1
+
+        for led in show.led_states:
+            slot_index[led] = len(self.slots)
+            self.slots.append((led, channels, True))
+            channels += 3
+
+        self.step_frames = list()
+        """The first frame of each step of the show."""
+
+        self.frames = list()
+        self.num_frames = self.count_frames(show, tocks_per_sec, hz)
+        self.bytes = self.num_frames * channels
+
+        # The show is rendered twice and only the second pass is kept, so the
+        # first steps start with the states and fades left over from the end
+        # of the show, like they do when a show loops.
+        state = bytearray(channels)
+        fades = dict()  # channel: (start color, color, start frame, ticks)
+        frame_num = 0
+
+        for bake_pass in (0, 1):
+            for step in show.show_steps:
+                if bake_pass:
+                    self.step_frames.append(len(self.frames))
+
+                for light, brightness in step[LIGHTS]:
+                    state[self.slots[slot_index[light]][1]] = _clamp(
+                        brightness)
+
+                for led, color, fade_tocks in step[LEDS]:
+                    channel = self.slots[slot_index[led]][1]
+                    color = bytearray(_clamp(x) for x in color)
+                    fade_ticks = fade_tocks * hz / float(tocks_per_sec)
+
+                    if fade_ticks >= 1:
+                        fades[channel] = (state[channel:channel + 3], color,
+                                          frame_num, fade_ticks)
+                    else:
+                        fades.pop(channel, None)
+                        state[channel:channel + 3] = color
+
+                for _ in xrange(self.step_ticks(step[TOCKS], tocks_per_sec,
+                                                hz)):
+
+                    # fades keep going into the next steps until they're done
+                    # or the LED is set again, like they do when played live
+                    for channel, (start, color, start_frame,
+                                  fade_ticks) in fades.items():
+                        ratio = (frame_num - start_frame) / fade_ticks
+
+                        if ratio >= 1:
+                            state[channel:channel + 3] = color
+                            del fades[channel]
+                        else:
+                            state[channel:channel + 3] = bytearray(
+                                _clamp(round(a + (b - a) * ratio))
+                                for a, b in zip(start, color))
+
+                    if bake_pass:
+                        self.frames.append(bytearray(state))
+
+                    frame_num += 1
+
+        self.changes = list()
+        """List of (frame, slots, ticks) tuples of the frames where at least
+        one light or LED changes, with the indexes of the slots that changed
+        and the number of ticks until the next change."""
+
+        previous = self.frames[-1]
+
+        for frame_num, frame in enumerate(self.frames):
+            if frame != previous:
+                self.changes.append((frame_num, tuple(
+                    i for i, (_, channel, is_led) in enumerate(self.slots)
+                    if frame[channel:channel + (3 if is_led else 1)] !=
+                    previous[channel:channel + (3 if is_led else 1)]), 0))
+            previous = frame
+
+        for i, (frame_num, slots, _) in enumerate(self.changes):
+            if i + 1 < len(self.changes):
+                next_frame = self.changes[i + 1][0]
+            else:
+                next_frame = self.changes[0][0] + self.num_frames
+
+            self.changes[i] = (frame_num, slots, next_frame - frame_num)
+
+        self._change_frames = [x[0] for x in self.changes]
+
+    @staticmethod
+    def can_bake(show):
+        """Returns None if a show can be baked, or a string of the reason why
+        it can't."""
+        for step in show.show_steps:
+            if step[EVENTS] or step[COILS] or step[GIS] or step[FLASHERS]:
+                return 'it has events, coils, GIs or flashers'
+
+        if not show.repeat or show.num_repeats:
+            return "it doesn't loop"
+
+        return None
+
+    @staticmethod
+    def step_ticks(tocks, tocks_per_sec, hz):
+        """Returns the number of ticks a step lasts. This matches how
+        Show.advance() schedules the next step on the first tick after the
+        step's tocks are up."""
+        return max(int(math.ceil(tocks * (hz / float(tocks_per_sec)))), 1)
+
+    @staticmethod
+    def count_frames(show, tocks_per_sec, hz):
+        """Returns the number of frames a show would be baked into."""
+        return sum(BakedShow.step_ticks(step[TOCKS], tocks_per_sec, hz)
+                   for step in show.show_steps)
+
+    @staticmethod
+    def count_bytes(show, tocks_per_sec, hz):
+        """Returns the number of bytes a show's frames would take."""
+        return (BakedShow.count_frames(show, tocks_per_sec, hz) *
+                (len(show.light_states) + 3 * len(show.led_states)))
+
+    def first_change(self, frame_num):
+        """Returns the index in self.changes of the first change after a
+        frame, wrapping around to the start of the show."""
+        return bisect.bisect_right(self._change_frames,
+                                   frame_num) % len(self.changes)
+
+    def step_position(self, frame_num):
+        """Returns a (step, ticks) tuple of the step a frame is in and how many
+        ticks into that step it is."""
+        step = bisect.bisect_right(self.step_frames, frame_num) - 1
+        return step, frame_num - self.step_frames[step]
+
+    def step_frame(self, step, ticks):
+        """Returns the frame which is a number of ticks into a step, limited
+        to the last frame of the step."""
+        if step + 1 < len(self.step_frames):
+            last_frame = self.step_frames[step + 1] - 1
+        else:
+            last_frame = self.num_frames - 1
+
+        return min(self.step_frames[step] + ticks, last_frame)
+
+    def apply(self, show, frame_num, slots=None):
+        """Pushes lights and LEDs from a frame to the light controller.
+
+        Args:
+            show: The show whose layers are updated.
+            frame_num: The index of the frame.
+            slots: Optional iterable of the slot indexes to push. Default is
+                None which pushes all of them.
+
+        """
+        frame = self.frames[frame_num]
+        controller = show.machine.light_controller
+
+        if slots is None:
+            slots = xrange(len(self.slots))
+
+        for slot in slots:
+            device, channel, is_led = self.slots[slot]
+
+            if is_led:
+                color = [frame[channel], frame[channel + 1],
+                         frame[channel + 2]]
+                controller._add_to_led_update_list(
+                    device, color, 0, show.priority, show.blend, show)
+                show.led_states[device]['current_color'] = color
+            else:
+                controller._add_to_light_update_list(
+                    device, frame[channel], show.priority, show.blend, show)
+                show.light_states[device] = frame[channel]
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
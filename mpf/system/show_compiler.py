@@ -0,0 +1,387 @@
+"""Compiles show files into compact timelines and caches them on disk."""
+# show_compiler.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import cPickle
+import errno
+import hashlib
+import logging
+import os
+
+from mpf.system.utility_functions import Util
+
+# Bump this whenever the compiled step layout or the parsing rules change so
+# cache files written by older versions are ignored.
+SHOW_CACHE_VERSION = 1
+
+# Show section name -> name of the machine's device collection
+DEVICE_TYPES = (('lights', 'lights'),
+                ('leds', 'leds'),
+                ('coils', 'coils'),
+                ('gis', 'gi'),
+                ('flashers', 'flashers'))
+
+# Slots of a compiled step tuple
+TOCKS, LIGHTS, LEDS, EVENTS, COILS, GIS, FLASHERS = range(7)
+
+
+class ShowCompiler(object):
+    """Turns the list of step dicts from a show file into a compact timeline.
+
+    A compiled show is a dict with two entries. 'devices' maps each device
+    type to a list of device names, and 'steps' is a list of tuples with fixed
+    slots (tocks, lights, leds, events, coils, gis, flashers) where every
+    device is referenced by its index in the matching name list:
+
+        lights: tuple of (index, brightness)
+        leds: tuple of (index, (red, green, blue), fade_tocks)
+        events: tuple of event names
+        coils: tuple of (index, action, power)
+        gis: tuple of (index, brightness)
+        flashers: tuple of index
+
+    Tags are expanded and values converted when the show is compiled, and
+    the result only holds names, ints, floats and strings so it can be
+    pickled to the show cache. resolve() swaps the indexes for the device
+    objects of the running machine.
+
+    Args:
+        machine: The main MachineController object.
+        log: The logger used to report invalid device names.
+    """
+
+    def __init__(self, machine, log=None):
+        self.machine = machine
+
+        if log:
+            self.log = log
+        else:
+            self.log = logging.getLogger('ShowCompiler')
+
+    def compile(self, show_actions):
+        """Compiles a list of step dicts into a compiled show dict."""
+        devices = dict()
+        indexes = dict()
+
+        for device_type, _ in DEVICE_TYPES:
+            devices[device_type] = list()
+            indexes[device_type] = dict()
+
+        steps = list()
+
+        for step in show_actions:
+            compiled_step = (
+                step['tocks'],
+                self._compile_lights(step.get('lights'), devices, indexes),
+                self._compile_leds(step.get('leds'), devices, indexes),
+                tuple(Util.string_to_list(step.get('events'))),
+                self._compile_coils(step.get('coils'), devices, indexes),
+                self._compile_gis(step.get('gis'), devices, indexes),
+                self._compile_flashers(step.get('flashers'), devices,
+                                       indexes))
+
+            # empty steps just add their tocks to the previous step
+            if steps and not any(compiled_step[LIGHTS:]):
+                steps[-1] = (steps[-1][TOCKS] + compiled_step[TOCKS],) + \
+                    steps[-1][LIGHTS:]
+            else:
+                steps.append(compiled_step)
+
+        return dict(devices=devices, steps=steps)
+
+    def resolve(self, compiled):
+        """Returns the steps of a compiled show with the device indexes
+        replaced by the device objects."""
+        objects = dict()
+
+        for device_type, collection in DEVICE_TYPES:
+            objects[device_type] = [
+                getattr(self.machine, collection)[name]
+                for name in compiled['devices'][device_type]]
+
+        lights = objects['lights']
+        leds = objects['leds']
+        coils = objects['coils']
+        gis = objects['gis']
+        flashers = objects['flashers']
+
+        return [(tocks,
+                 tuple((lights[i], value) for i, value in step_lights),
+                 tuple((leds[i], color, fade) for i, color, fade in step_leds),
+                 events,
+                 tuple((coils[i], (action, power))
+                       for i, action, power in step_coils),
+                 tuple((gis[i], value) for i, value in step_gis),
+                 tuple(flashers[i] for i in step_flashers))
+                for (tocks, step_lights, step_leds, events, step_coils,
+                     step_gis, step_flashers) in compiled['steps']]
+
+    def _lookup(self, device_type, collection, name):
+        # Returns the list of device names that a show entry refers to
+        devices = getattr(self.machine, collection, None)
+
+        if devices is None:
+            return []
+
+        if 'tag|' in name:
+            return [x.name for x in devices.items_tagged(name.split('tag|')[1])]
+
+        try:
+            return [devices[name].name]
+        except KeyError:
+            self.log.warning("Found invalid %s name '%s' in show. "
+                             "Skipping...", device_type[:-1], name)
+            return []
+
+    def _index(self, device_type, name, devices, indexes):
+        try:
+            return indexes[device_type][name]
+        except KeyError:
+            indexes[device_type][name] = len(devices[device_type])
+            devices[device_type].append(name)
+            return indexes[device_type][name]
+
+    def _brightness(self, value):
+        if type(value) is str:
+            value = Util.hex_string_to_int(value)
+
+        if type(value) is int and value > 255:
+            value = 255
+
+        return value
+
+    def _compile_lights(self, config, devices, indexes):
+        if not config:
+            return ()
+
+        actions = dict()
+
+        for light, value in config.iteritems():
+            value = self._brightness(value)
+
+            for name in self._lookup('lights', 'lights', light):
+                actions[self._index('lights', name, devices, indexes)] = value
+
+        return tuple(sorted(actions.iteritems()))
+
+    def _compile_gis(self, config, devices, indexes):
+        if not config:
+            return ()
+
+        actions = dict()
+
+        for gi, value in config.iteritems():
+            value = self._brightness(value)
+
+            for name in self._lookup('gis', 'gi', gi):
+                actions[self._index('gis', name, devices, indexes)] = value
+
+        return tuple(sorted(actions.iteritems()))
+
+    def _compile_leds(self, config, devices, indexes):
+        if not config:
+            return ()
+
+        actions = dict()
+
+        for led, value in config.iteritems():
+
+            # a color is either a list of [r, g, b, fade_tocks] or a hex
+            # string with an optional fade, like ff0000-f2
+            if type(value) is list:
+                value = (list(value) + [0] * 4)[:4]
+                color = tuple(int(x) for x in value[:3])
+                fade = int(value[3])
+            else:
+                value = str(value).split('-f')
+                color = tuple(Util.hex_string_to_list(value[0]))
+
+                if len(value) > 1:
+                    fade = int(value[1])
+                else:
+                    fade = 0
+
+            for name in self._lookup('leds', 'leds', led):
+                actions[self._index('leds', name, devices, indexes)] = (
+                    color, fade)
+
+        return tuple((index, color, fade) for index, (color, fade) in
+                     sorted(actions.iteritems()))
+
+    def _compile_coils(self, config, devices, indexes):
+        if not config:
+            return ()
+
+        actions = dict()
+
+        for coil, value in config.iteritems():
+
+            # split the value on '-p' to look for a power setting
+            value = value.split('-p')
+
+            if len(value) == 1:
+                power = 1.0
+            else:
+                # convert the 0-100 value to 0.0-1.0 float
+                power = float(value[1]) / 100.0
+
+            for name in self._lookup('coils', 'coils', coil):
+                actions[self._index('coils', name, devices, indexes)] = (
+                    value[0], power)
+
+        return tuple((index, action, power) for index, (action, power) in
+                     sorted(actions.iteritems()))
+
+    def _compile_flashers(self, config, devices, indexes):
+        if not config:
+            return ()
+
+        flashers = set()
+
+        for flasher in Util.string_to_list(config):
+            for name in self._lookup('flashers', 'flashers', flasher):
+                flashers.add(self._index('flashers', name, devices, indexes))
+
+        return tuple(sorted(flashers))
+
+
+class ShowCache(object):
+    """Stores compiled shows on disk so they don't have to be parsed from
+    YAML every time MPF starts.
+
+    Each show file gets its own cache file in the folder set in the
+    mpf:paths:show_cache setting. A cache file is only used if the show file's
+    modification time and the hash of the machine's device config both match
+    the ones it was written with. Set the path to an empty value to disable
+    the cache.
+
+    Args:
+        machine: The main MachineController object.
+    """
+
+    def __init__(self, machine):
+        self.machine = machine
+        self.log = logging.getLogger('ShowCache')
+        self._config_hash = None
+
+        path = machine.config['mpf']['paths'].get('show_cache')
+
+        if path:
+            self.path = os.path.join(machine.machine_path, path)
+        else:
+            self.path = None
+
+    @property
+    def config_hash(self):
+        """An md5 hex digest of the device names and tags that compiled
+        shows depend on.
+
+        This is calculated the first time it's needed since shows are loaded
+        after all the devices have been created.
+        """
+        if not self._config_hash:
+            md5 = hashlib.md5()
+            md5.update(str(SHOW_CACHE_VERSION))
+
+            for device_type, collection in DEVICE_TYPES:
+                md5.update(device_type)
+
+                for device in sorted(getattr(self.machine, collection, None)
+                                     or [], key=lambda x: x.name):
+                    md5.update('{}:{}'.format(device.name,
+                                              ','.join(sorted(device.tags))))
+
+            self._config_hash = md5.hexdigest()
+
+        return self._config_hash
+
+    def cache_file(self, file_name):
+        """Returns the name of the cache file for a show file."""
+        file_name = os.path.abspath(file_name)
+
+        return os.path.join(self.path, '{}-{}.cache'.format(
+            os.path.splitext(os.path.basename(file_name))[0],
+            hashlib.md5(file_name).hexdigest()[:8]))
+
+    def load(self, file_name):
+        """Returns the compiled show for a show file, or None if there is no
+        valid cache file for it."""
+        if not self.path:
+            return None
+
+        try:
+            mtime = os.path.getmtime(file_name)
+
+            with open(self.cache_file(file_name), 'rb') as f:
+                cached = cPickle.load(f)
+
+        except (IOError, OSError, EOFError, cPickle.UnpicklingError):
+            return None
+
+        if (type(cached) is not dict or
+                cached.get('version') != SHOW_CACHE_VERSION or
+                cached.get('mtime') != mtime or
+                cached.get('config_hash') != self.config_hash):
+            return None
+
+        return cached['show']
+
+    def save(self, file_name, compiled):
+        """Writes the compiled show for a show file to the cache."""
+        if not self.path:
+            return
+
+        cache_file = self.cache_file(file_name)
+        temp_file = cache_file + '.tmp'
+
+        try:
+            os.makedirs(self.path)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                self.log.warning("Unable to create show cache folder %s: %s",
+                                 self.path, exception)
+                return
+
+        try:
+            with open(temp_file, 'wb') as f:
+                cPickle.dump(dict(version=SHOW_CACHE_VERSION,
+                                  mtime=os.path.getmtime(file_name),
+                                  config_hash=self.config_hash,
+                                  show=compiled),
+                             f, cPickle.HIGHEST_PROTOCOL)
+
+            if os.name == 'nt' and os.path.exists(cache_file):
+                os.remove(cache_file)
+
+            os.rename(temp_file, cache_file)
+
+        except (IOError, OSError) as exception:
+            self.log.warning("Unable to write show cache file %s: %s",
+                             cache_file, exception)
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
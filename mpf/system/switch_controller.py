@@ -14,7 +14,7 @@ from collections import defaultdict
 import time
 
 from mpf.system.config import CaseInsensitiveDict
-from mpf.system.timing import Timing
+from mpf.system.timing import Timing, Scheduler
 from mpf.system.utility_functions import Util
 
 
@@ -39,13 +39,30 @@ class SwitchController(object):
         # Dictionary of switches that are currently in a state counting ms
         # waiting to notify their handlers. In other words, this is the dict that
         # tracks current switches for things like "do foo() if switch bar is
-        # active for 100ms."
+        # active for 100ms." Keys are lowercase switch names, values are lists
+        # of the pending timed handlers for that switch.
+
+        self.timed_switch_scheduler = Scheduler()
+        # Heap of the pending timed switch handlers ordered by the time they
+        # should be called.
 
         self.switches = CaseInsensitiveDict()
         # Dictionary which holds the master list of switches as well as their
         # current states. State here does factor in whether a switch is NO or NC,
         # so 1 = active and 0 = inactive.
 
+        self.switches_by_number = dict()
+        # Dictionary of {platform: {hw number: switch object}} which is used to
+        # find switches when a platform reports a switch change by number.
+        # It's per platform since numbers can collide across platforms.
+
+        self.ingestion_latency = 0.0
+        self.max_ingestion_latency = 0.0
+        self.total_ingestion_latency = 0.0
+        self.ingestion_latency_count = 0
+        # Seconds between the time a platform timestamped a switch change and
+        # the time the switch controller processed it
+
         self.switch_event_active = (
             self.machine.config['mpf']['switch_event_active'])
         self.switch_event_inactive = (
@@ -54,7 +71,7 @@ class SwitchController(object):
             self.machine.config['mpf']['switch_tag_event'])
 
         # register for events
-        self.machine.events.add_handler('timer_tick', self._tick, 1000)
+        self.machine.timing.add_tick_subscriber(self._tick, 1000)
         self.machine.events.add_handler('init_phase_2',
                                         self._initialize_switches,
                                         1000)
@@ -64,11 +81,14 @@ class SwitchController(object):
                                         self.log_active_switches)
 
         self.monitors = list()
+        self.profiler = None
 
     def _initialize_switches(self):
         self.update_switches_from_hw()
 
         for switch in self.machine.switches:
+            self._index_switch(switch)
+
             # Populate self.switches
             self.set_state(switch.name, switch.state, reset_time=True)
 
@@ -226,12 +246,23 @@ class SwitchController(object):
 
         return time.time() - self.switches[switch_name]['time']
 
-    def set_state(self, switch_name, state=1, reset_time=False):
-        """Sets the state of a switch."""
+    def set_state(self, switch_name, state=1, reset_time=False,
+                  timestamp=None):
+        """Sets the state of a switch.
+
+        Args:
+            switch_name: String name of the switch.
+            state: The logical state of the switch.
+            reset_time: If True, the time of this change is set to the distant
+                past.
+            timestamp: Optional time.time()-based time the switch changed. If
+                this isn't passed, the current time is used.
+
+        """
 
         if reset_time:
             timestamp = 1
-        else:
+        elif timestamp is None:
             timestamp = time.time()
 
         self.switches.update({switch_name: {'state': state,
@@ -243,8 +274,42 @@ class SwitchController(object):
         # rid of it, or move the switch device settings from process_switch()
         # to here.
 
+    def _index_switch(self, switch):
+        self.switches_by_number.setdefault(switch.platform, dict())[
+            switch.number] = switch
+
+    def get_switch_by_number(self, num, platform=None):
+        """Returns the switch object for a hardware switch number.
+
+        Args:
+            num: The hardware number of the switch.
+            platform: Optional platform object which reported the switch. If
+                it's not passed, the switches of all platforms are searched.
+
+        Returns:
+            The switch object, or None if there's no switch with that number.
+
+        """
+        if platform:
+            try:
+                return self.switches_by_number[platform][num]
+            except KeyError:
+                pass
+        else:
+            for numbers in self.switches_by_number.itervalues():
+                if num in numbers:
+                    return numbers[num]
+
+        # Not in the index (yet), so this could be a switch which was created
+        # after the switches were initialized
+        for switch in self.machine.switches:
+            if switch.number == num and (not platform or
+                                         switch.platform is platform):
+                self._index_switch(switch)
+                return switch
+
     def process_switch(self, name=None, state=1, logical=False, num=None,
-                       obj=None, debounced=True):
+                       obj=None, debounced=True, platform=None, timestamp=None):
         """Processes a new switch state change.
 
         Args:
@@ -265,6 +330,13 @@ class SwitchController(object):
             obj: The switch object.
             debounced: Whether or not the update for the switch you're sending
                 has been debounced or not. Default is True
+            platform: Optional platform object which is reporting the switch
+                change. Only used with 'num' to look up the switch in that
+                platform's switch numbers.
+            timestamp: Optional time.time()-based time the switch actually
+                changed, captured by the platform as soon as it received the
+                change. If passed, it's used for the switch's change time and
+                timed switch handlers instead of the time this method runs.
 
         Note that there are three different paramter options to specify the
         switch: 'name', 'num', and 'obj'. You only need to pass one of them.
@@ -287,11 +359,9 @@ class SwitchController(object):
         # Find the switch name
 
         if num is not None:  # can't be 'if num:` in case the num is 0.
-            for switch in self.machine.switches:
-                if switch.number == num:
-                    name = switch.name
-                    obj = switch
-                    break
+            obj = self.get_switch_by_number(num, platform)
+            if obj:
+                name = obj.name
 
         elif obj:
             name = obj.name
@@ -336,12 +406,143 @@ class SwitchController(object):
             if obj.config['debounce']:
                 return
 
+        timestamp = self._check_timestamp(obj, timestamp)
+
+        if not self._update_switch_state(obj, state, hw_state, timestamp):
+            return
+
+        self.log.info("<<<<< switch: %s, State:%s >>>>>", obj.name, state)
+
+        self._switch_changed(obj.name, state, timestamp)
+
+    def process_switch_batch(self, events, platform=None):
+        """Processes a list of switch state changes which were reported by a
+        hardware platform by number.
+
+        Args:
+            events: List of (num, state, debounced, timestamp) tuples in the
+                order the hardware reported them. 'num' is the hardware
+                number of the switch, 'state' is the physical (logical=False)
+                state, 'debounced' is whether the hardware debounced this
+                change, and 'timestamp' is the optional time.time()-based time
+                the platform received this change (or None). See
+                process_switch() for details.
+            platform: Optional platform object which reported these changes.
+                Used to look up the switch numbers.
+
+        This does the same thing as calling process_switch() for each event,
+        except that each switch number is only looked up once, repeated
+        reports of the same state for a switch are coalesced, and the switch
+        changes are logged with a single entry for the whole batch. The
+        handlers for each change are still called in the order the changes
+        were reported.
+
+        """
+        switches = dict()  # num: switch object
+        last_states = dict()  # switch object: last reported hw state
+        changes = list()
+
+        for num, state, debounced, timestamp in events:
+
+            try:
+                obj = switches[num]
+            except KeyError:
+                obj = switches[num] = self.get_switch_by_number(num, platform)
+
+            if not obj:
+                self.log.warning("Received a state change from non-configured "
+                                 "switch. Number: %s", num)
+                continue
+
+            if not debounced and obj.config['debounce']:
+                continue
+
+            if state:
+                state = 1
+            else:
+                state = 0
+
+            if last_states.get(obj) == state:
+                continue
+
+            last_states[obj] = state
+
+            changes.append((obj, state ^ obj.invert, state, timestamp))
+
+        changed = list()
+
+        for obj, state, hw_state, timestamp in changes:
+            timestamp = self._check_timestamp(obj, timestamp)
+
+            if self._update_switch_state(obj, state, hw_state, timestamp):
+                changed.append((obj.name, state))
+                self._switch_changed(obj.name, state, timestamp)
+
+        if changed:
+            self.log.info("<<<<< switches: %s >>>>>",
+                          ', '.join('{}:{}'.format(name, state)
+                                    for name, state in changed))
+
+    def _check_timestamp(self, obj, timestamp):
+        # Records the ingestion latency of a switch change which came in with a
+        # platform timestamp. Returns the timestamp to use for the change,
+        # which is None if the platform didn't send one.
+
+        if timestamp is None:
+            return None
+
+        latency = time.time() - timestamp
+
+        if latency < 0:  # clocks don't go backwards, so don't trust this one
+            return None
+
+        obj.hw_timestamp = timestamp
+
+        self.ingestion_latency = latency
+        self.total_ingestion_latency += latency
+        self.ingestion_latency_count += 1
+
+        if latency > self.max_ingestion_latency:
+            self.max_ingestion_latency = latency
+
+        return timestamp
+
+    def get_ingestion_latency(self):
+        """Returns a dictionary with the average, max and most recent number of
+        ms between the time the hardware platforms received switch changes and
+        the time the switch controller processed them, and the number of
+        switch changes this was measured for.
+
+        Only switch changes which came in with a platform timestamp are
+        included.
+
+        """
+        if self.ingestion_latency_count:
+            avg = (self.total_ingestion_latency / self.ingestion_latency_count)
+        else:
+            avg = 0.0
+
+        return dict(avg_ms=round(avg * 1000, 2),
+                    max_ms=round(self.max_ingestion_latency * 1000, 2),
+                    last_ms=round(self.ingestion_latency * 1000, 2),
+                    count=self.ingestion_latency_count)
+
+    def log_ingestion_latency(self):
+        if self.ingestion_latency_count:
+            self.log.info("Switch ingestion latency: %s",
+                          self.get_ingestion_latency())
+
+    def _update_switch_state(self, obj, state, hw_state, timestamp=None):
+        # Updates the switch object with a new state. Returns True if the
+        # logical state of the switch changed and its handlers and events need
+        # to be processed.
+
         # Update the hardware state since we always want this to match real hw
         obj.hw_state = hw_state
 
         # if the switch is active, check to see if it's recycle_time has passed
         if state and not self._check_recycle_time(obj, state):
-            return
+            return False
 
         obj.state = state  # update the switch device
 
@@ -349,6 +550,8 @@ class SwitchController(object):
             # update the switch's next recycle clear time
             obj.recycle_clear_tick = Timing.tick + obj.recycle_ticks
 
+        name = obj.name
+
         # if the switch is already in this state, then abort
         if self.switches[name]['state'] == state:
 
@@ -359,16 +562,26 @@ class SwitchController(object):
                               "indicate noise or interference on the line. Switch: %s",
                               name)
 
-            return
-
-        self.log.info("<<<<< switch: %s, State:%s >>>>>", name, state)
+            return False
 
         # Update the switch controller's logical state for this switch
-        self.set_state(name, state)
+        self.set_state(name, state, timestamp=timestamp)
+
+        return True
+
+    def _switch_changed(self, name, state, timestamp=None):
+        # Calls the handlers, monitors and events for a switch which changed
+        # to this state. Timed handlers are due 'ms' after the timestamp of
+        # the change if there is one, or after now if not.
+
+        if timestamp is None:
+            timestamp = time.time()
 
         # Combine name & state so we can look it up
         switch_key = str(name) + '-' + str(state)
 
+        profiler = self.profiler
+
         # Do we have any registered handlers for this switch/state combo?
         if switch_key in self.registered_switches:
             for entry in self.registered_switches[switch_key]:  # generator?
@@ -377,21 +590,24 @@ class SwitchController(object):
                 if entry['ms']:
                     # This entry is for a timed switch, so add it to our
                     # active timed switch list
-                    key = time.time() + (entry['ms'] / 1000.0)
-                    value = {'switch_action': str(name) + '-' + str(state),
+                    key = timestamp + (entry['ms'] / 1000.0)
+                    value = {'switch_action': switch_key,
                              'callback': entry['callback'],
                              'switch_name': name,
                              'state': state,
                              'ms': entry['ms'],
                              'return_info': entry['return_info'],
                              'callback_kwargs': entry['callback_kwargs']}
-                    self.active_timed_switches[key].append(value)
+                    self._add_timed_switch_handler(key, value)
                     self.log.debug(
                         "Found timed switch handler for k/v %s / %s",
                         key, value)
                 else:
                     # This entry doesn't have a timed delay, so do the action
                     # now
+                    if profiler:
+                        start = time.time()
+
                     if entry['return_info']:
 
                         entry['callback'](switch_name=name, state=state, ms=0,
@@ -401,17 +617,13 @@ class SwitchController(object):
 
                         # todo need to add args and kwargs support to callback
 
+                    if profiler:
+                        profiler.record('switch', switch_key,
+                                        entry['callback'], start)
+
         # now check if the opposite state is in the active timed switches list
         # if so, remove it
-        for k, v, in self.active_timed_switches.items():
-            # using items() instead of iteritems() since we might want to
-            # delete while iterating
-
-            for item in v:
-                if item['switch_action'] == str(name) + '-' + str(state ^ 1):
-                    # ^1 in above line invertes the state
-                    if self.active_timed_switches[k]:
-                        del self.active_timed_switches[k]
+        self._cancel_timed_switch_handlers(name, state ^ 1)
 
         for monitor in self.monitors:
             monitor(name, state)
@@ -488,7 +700,7 @@ class SwitchController(object):
                              'ms': ms,
                              'return_info': return_info,
                              'callback_kwargs': callback_kwargs}
-                    self.active_timed_switches[key].append(value)
+                    self._add_timed_switch_handler(key, value)
             elif state == 0:
                 if self.is_inactive(switch_name, 0) and (
                             self.ms_since_change(switch_name) < ms):
@@ -502,7 +714,7 @@ class SwitchController(object):
                              'ms': ms,
                              'return_info': return_info,
                              'callback_kwargs': callback_kwargs}
-                    self.active_timed_switches[key].append(value)
+                    self._add_timed_switch_handler(key, value)
 
         # Return the args we used to setup this handler for easy removal later
         return {'switch_name': switch_name,
@@ -581,30 +793,70 @@ class SwitchController(object):
                     self.machine.switches[switch_name].deactivation_events):
                 self.machine.events.post(event)
 
+    def _add_timed_switch_handler(self, key, value):
+        # Schedules a timed switch handler to be called at time 'key'
+        value['entry'] = self.timed_switch_scheduler.add(
+            key, self._call_timed_switch_handler, value)
+        self.active_timed_switches[value['switch_name'].lower()].append(value)
+
+    def _cancel_timed_switch_handlers(self, switch_name, state):
+        # Cancels the pending timed handlers of this switch for this state
+        switch_name = switch_name.lower()
+
+        if switch_name not in self.active_timed_switches:
+            return
+
+        remaining = list()
+
+        for value in self.active_timed_switches[switch_name]:
+            if value['state'] == state:
+                self.timed_switch_scheduler.cancel(value['entry'])
+            else:
+                remaining.append(value)
+
+        if remaining:
+            self.active_timed_switches[switch_name] = remaining
+        else:
+            del self.active_timed_switches[switch_name]
+
+    def _call_timed_switch_handler(self, entry):
+        switch_name = entry['switch_name'].lower()
+
+        self.active_timed_switches[switch_name].remove(entry)
+        if not self.active_timed_switches[switch_name]:
+            del self.active_timed_switches[switch_name]
+
+        self.log.debug(
+            "Processing timed switch handler. Switch: %s "
+            " State: %s, ms: %s", entry['switch_name'],
+            entry['state'], entry['ms'])
+
+        profiler = self.profiler
+
+        if profiler:
+            start = time.time()
+
+        if entry['return_info']:
+            entry['callback'](switch_name=entry['switch_name'],
+                              state=entry['state'],
+                              ms=entry['ms'],
+                              **entry['callback_kwargs'])
+        else:
+            entry['callback'](**entry['callback_kwargs'])
+
+        if profiler:
+            profiler.record('timed_switch', entry['switch_action'],
+                            entry['callback'], start)
+
     def _tick(self):
         """Called once per machine tick.
 
-        Checks the current list of active timed switches to see if it's
-        time to take action on any of them. If so, does the callback and then
-        removes that entry from the list.
+        Calls the active timed switch handlers which are due. The handlers are
+        kept in a heap ordered by the time they're due, so this only touches
+        the handlers which are called this tick.
 
         """
-
-        for k in self.active_timed_switches.keys():
-            if k <= time.time():  # change to generator?
-                for entry in self.active_timed_switches[k]:
-                    self.log.debug(
-                        "Processing timed switch handler. Switch: %s "
-                        " State: %s, ms: %s", entry['switch_name'],
-                        entry['state'], entry['ms'])
-                    if entry['return_info']:
-                        entry['callback'](switch_name=entry['switch_name'],
-                                          state=entry['state'],
-                                          ms=entry['ms'],
-                                          **entry['callback_kwargs'])
-                    else:
-                        entry['callback'](**entry['callback_kwargs'])
-                del self.active_timed_switches[k]
+        self.timed_switch_scheduler.run(time.time())
 
 # The MIT License (MIT)
 
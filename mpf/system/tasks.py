@@ -6,10 +6,11 @@
 # Documentation and more info at http://missionpinball.com/mpf
 
 import logging
-from copy import copy
 import time
 import uuid
 
+from mpf.system.timing import Scheduler
+
 
 class Task(object):
     """A task/coroutine implementation.
@@ -25,7 +26,9 @@ class Task(object):
     """
 
     Tasks = set()
-    NewTasks = set()
+    NewTasks = list()
+    scheduler = Scheduler()
+    profiler = None
 
     def __init__(self, callback, args=None, name=None, sleep=0):
         self.callback = callback
@@ -33,6 +36,7 @@ class Task(object):
         self.wakeup = None
         self.name = name
         self.gen = None
+        self._entry = None
 
         if sleep:
             self.wakeup = time.time() + sleep
@@ -42,6 +46,9 @@ class Task(object):
         self.wakeup = None
         self.gen = None
 
+        if self._entry:
+            self._schedule()
+
     def stop(self):
         """Stops the task.
 
@@ -49,6 +56,10 @@ class Task(object):
         and then deleting it."""
         Task.Tasks.remove(self)
 
+        if self._entry:
+            Task.scheduler.cancel(self._entry)
+            self._entry = None
+
     def __repr__(self):
         return "callback=" + str(self.callback) + " wakeup=" + str(self.wakeup)
 
@@ -56,55 +67,75 @@ class Task(object):
     def create(callback, args=tuple(), sleep=0):
         """Creates a new task and insert it into the runnable set."""
         task = Task(callback=callback, args=args, sleep=sleep)
-        Task.NewTasks.add(task)
+        Task.NewTasks.append(task)
         return task
 
     @staticmethod
     def timer_tick():
-        """Scans all tasks now and run those that are ready."""
-        dead_tasks = []
-        for task in Task.Tasks:
-            if not task.wakeup or task.wakeup <= time.time():
-                if task.gen:
+        """Runs the tasks which are ready now."""
+        Task.scheduler.run(time.time())
+
+        # We need to queue the addition of new tasks because tasks created
+        # while we're running the current ones should not start until the next
+        # tick.
+        new_tasks = Task.NewTasks
+        Task.NewTasks = list()
+
+        for task in new_tasks:
+            Task.Tasks.add(task)
+            task._schedule()
+
+    def _schedule(self):
+        if self._entry:
+            Task.scheduler.cancel(self._entry)
+
+        # A task with no wakeup time runs on the next tick
+        self._entry = Task.scheduler.add(self.wakeup or 0, self._run)
+
+    def _run(self):
+        # Called by the scheduler when this task's wakeup time has passed
+        self._entry = None
+
+        if self.gen:
+            try:
+                profiler = Task.profiler
+
+                if profiler:
+                    start = time.time()
                     try:
-                        rc = next(task.gen)
-                        if rc:
-                            task.wakeup = time.time() + rc
-                    except StopIteration:
-                        dead_tasks.append(task)
+                        rc = next(self.gen)
+                    finally:
+                        profiler.record('task', None, self.callback, start)
                 else:
-                    task.wakeup = time.time()
-                    task.gen = task.callback(*task.args)
-        for task in dead_tasks:
-            Task.Tasks.remove(task)
-        # We need to queue the addition to new tasks to the set because if we
-        # get a new task while we're iterating above then our set size will
-        # change while iterating and produce an error.
-        for task in Task.NewTasks:
-            Task.Tasks.add(task)
-        Task.NewTasks = set()
+                    rc = next(self.gen)
+                if rc:
+                    self.wakeup = time.time() + rc
+            except StopIteration:
+                Task.Tasks.discard(self)
+                return
+        else:
+            self.wakeup = time.time()
+            self.gen = self.callback(*self.args)
+
+        # The task could have been stopped or restarted while it was running
+        if self in Task.Tasks and not self._entry:
+            self._schedule()
 
 
 class DelayManager(object):
-    """Parent class for a delay manager which can manage multiple delays."""
+    """Parent class for a delay manager which can manage multiple delays.
 
-    delay_managers = set()
-    dead_delay_managers = set()
+    Each module that needs delays has its own DelayManager (so it's easy to
+    wipe all the delays that a single module created), but the delays from all
+    of them are kept in a single scheduler which is shared by the whole system.
+    """
 
-    # todo it might not make sense to keep each DelayManager as a separate
-    # class instance. It makes iterating complex and doesn't really add any
-    # value? (Well, apart from it's easy to wipe all the delays that a single
-    # module created.) But it might be faster to just have a single delay
-    # manager for the whole system. Then again, we're only iterating at a
-    # relatively slow loop rate.
+    scheduler = Scheduler()
+    profiler = None
 
     def __init__(self):
         self.log = logging.getLogger("DelayManager")
-        self.delays = {}
-        DelayManager.delay_managers.add(self)
-
-    def __del__(self):
-        DelayManager.dead_delay_managers.add(self)  # todo I don't like this
+        self.delays = {}  # k: delay name, v: scheduler entry
 
     def add(self, ms, callback, name=None, **kwargs):
         """Adds a delay.
@@ -133,9 +164,14 @@ class DelayManager(object):
 
         self.log.debug("Adding delay. Name: '%s' ms: %s, callback: %s, "
                        "kwargs: %s", name, ms, callback, kwargs)
-        self.delays[name] = ({'action_ms': time.time() + (ms / 1000.0),
-                              'callback': callback,
-                              'kwargs': kwargs})
+
+        # Adding a delay with the name of an existing one replaces it
+        if name in self.delays:
+            DelayManager.scheduler.cancel(self.delays[name])
+
+        self.delays[name] = DelayManager.scheduler.add(
+            time.time() + (ms / 1000.0), self._process_delay, name, callback,
+            kwargs)
 
         return name
 
@@ -150,8 +186,8 @@ class DelayManager(object):
 
         self.log.debug("Removing delay: '%s'", name)
         try:
-            del self.delays[name]
-        except:
+            DelayManager.scheduler.cancel(self.delays.pop(name))
+        except KeyError:
             pass
 
     def check(self, delay):
@@ -177,34 +213,37 @@ class DelayManager(object):
 
     def clear(self):
         """Removes (clears) all the delays associated with this DelayManager."""
+        for entry in self.delays.itervalues():
+            DelayManager.scheduler.cancel(entry)
+
         self.delays = {}
 
-    def _process_delays(self):
-        # Processes any delays that should fire now
-        for delay in self.delays.keys():
-            if self.delays[delay]['action_ms'] <= time.time():
-                # Delete the delay first in case the processing of it adds a
-                # new delay with the same name. If we delete as the final step
-                # then we'll inadvertantly delete the newly-set delay
-                this_delay = copy(self.delays[delay])
-                del self.delays[delay]
-                self.log.debug("---Processing delay: %s", this_delay)
-                if this_delay['kwargs']:
-                    this_delay['callback'](**this_delay['kwargs'])
-                else:
-                    this_delay['callback']()
+    def _process_delay(self, name, callback, kwargs):
+        # Called by the scheduler when a delay is due.
+
+        # Delete the delay first in case the processing of it adds a new delay
+        # with the same name. If we delete as the final step then we'll
+        # inadvertantly delete the newly-set delay
+        del self.delays[name]
+        self.log.debug("---Processing delay: %s", name)
+
+        profiler = DelayManager.profiler
+
+        if profiler:
+            start = time.time()
+
+        if kwargs:
+            callback(**kwargs)
+        else:
+            callback()
+
+        if profiler:
+            profiler.record('delay', None, callback, start)
 
     @staticmethod
     def timer_tick():
-        # This is kind of complex because we have to account for a delay
-        # manager being deleted while we're iterating.
-        live_delay_managers = set()
-        while DelayManager.delay_managers:
-            i = DelayManager.delay_managers.pop()
-            if i not in DelayManager.dead_delay_managers:
-                i._process_delays()
-                live_delay_managers.add(i)
-        DelayManager.delay_managers = live_delay_managers
+        DelayManager.scheduler.run(time.time())
+
 
 # The MIT License (MIT)
 
@@ -6,6 +6,8 @@
 
 # Documentation and more info at http://missionpinball.com/mpf
 
+import heapq
+import itertools
 import logging
 import time
 
@@ -34,9 +36,11 @@ class Timing(object):
 
     def __init__(self, machine):
 
-        self.timers = set()
-        self.timers_to_remove = set()
-        self.timers_to_add = set()
+        self.timers = dict()  # k: Timer, v: Scheduler entry
+        self.scheduler = Scheduler()
+        self.tick_subscribers = list()
+        self.tick_dispatch = tuple()
+        self.profiler = None
         self.log = logging.getLogger("Timing")
         self.machine = machine
 
@@ -50,31 +54,106 @@ class Timing(object):
         Timing.ms_per_tick = 1000 * Timing.secs_per_tick
 
     def add(self, timer):
+        self.remove(timer)
         timer.wakeup = time.time() + timer.frequency
-        self.timers_to_add.add(timer)
+        self.timers[timer] = self.scheduler.add(timer.wakeup, self._call_timer,
+                                                timer)
 
     def remove(self, timer):
-        self.timers_to_remove.add(timer)
+        try:
+            self.scheduler.cancel(self.timers.pop(timer))
+        except KeyError:
+            pass
+
+    def add_tick_subscriber(self, callback, priority=1, divider=1):
+        """Registers a method which will be called every machine tick.
+
+        Tick subscribers are called directly by the timing module right after
+        the timers have been processed, so they skip the event queue, the
+        event monitors and the kwargs handling of the 'timer_tick' event. (The
+        'timer_tick' event is still posted each tick.)
+
+        Args:
+            callback: The method that will be called. It's called without any
+                arguments.
+            priority: Subscribers with higher priorities are called first.
+                Subscribers with the same priority are called in the order they
+                were added. Default is 1.
+            divider: Integer which lets this subscriber run less often than
+                every tick. A divider of 2 means the callback is called every
+                2nd tick, 3 every 3rd tick, etc. Default is 1.
+
+        If this callback is already subscribed, the existing subscription is
+        replaced.
+
+        """
+        self.remove_tick_subscriber(callback)
+
+        divider = max(int(divider), 1)
+
+        # insert after existing subscribers with the same or higher priority
+        index = len(self.tick_subscribers)
+        while index and self.tick_subscribers[index - 1][1] < priority:
+            index -= 1
+        self.tick_subscribers.insert(index, (callback, priority, divider))
+
+        self._compile_tick_subscribers()
+
+    def remove_tick_subscriber(self, callback):
+        """Removes a tick subscriber.
+
+        Args:
+            callback: The method which was registered.
+
+        This method can safely be called even if this callback is not
+        subscribed.
+
+        """
+        subscribers = [x for x in self.tick_subscribers if x[0] != callback]
+
+        if len(subscribers) != len(self.tick_subscribers):
+            self.tick_subscribers = subscribers
+            self._compile_tick_subscribers()
+
+    def _compile_tick_subscribers(self):
+        self.tick_dispatch = tuple((x[0], x[2]) for x in self.tick_subscribers)
 
     def timer_tick(self):
-        global tick
         Timing.tick += 1
-        for timer in self.timers:
-            if timer.wakeup and timer.wakeup <= time.time():
-                timer.call()
-                if timer.frequency:
-                    timer.wakeup += timer.frequency
+        self.scheduler.run(time.time())
+
+        tick = Timing.tick
+        profiler = self.profiler
+
+        for callback, divider in self.tick_dispatch:
+            if divider == 1 or not tick % divider:
+                if profiler:
+                    start = time.time()
+                    callback()
+                    profiler.record('tick', None, callback, start)
                 else:
-                    timer.wakeup = None
+                    callback()
+
+    def _call_timer(self, timer):
+        profiler = self.profiler
+
+        if profiler:
+            start = time.time()
+            timer.call()
+            profiler.record('timer', None, timer.callback, start)
+        else:
+            timer.call()
 
-        while self.timers_to_remove:
-            timer = self.timers_to_remove.pop()
-            if timer in self.timers:
-                self.timers.remove(timer)
+        if timer not in self.timers:  # the timer removed itself
+            return
 
-        for timer in self.timers_to_add:
-            self.timers.add(timer)
-        self.timers_to_add = set()
+        if timer.frequency:
+            timer.wakeup += timer.frequency
+            self.timers[timer] = self.scheduler.add(timer.wakeup,
+                                                    self._call_timer, timer)
+        else:
+            timer.wakeup = None
+            del self.timers[timer]
 
     @staticmethod
     def secs(s):
@@ -229,6 +308,98 @@ class Timer(object):
         self.callback(*self.args)
 
 
+class Scheduler(object):
+    """A queue of callbacks ordered by the time they're due, backed by a binary
+    heap.
+
+    Adding and cancelling entries is O(log n), and running the scheduler only
+    touches the entries which are actually due, so the per-tick cost doesn't
+    grow with the number of pending entries.
+
+    Entries are cancelled lazily by clearing their callback. Cancelled entries
+    are skipped when they reach the top of the heap, and the heap is compacted
+    if they ever make up more than half of it.
+    """
+
+    def __init__(self):
+        self._heap = list()
+        self._counter = itertools.count()
+        self._cancelled = 0
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def add(self, due, callback, *args):
+        """Schedules a callback.
+
+        Args:
+            due: Float of the time (in time.time() seconds) when this callback
+                should be called.
+            callback: The method to call.
+            *args: Positional arguments to pass to the callback.
+
+        Returns:
+            The entry for this callback which can be passed to cancel().
+        """
+        # The counter breaks ties between identical due times so entries with
+        # the same due time run in the order they were added.
+        entry = [due, next(self._counter), callback, args]
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def cancel(self, entry):
+        """Cancels a scheduled entry. Safe to call more than once and safe to
+        call for an entry that has already run."""
+        if entry[2] is not None:
+            entry[2] = None
+
+            if entry[1] is None:  # already popped off the heap by run()
+                return
+
+            self._cancelled += 1
+
+            if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+                self._compact()
+
+    def clear(self):
+        """Removes all the scheduled entries."""
+        for entry in self._heap:
+            entry[2] = None
+        self._heap = list()
+        self._cancelled = 0
+
+    def run(self, now):
+        """Calls all the callbacks which are due at the time passed.
+
+        Entries added by these callbacks are not run until the next call, even
+        if they're already due, which matches the old behavior of new timers,
+        tasks and delays starting on the tick after they were created.
+        """
+        heap = self._heap
+        due = list()
+
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+
+            if entry[2] is None:
+                self._cancelled -= 1
+            else:
+                entry[1] = None
+                due.append(entry)
+
+        for entry in due:
+            callback = entry[2]
+
+            # an earlier callback in this batch may have cancelled this one
+            if callback is not None:
+                entry[2] = None
+                callback(*entry[3])
+
+    def _compact(self):
+        self._heap = [x for x in self._heap if x[2] is not None]
+        heapq.heapify(self._heap)
+        self._cancelled = 0
+
 # The MIT License (MIT)
 
 # Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
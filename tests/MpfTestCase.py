@@ -16,7 +16,7 @@ class MpfTestCase(unittest.TestCase):
             'physical_hw': False,
             'mpfconfigfile': "mpf/mpfconfig.yaml",
             'machinepath': self.getMachinePath(),
-            'configfile': self.getConfigFile(),
+            'configfile': [self.getConfigFile()],
             'debug': True
                }
 
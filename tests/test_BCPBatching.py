@@ -0,0 +1,71 @@
+import unittest
+
+from mock import MagicMock
+from mpf.system import bcp
+
+
+class TestBCPBatching(unittest.TestCase):
+
+    def setUp(self):
+        # only the parts of BCP that sending uses
+        self.bcp = bcp.BCP.__new__(bcp.BCP)
+        self.bcp.bcp_clients = [MagicMock(), MagicMock()]
+        self.bcp.typed_values = False
+        self.bcp.outgoing = list()
+        self.bcp.outgoing_bytes = 0
+        self.bcp.flush_bytes = 16384
+        self.bcp.coalesce_player_vars = False
+        self.bcp.coalesced = dict()
+
+    def sent(self, client=0):
+        return [call[0][0] for call in
+                self.bcp.bcp_clients[client].send.call_args_list]
+
+    def test_one_batch_per_flush(self):
+        self.bcp.send('trigger', name='a')
+        self.bcp.send('switch', name='s1', state=1)
+        self.assertEqual([], self.sent())
+
+        self.bcp.flush()
+        self.bcp.flush()  # nothing new to send
+
+        for client in (0, 1):
+            self.assertEqual(1, len(self.sent(client)))
+            self.assertEqual(
+                [('trigger', dict(name='a')),
+                 ('switch', dict(name='s1', state='1'))],
+                [bcp.decode_command_string(x) for x in
+                 self.sent(client)[0].split('\n')])
+
+    def test_flush_bytes(self):
+        self.bcp.flush_bytes = 40
+
+        for i in range(5):
+            self.bcp.send('trigger', name='event_{}'.format(i))
+
+        self.assertEqual(['trigger?name=event_0\ntrigger?name=event_1',
+                          'trigger?name=event_2\ntrigger?name=event_3'],
+                         self.sent())
+        self.assertEqual(['trigger?name=event_4'], self.bcp.outgoing)
+
+    def test_coalesce_player_variables(self):
+        self.bcp.coalesce_player_vars = True
+
+        self.bcp.send('player_score', value=100, prev_value=0, change=100,
+                      player_num=1)
+        self.bcp.send('trigger', name='a')
+        self.bcp.send('player_score', value=150, prev_value=100, change=50,
+                      player_num=1)
+        self.bcp.send('player_score', value=10, prev_value=0, change=10,
+                      player_num=2)
+        self.bcp.flush()
+
+        messages = [bcp.decode_command_string(x)
+                    for x in self.sent()[0].split('\n')]
+
+        self.assertEqual([
+            ('player_score', dict(value='150', prev_value='0', change='150',
+                                  player_num='1')),
+            ('trigger', dict(name='a')),
+            ('player_score', dict(value='10', prev_value='0', change='10',
+                                  player_num='2'))], messages)
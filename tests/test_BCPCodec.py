@@ -0,0 +1,93 @@
+import random
+import string
+import unittest
+import urllib
+import urlparse
+
+from mpf.system.bcp_codec import (decode_command_string,
+                                  encode_command_string,
+                                  encode_typed_command_string)
+
+
+class TestBCPCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(1234)
+
+    def random_string(self, min_length=0):
+        chars = [self.random.choice(string.printable + '\x00\xe9\xff')
+                 for _ in range(self.random.randint(min_length, 20))]
+        return ''.join(chars)
+
+    def random_name(self):
+        return ''.join(self.random.choice(string.ascii_lowercase + '_')
+                       for _ in range(self.random.randint(1, 10)))
+
+    def random_value(self):
+        return self.random.choice([
+            self.random_string,
+            lambda: self.random.randint(-2 ** 40, 2 ** 40),
+            lambda: self.random.uniform(-1e6, 1e6),
+            lambda: self.random.choice([True, False]),
+            lambda: 1e300 * 1e300])()
+
+    def test_decode(self):
+        self.assertEqual(('trigger', {'name': 'hello', 'foo': 'Foo Bar'}),
+                         decode_command_string('Trigger?name=hello&FOO=Foo%20Bar'))
+        self.assertEqual(('goodbye', {}), decode_command_string('goodbye'))
+        self.assertEqual(('switch', {'name': 'a b', 'state': '1'}),
+                         decode_command_string('switch?name=a+b;state=1'))
+        self.assertEqual(('set', {'a': '1', 'b': '', 'c': '%zz'}),
+                         decode_command_string('set?a=1&b=&c=%zz&d&a=2'))
+
+    def test_encode(self):
+        self.assertEqual('trigger?name=hello%20world%3A%26',
+                         encode_command_string('Trigger', Name='hello world:&'))
+        self.assertEqual('goodbye', encode_command_string('goodbye'))
+        self.assertEqual('player_score?value=100',
+                         encode_command_string('player_score', value=100))
+        self.assertEqual('player_score?value=int:100',
+                         encode_typed_command_string('player_score',
+                                                     value=100))
+
+    def test_round_trip(self):
+        for _ in range(500):
+            command = self.random_name()
+            kwargs = dict((self.random_name(), self.random_string())
+                          for _ in range(self.random.randint(0, 5)))
+
+            self.assertEqual((command, kwargs), decode_command_string(
+                encode_command_string(command, **kwargs)))
+
+    def test_typed_round_trip(self):
+        for _ in range(500):
+            command = self.random_name()
+            kwargs = dict((self.random_name(), self.random_value())
+                          for _ in range(self.random.randint(0, 5)))
+
+            decoded = decode_command_string(
+                encode_typed_command_string(command, **kwargs))[1]
+
+            self.assertEqual(kwargs, decoded)
+            self.assertEqual(dict((k, type(v)) for k, v in kwargs.items()),
+                             dict((k, type(v)) for k, v in decoded.items()))
+
+    def test_urllib_compatible(self):
+        # the wire format is the same as urllib.quote() and parse_qs()
+        for _ in range(500):
+            command = self.random_name()
+            kwargs = dict((self.random_name(), self.random_string(1))
+                          for _ in range(self.random.randint(1, 5)))
+
+            encoded = encode_command_string(command, **kwargs)
+            query = urlparse.urlsplit(encoded).query
+
+            self.assertEqual(
+                kwargs, dict((k, v[0]) for k, v in
+                             urlparse.parse_qs(query).iteritems()))
+
+            query = '&'.join(urllib.quote(k, '') + '=' + urllib.quote(v, '')
+                             for k, v in kwargs.iteritems())
+
+            self.assertEqual((command, kwargs),
+                             decode_command_string(command + '?' + query))
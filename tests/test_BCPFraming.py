@@ -0,0 +1,175 @@
+import unittest
+
+from mpf.system.bcp_framing import (BCPReceiveBuffer, DMD_DELTA, DMD_FRAME,
+                                    DMDFrameDecoder, DMDFrameEncoder,
+                                    FRAME_MARKER, encode_frame)
+
+
+class FakeSocket(object):
+    """Returns the chunks it was created with, one per recv_into() call
+    (or less if the buffer is full)."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, view):
+        if not self.chunks:
+            return 0
+
+        chunk = self.chunks.pop(0)
+
+        if len(chunk) > len(view):
+            self.chunks.insert(0, chunk[len(view):])
+            chunk = chunk[:len(view)]
+
+        view[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class TestBCPReceiveBuffer(unittest.TestCase):
+
+    def receive(self, receive_buffer, chunks):
+        sock = FakeSocket(chunks)
+        messages = list()
+
+        while receive_buffer.recv_into(sock):
+            messages.extend(receive_buffer.get_messages())
+
+        return messages
+
+    def test_commands_split_across_reads(self):
+        messages = self.receive(BCPReceiveBuffer(),
+                                ['hello?version=1.0\nswi', 'tch?name=s1',
+                                 '&state=1\n\ngoodbye\n'])
+
+        self.assertEqual([('command', 'hello?version=1.0'),
+                          ('command', 'switch?name=s1&state=1'),
+                          ('command', 'goodbye')], messages)
+
+    def test_binary_frames(self):
+        frame = ''.join(chr(x % 256) for x in range(300))
+        data = 'reset\n' + encode_frame(DMD_FRAME, frame) + 'goodbye\n'
+
+        # feed it one byte at a time so the header and payload are split
+        messages = self.receive(BCPReceiveBuffer(), list(data))
+
+        self.assertEqual([('command', 'reset'), ('dmd_frame', frame),
+                          ('command', 'goodbye')], messages)
+
+    def test_legacy_frames(self):
+        frame = '\n' * 4 + 'dmd_frame?' + '\x00\x01'
+        data = 'reset\ndmd_frame?' + frame + '\ndmd_frame?' + frame + '\n'
+
+        messages = self.receive(
+            BCPReceiveBuffer(legacy_frame_length=len(frame)),
+            [data[:12], data[12:19], data[19:]])
+
+        self.assertEqual([('command', 'reset'), ('dmd_frame', frame),
+                          ('dmd_frame', frame)], messages)
+
+    def test_legacy_frames_off(self):
+        messages = self.receive(BCPReceiveBuffer(), ['dmd_frame?abc\n'])
+        self.assertEqual([('command', 'dmd_frame?abc')], messages)
+
+    def test_buffer_grows(self):
+        frame = 'x' * 1000
+        receive_buffer = BCPReceiveBuffer(size=64)
+
+        messages = self.receive(receive_buffer,
+                                [encode_frame(DMD_FRAME, frame)[i:i + 50]
+                                 for i in range(0, 1006, 50)] + ['done\n'])
+
+        self.assertEqual([('dmd_frame', frame), ('command', 'done')],
+                         messages)
+        self.assertGreaterEqual(len(receive_buffer.buffer), 1006)
+
+
+class TestDMDFrameDeltas(unittest.TestCase):
+
+    def send(self, encoder, frames):
+        # encodes frames and decodes them again like MPF's receive loop does
+        receive_buffer = BCPReceiveBuffer(legacy_frame_length=len(frames[0]))
+        decoder = DMDFrameDecoder()
+        received = list()
+        messages = list()
+
+        for frame in frames:
+            message = encoder.encode(frame)
+
+            if not message:
+                continue
+
+            messages.append(message)
+
+            if not message.startswith(FRAME_MARKER):
+                message += '\n'
+
+            receive_buffer.recv_into(FakeSocket([message]))
+
+            for message_type, data in receive_buffer.get_messages():
+                if message_type == 'dmd_frame':
+                    received.append(decoder.keyframe(data))
+                else:
+                    received.append(decoder.delta(data))
+
+        return messages, received
+
+    def test_deltas(self):
+        frames = [bytearray(4096) for _ in range(5)]
+        frames[1][100:110] = 'x' * 10
+        frames[2] = bytearray(frames[1])
+        frames[3] = bytearray(frames[1])
+        frames[3][0] = 1
+        frames[3][4095] = 2
+        frames[4] = bytearray('y' * 4096)
+        frames = [str(x) for x in frames]
+
+        encoder = DMDFrameEncoder()
+        encoder.reset(binary=True)
+        messages, received = self.send(encoder, frames)
+
+        # the repeated frame is skipped, the last one changed too much
+        self.assertEqual(frames[:2] + frames[3:], received)
+        self.assertEqual(
+            [DMD_FRAME, DMD_DELTA, DMD_DELTA, DMD_FRAME],
+            [ord(x[1]) for x in messages])
+        self.assertLess(len(messages[1]), 100)
+
+    def test_keyframe_interval(self):
+        frames = ['a' * 100, 'b' * 100] + ['b' * 100] * 5
+        encoder = DMDFrameEncoder(keyframe_interval=3)
+        encoder.reset(binary=True)
+        messages, received = self.send(encoder, frames)
+
+        # the unchanged frames are only sent when a keyframe is due
+        self.assertEqual(['a' * 100] + ['b' * 100] * 2, received)
+
+    def test_reset_during_encode(self):
+        frames = ['a' * 100, 'b' + 'a' * 99, 'c' + 'a' * 99, 'd' + 'a' * 99]
+        encoder = DMDFrameEncoder()
+        encoder.reset(binary=True)
+        encode_delta = encoder._delta
+
+        def reset_and_encode_delta(previous, data):
+            # a new client says hello while a frame is being encoded
+            encoder.reset(binary=True)
+            return encode_delta(previous, data)
+
+        self.send(encoder, frames[:1])
+        encoder._delta = reset_and_encode_delta
+        messages, _ = self.send(encoder, frames[1:2])
+        encoder._delta = encode_delta
+
+        # the frame that was being encoded is still sent as a delta, but the
+        # new client gets a keyframe next and can decode everything after it
+        self.assertEqual(DMD_DELTA, ord(messages[0][1]))
+        messages, received = self.send(encoder, frames[2:])
+        self.assertEqual([DMD_FRAME, DMD_DELTA], [ord(x[1]) for x in messages])
+        self.assertEqual(frames[2:], received)
+
+    def test_legacy(self):
+        frames = ['a' * 100, 'a' * 100, 'b' * 100]
+        messages, received = self.send(DMDFrameEncoder(), frames)
+
+        self.assertEqual(['a' * 100, 'b' * 100], received)
+        self.assertTrue(all(x.startswith('dmd_frame?') for x in messages))
@@ -0,0 +1,77 @@
+import unittest
+from Queue import Queue
+
+from mock import MagicMock
+from mpf.media_controller.core.bcp_server import BCPServer
+from mpf.system import bcp
+from mpf.system.bcp_framing import BCPReceiveBuffer
+
+
+class FakeSocket(object):
+    """Returns the chunks it was created with, one per recv_into() call."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, view):
+        if not self.chunks:
+            return 0
+
+        chunk = self.chunks.pop(0)
+        view[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def get_batches(queue):
+    batches = list()
+
+    while not queue.empty():
+        batches.append(queue.get(False))
+
+    return batches
+
+
+class TestBCPClientReceive(unittest.TestCase):
+
+    def test_receive_loop(self):
+        # only the parts of the client that receiving uses
+        client = bcp.BCPClientSocket.__new__(bcp.BCPClientSocket)
+        client.log = MagicMock()
+        client.machine = MagicMock()
+        client.machine.config = dict()
+        client.receive_queue = Queue()
+        client.bcp_commands = dict(hello=MagicMock())
+        client.socket = FakeSocket(['hello?version=1.0\nswitch?name=s',
+                                    '1&state=1\ntrigger?name=a\ntrig',
+                                    'ger?name=b\n'])
+
+        client.receive_loop()
+
+        client.bcp_commands['hello'].assert_called_once_with(version='1.0')
+        self.assertEqual(
+            [[('switch', dict(name='s1', state='1')),
+              ('trigger', dict(name='a'))],
+             [('trigger', dict(name='b'))]], get_batches(client.receive_queue))
+        self.assertIsNone(client.socket)
+
+
+class TestBCPServerReceive(unittest.TestCase):
+
+    def test_split_commands(self):
+        server = BCPServer.__new__(BCPServer)
+        server.log = MagicMock()
+        server.receive_queue = Queue()
+
+        receive_buffer = BCPReceiveBuffer()
+        sock = FakeSocket(['trigger?name=a\ntrigger?na', 'me=b\n',
+                           'goodbye\nhel', 'lo?version=1.0\n'])
+
+        while receive_buffer.recv_into(sock):
+            server.process_received_messages(receive_buffer.get_messages())
+
+        self.assertEqual(
+            [[('trigger', dict(name='a'))],
+             [('trigger', dict(name='b'))],
+             [('goodbye', dict())],
+             [('hello', dict(version='1.0'))]],
+            get_batches(server.receive_queue))
@@ -0,0 +1,99 @@
+import unittest
+
+from mpf.system.events import EventManager
+
+
+class TestEventManager(unittest.TestCase):
+
+    def setUp(self):
+        self.events = EventManager(None, setup_event_player=False)
+        self.events.debug = False
+        self.calls = list()
+
+    def _handler(self, name, **kwargs):
+        self.calls.append((name, kwargs))
+
+    def _handler1(self, **kwargs):
+        self._handler('h1', **kwargs)
+
+    def _handler2(self, **kwargs):
+        self._handler('h2', **kwargs)
+
+    def _handler3(self, **kwargs):
+        self._handler('h3', **kwargs)
+
+    def test_priority_order(self):
+        self.events.add_handler('test', self._handler1, priority=1)
+        self.events.add_handler('test', self._handler2, priority=10)
+        self.events.add_handler('test', self._handler3, priority=1)
+
+        self.events.post('test')
+
+        self.assertEqual(['h2', 'h1', 'h3'], [c[0] for c in self.calls])
+
+    def test_kwargs(self):
+        self.events.add_handler('test', self._handler1, a=1, b=2)
+        self.events.add_handler('test', self._handler2)
+
+        self.events.post('test', b=3)
+
+        self.assertEqual([('h1', {'a': 1, 'b': 3}), ('h2', {'b': 3})],
+                         self.calls)
+
+    def test_remove_by_key(self):
+        key1 = self.events.add_handler('test', self._handler1)
+        key2 = self.events.add_handler('test', self._handler2)
+        self.assertNotEqual(key1, key2)
+
+        self.events.remove_handler_by_key(key1)
+        self.events.post('test')
+        self.assertEqual(['h2'], [c[0] for c in self.calls])
+
+        self.events.remove_handler_by_key(key2)
+        self.assertFalse(self.events.does_event_exist('test'))
+        self.assertNotIn('test', self.events.dispatch_table)
+
+        # removing a key twice is harmless
+        self.events.remove_handler_by_key(key2)
+
+    def test_remove_handler(self):
+        self.events.add_handler('test1', self._handler1)
+        self.events.add_handler('test2', self._handler1)
+        self.events.add_handler('test2', self._handler2)
+
+        self.events.remove_handler(self._handler1)
+        self.assertFalse(self.events.does_event_exist('test1'))
+
+        self.events.post('test1')
+        self.events.post('test2')
+        self.assertEqual(['h2'], [c[0] for c in self.calls])
+
+    def test_replace_handler(self):
+        self.events.add_handler('test', self._handler1, priority=1)
+        self.events.add_handler('test', self._handler2, priority=5)
+        self.events.replace_handler('test', self._handler1, priority=10)
+
+        self.events.post('test')
+        self.assertEqual(['h1', 'h2'], [c[0] for c in self.calls])
+
+    def test_handler_added_during_event(self):
+        def add_another(**kwargs):
+            self.events.add_handler('test', self._handler2)
+
+        self.events.add_handler('test', add_another, priority=10)
+        self.events.add_handler('test', self._handler1)
+
+        self.events.post('test')
+        self.assertEqual(['h1'], [c[0] for c in self.calls])
+
+    def test_boolean_and_relay(self):
+        self.events.add_handler('bool', lambda **kwargs: False, priority=10)
+        self.events.add_handler('bool', self._handler1)
+        self.events.post_boolean('bool')
+        self.assertEqual([], self.calls)
+
+        self.events.add_handler('relay', lambda **kwargs: dict(a=1),
+                                priority=10)
+        self.events.add_handler('relay', self._handler1)
+        self.events.post_relay('relay')
+        self.assertEqual([('h1', {'a': 1})], self.calls)
@@ -0,0 +1,112 @@
+import time
+import unittest
+
+from mock import MagicMock
+from mpf.platform.fast import HardwarePlatform, FASTDirectLED
+
+
+class TestFastLEDs(unittest.TestCase):
+
+    def setUp(self):
+        self.realTime = time.time
+        self.testTime = 1000.0
+        time.time = MagicMock(return_value=self.testTime)
+
+        # only the parts of the platform the LED update uses
+        self.platform = HardwarePlatform.__new__(HardwarePlatform)
+        self.platform.machine = MagicMock()
+        self.platform.log = MagicMock()
+        self.platform.config = {'led_refresh': 1000}
+        self.platform.rgb_connection = MagicMock()
+        self.platform.dirty_leds = set()
+        self.platform.led_bytes_sent = 0
+        self.platform.led_bytes_per_sec = 0
+        self.platform.led_stats_time = 0
+        self.platform.next_led_refresh = 0
+        self.platform.led_fade_ms = 0
+
+        self.led1 = FASTDirectLED('01', self.platform.dirty_leds)
+        self.led2 = FASTDirectLED('02', self.platform.dirty_leds)
+        self.platform.fast_leds = set([self.led1, self.led2])
+
+    def tearDown(self):
+        time.time = self.realTime
+
+    def advance_time(self, delta):
+        self.testTime += delta
+        time.time.return_value = self.testTime
+
+    def test_hex_color(self):
+        self.led1.color([255, 0, 16])
+        self.assertEqual('ff0010', self.led1.current_color)
+
+        self.led1.color([300.5, 0, 16])
+        self.assertEqual('ff0010', self.led1.current_color)
+
+        # negative values are off, not counted from the end of the table
+        self.led1.color([-1, 0, 16])
+        self.assertEqual('000010', self.led1.current_color)
+
+    def test_dirty_updates(self):
+        send = self.platform.rgb_connection.send
+
+        # the first update is a full refresh
+        self.platform.update_leds()
+        self.assertEqual(1, send.call_count)
+        self.assertEqual(1, send.call_args[0][0].count(','))
+
+        # nothing changed
+        self.advance_time(.1)
+        self.platform.update_leds()
+        self.assertEqual(1, send.call_count)
+
+        # only the changed LED is sent
+        self.led2.color([255, 255, 255])
+        self.led1.color([0, 0, 0])  # same color, not dirty
+        self.advance_time(.1)
+        self.platform.update_leds()
+        self.assertEqual(2, send.call_count)
+        send.assert_called_with('RS:02ffffff')
+
+        # full refresh
+        self.advance_time(1)
+        self.platform.update_leds()
+        self.assertEqual(3, send.call_count)
+        self.assertEqual(1, send.call_args[0][0].count(','))
+
+    def test_bytes_per_sec(self):
+        self.platform.update_leds()
+        self.advance_time(1)
+        self.platform.update_leds()
+
+        # one full refresh of 'RS:' + 2 * 8 chars + 1 comma + <CR> in the
+        # last second
+        self.assertEqual(21, self.platform.led_bytes_per_sec)
+        self.platform.machine.set_machine_var.assert_called_with(
+            'fast_rgb_bytes_per_sec', 21)
+
+    def test_hardware_fades(self):
+        send = self.platform.rgb_connection.send
+        self.platform.update_leds()
+
+        self.led1.fade([255, 0, 0], 500)
+        self.led2.color([0, 255, 0])
+        self.advance_time(.1)
+        self.platform.update_leds()
+
+        # the LED without a fade goes first since the fade rate is still 0
+        self.assertEqual([(('RS:0200ff00',),), (('RF:1f4',),),
+                          (('RS:01ff0000',),)], send.call_args_list[-3:])
+        self.assertEqual(500, self.platform.led_fade_ms)
+
+        # fading LEDs are left out of the refresh
+        self.advance_time(1)
+        self.led1.fade([0, 0, 255], 5000)
+        self.platform.update_leds()
+        self.assertEqual([(('RF:0',),), (('RS:0200ff00',),),
+                          (('RF:1388',),), (('RS:010000ff',),)],
+                         send.call_args_list[-4:])
+
+        self.advance_time(1)
+        self.platform.update_leds()
+        self.assertEqual((('RS:0200ff00',),), send.call_args_list[-1])
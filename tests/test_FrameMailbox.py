@@ -0,0 +1,55 @@
+import threading
+import unittest
+
+from mpf.system.frame_mailbox import FrameMailbox
+
+
+class TestFrameMailbox(unittest.TestCase):
+
+    def test_latest_frame_wins(self):
+        mailbox = FrameMailbox()
+        mailbox.put_frame(0, 'a1')
+        mailbox.put_frame(1, 'b1')
+        mailbox.put_frame(0, 'a2')
+
+        self.assertEqual(2, len(mailbox))
+        self.assertEqual('a2', mailbox.get())
+        self.assertEqual('b1', mailbox.get())
+        self.assertIsNone(mailbox.get(block=False))
+
+        stats = mailbox.get_stats()
+        self.assertEqual(2, stats['frames_sent'])
+        self.assertEqual(1, stats['frames_dropped'])
+
+    def test_messages_are_not_dropped(self):
+        mailbox = FrameMailbox()
+        mailbox.put_frame('dmd', 'frame1')
+        mailbox.put('one')
+        mailbox.put_frame('dmd', 'frame2')
+        mailbox.put('two')
+
+        self.assertEqual(['one', 'two', 'frame2'],
+                         [mailbox.get() for _ in range(3)])
+        self.assertEqual(2, mailbox.get_stats()['messages_sent'])
+
+    def test_clear_frames(self):
+        mailbox = FrameMailbox()
+        mailbox.put_frame(0, 'a')
+        mailbox.put('message')
+        mailbox.clear_frames()
+
+        self.assertEqual('message', mailbox.get())
+        self.assertIsNone(mailbox.get(timeout=.01))
+        self.assertEqual(1, mailbox.get_stats()['frames_dropped'])
+
+    def test_blocking_get(self):
+        mailbox = FrameMailbox()
+        received = list()
+
+        thread = threading.Thread(target=lambda: received.append(
+            mailbox.get()))
+        thread.start()
+        mailbox.put_frame(0, 'frame')
+        thread.join(1)
+
+        self.assertEqual(['frame'], received)
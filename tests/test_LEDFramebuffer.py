@@ -0,0 +1,142 @@
+import time
+import unittest
+
+from MpfTestCase import MpfTestCase
+from mock import MagicMock
+from mpf.system.led_framebuffer import LEDFramebuffer, numpy
+
+
+class TestLEDFramebuffer(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_light_controller.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/light_controller/'
+
+    def test_leds_share_buffer(self):
+        led1 = self.machine.leds.led1
+        led2 = self.machine.leds.led2
+        framebuffer = self.machine.led_framebuffer
+
+        self.assertIs(framebuffer, led1.framebuffer)
+        self.assertEqual(6, len(framebuffer.color))
+
+        led2.color([1, 2, 3], fade_ms=0, priority=5)
+        self.assertEqual([1, 2, 3], led2.state['color'])
+        self.assertEqual(5, led2.state['priority'])
+        self.assertEqual([1, 2, 3],
+                         list(framebuffer.color[led2.index * 3:
+                                                led2.index * 3 + 3]))
+        self.assertEqual([0, 0, 0], led1.state['color'])
+
+    def test_fade(self):
+        led = self.machine.leds.led1
+
+        led.color([255, 0, 100], fade_ms=1000)
+        self.assertTrue(led.fade_in_progress)
+        self.assertEqual([255, 0, 100], led.state['destination_color'])
+
+        self.advance_time_and_run(.5)
+        self.assertEqual([127, 0, 50], led.state['color'])
+        self.assertTrue(led.fade_in_progress)
+
+        self.advance_time_and_run(.5)
+        self.assertEqual([255, 0, 100], led.state['color'])
+        self.assertFalse(led.fade_in_progress)
+
+    def test_color_cancels_fade(self):
+        led = self.machine.leds.led1
+
+        led.color([255, 255, 255], fade_ms=1000)
+        self.advance_time_and_run(.5)
+        led.color([0, 0, 255], fade_ms=0)
+        self.advance_time_and_run(1)
+
+        self.assertEqual([0, 0, 255], led.state['color'])
+
+    def test_brightness_compensation(self):
+        led = self.machine.leds.led1
+        led.set_brightness_compensation([.5])
+
+        led.color([200, 100, 50], fade_ms=0)
+        self.assertEqual([100, 50, 25], led.state['color'])
+
+        # restoring the cached (already compensated) color doesn't apply it
+        # again
+        led.restore()
+        self.assertEqual([100, 50, 25], led.state['color'])
+
+    def test_hardware_fade(self):
+        led = self.machine.leds.led1
+        led.hw_fade = True
+        led.hw_driver.fade = MagicMock()
+
+        led.color([255, 0, 100], fade_ms=1000)
+
+        led.hw_driver.fade.assert_called_once_with([255, 0, 100], 1000)
+        self.assertFalse(led.fade_in_progress)
+        self.assertEqual([255, 0, 100], led.state['color'])
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestLEDFramebufferNumPy(unittest.TestCase):
+
+    def setUp(self):
+        self.realTime = time.time
+        self.testTime = 1000.0
+        time.time = MagicMock(return_value=self.testTime)
+
+    def tearDown(self):
+        time.time = self.realTime
+
+    def _framebuffer(self, use_numpy):
+        framebuffer = LEDFramebuffer(MagicMock(), use_numpy=use_numpy)
+
+        for _ in range(4):
+            framebuffer.add_led(MagicMock())
+
+        framebuffer.set_color(0, [255, 255, 255])
+        framebuffer.set_color(3, [10, 200, 30])
+        framebuffer.start_fade(0, [0, 0, 0], 1)
+        framebuffer.start_fade(1, [255, 128, 3], .3)
+        framebuffer.start_fade(2, [40, 50, 60], 0)
+        framebuffer.start_fade(3, [250, 0, 100], 2)
+
+        return framebuffer
+
+    def test_numpy_matches_array(self):
+        python_buffer = self._framebuffer(False)
+        numpy_buffer = self._framebuffer(True)
+
+        self.assertFalse(python_buffer.numpy)
+        self.assertTrue(numpy_buffer.numpy)
+
+        for _ in range(25):
+            self.testTime += .1
+            time.time.return_value = self.testTime
+            python_buffer._update_array()
+            numpy_buffer._update_numpy()
+
+            for index in range(4):
+                self.assertEqual(python_buffer.get_channels('color', index),
+                                 numpy_buffer.get_channels('color', index))
+
+            self.assertEqual(python_buffer.fading, numpy_buffer.fading)
+
+        self.assertEqual(set(), numpy_buffer.fading)
+        self.assertEqual([250, 0, 100], numpy_buffer.get_channels('color', 3))
+
+    def test_numpy_arrays_grow(self):
+        framebuffer = LEDFramebuffer(MagicMock(), use_numpy=True)
+
+        for index in range(100):
+            self.assertEqual(index, framebuffer.add_led(MagicMock()))
+            framebuffer.set_channels('color', index, [index, 1, 2])
+
+        self.assertEqual(300, len(framebuffer.color))
+        self.assertEqual(100, len(framebuffer.priority))
+        self.assertEqual([1.0] * 300, list(framebuffer.compensation))
+        self.assertEqual([[x, 1, 2] for x in range(100)],
+                         [framebuffer.get_channels('color', x)
+                          for x in range(100)])
@@ -0,0 +1,58 @@
+import unittest
+
+from mock import MagicMock
+from mpf.platform import fast, p_roc
+
+
+class TestFastLightBatching(unittest.TestCase):
+
+    def setUp(self):
+        # only the parts of the platform the light update uses
+        self.platform = fast.HardwarePlatform.__new__(fast.HardwarePlatform)
+        self.platform.net_connection = MagicMock()
+        self.platform.dirty_lights = dict()
+
+    def test_one_write_per_tick(self):
+        light1 = fast.FASTMatrixLight('01', self.platform.dirty_lights)
+        light2 = fast.FASTMatrixLight('02', self.platform.dirty_lights)
+        gi = fast.FASTGIString('00', self.platform.dirty_lights)
+
+        light1.on()
+        light1.off()  # only the last state of a light is sent
+        light2.on()
+        gi.on(128)
+        self.platform.update_lights()
+
+        self.assertEqual(1, self.platform.net_connection.send.call_count)
+        self.assertEqual(
+            set(['L1:01,00', 'L1:02,FF', 'GI:00,80']),
+            set(self.platform.net_connection.send.call_args[0][0].split('\r')))
+
+        # nothing changed, nothing sent
+        self.platform.update_lights()
+        self.assertEqual(1, self.platform.net_connection.send.call_count)
+
+
+class TestPROCLightBatching(unittest.TestCase):
+
+    def test_coalesced_commands(self):
+        platform = p_roc.HardwarePlatform.__new__(p_roc.HardwarePlatform)
+        platform.proc = MagicMock()
+        platform.dirty_lights = dict()
+
+        light1 = p_roc.PROCMatrixLight(1, platform.proc,
+                                       platform.dirty_lights)
+        light2 = p_roc.PROCMatrixLight(2, platform.proc,
+                                       platform.dirty_lights)
+
+        light1.on()
+        light1.on()
+        light2.on()
+        light2.off()
+        self.assertFalse(platform.proc.driver_schedule.called)
+
+        platform.update_lights()
+        platform.proc.driver_schedule.assert_called_once_with(
+            number=1, schedule=0xffffffff, cycle_seconds=0, now=True)
+        platform.proc.driver_disable.assert_called_once_with(2)
+        self.assertEqual(1, platform.proc.flush.call_count)
@@ -0,0 +1,303 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from MpfTestCase import MpfTestCase
+from mpf.system.show_compiler import ShowCache, ShowCompiler
+
+
+class TestLightController(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_light_controller.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/light_controller/'
+
+    def _set_led(self, source, led, color, priority):
+        self.machine.light_controller._add_to_led_update_list(
+            led=led, color=color, fade_ms=0, priority=priority, blend=False,
+            source=source)
+
+    def test_top_layer_wins(self):
+        controller = self.machine.light_controller
+        led = self.machine.leds.led1
+        low = object()
+        high = object()
+
+        self._set_led(high, led, [0, 0, 255], 10)
+        self._set_led(low, led, [255, 0, 0], 1)
+        controller._do_update()
+
+        self.assertEqual([0, 0, 255], led.state['color'])
+        self.assertEqual(10, led.state['priority'])
+        self.assertEqual(2, len(controller.led_stacks[led]))
+
+        # updating a lower layer doesn't touch the LED
+        self._set_led(low, led, [0, 255, 0], 1)
+        self.assertNotIn(led, controller.dirty_leds)
+
+    def test_remove_layer(self):
+        controller = self.machine.light_controller
+        led1 = self.machine.leds.led1
+        led2 = self.machine.leds.led2
+        low = object()
+        high = object()
+
+        self._set_led(low, led1, [255, 0, 0], 1)
+        self._set_led(high, led1, [0, 0, 255], 10)
+        self._set_led(high, led2, [0, 0, 255], 10)
+        controller._do_update()
+        self.assertEqual([0, 0, 255], led1.state['color'])
+
+        controller._remove_layers(high, leds=[led1, led2])
+        controller._do_update()
+
+        # led1 goes back to the lower layer, led2 to its cached manual color
+        self.assertEqual([255, 0, 0], led1.state['color'])
+        self.assertEqual(1, led1.state['priority'])
+        self.assertEqual([0, 0, 0], led2.state['color'])
+        self.assertEqual(0, led2.state['priority'])
+        self.assertNotIn(led2, controller.led_stacks)
+
+    def test_manual_color_above_show(self):
+        controller = self.machine.light_controller
+        led = self.machine.leds.led1
+        show = object()
+
+        led.color([255, 255, 255], fade_ms=0, priority=100)
+        self._set_led(show, led, [255, 0, 0], 10)
+        controller._do_update()
+        self.assertEqual([255, 255, 255], led.state['color'])
+
+        controller._remove_layers(show, leds=[led])
+        controller._do_update()
+        self.assertEqual([255, 255, 255], led.state['color'])
+
+    def test_light_layers(self):
+        controller = self.machine.light_controller
+        light = self.machine.lights.light1
+        low = object()
+        high = object()
+
+        controller._add_to_light_update_list(light, 100, 1, False, low)
+        controller._add_to_light_update_list(light, 255, 10, False, high)
+        controller._do_update()
+        self.assertEqual(255, light.state['brightness'])
+
+        controller._remove_layers(high, lights=[light])
+        controller._do_update()
+        self.assertEqual(100, light.state['brightness'])
+
+    def test_show_stop(self):
+        led = self.machine.leds.led1
+        script = [{'color': 'ff0000', 'tocks': 1}] * 2
+
+        low = self.machine.light_controller.run_script(
+            script, leds='led1', priority=1, key='low')
+        self.advance_time_and_run(.1)
+        self.assertEqual([255, 0, 0], led.state['color'])
+
+        high = self.machine.light_controller.run_script(
+            [{'color': '0000ff', 'tocks': 1}] * 2, leds='led1', priority=5,
+            key='high')
+        self.advance_time_and_run(.1)
+        self.assertEqual([0, 0, 255], led.state['color'])
+
+        high.stop()
+        self.advance_time_and_run(.1)
+        self.assertEqual([255, 0, 0], led.state['color'])
+
+        low.stop()
+        self.advance_time_and_run(.1)
+        self.assertEqual([0, 0, 0], led.state['color'])
+
+    def test_compile_show(self):
+        compiler = ShowCompiler(self.machine)
+        compiled = compiler.compile([
+            {'tocks': 1, 'leds': {'tag|ring': 'ff0000-f2'}},
+            {'tocks': 2},
+            {'tocks': 1, 'lights': {'light1': 'ff'}, 'events': 'a b',
+             'leds': {'led2': [0, 0, 255]}}])
+
+        self.assertEqual(['led1', 'led2'], compiled['devices']['leds'])
+        self.assertEqual(2, len(compiled['steps']))
+
+        # the empty step's tocks are added to the previous step
+        self.assertEqual((3, (), ((0, (255, 0, 0), 2), (1, (255, 0, 0), 2)),
+                          (), (), (), ()), compiled['steps'][0])
+
+        steps = compiler.resolve(compiled)
+        led2 = self.machine.leds.led2
+        light1 = self.machine.lights.light1
+        self.assertEqual((1, ((light1, 255),), ((led2, (0, 0, 255), 0),),
+                          ('a', 'b'), (), (), ()), steps[1])
+
+    def test_show_cache(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        show_file = os.path.join(path, 'show.yaml')
+
+        with open(show_file, 'w') as f:
+            f.write('- tocks: 1\n')
+
+        cache = ShowCache(self.machine)
+        cache.path = os.path.join(path, 'cache')
+        compiled = ShowCompiler(self.machine).compile([{'tocks': 1}])
+
+        self.assertIsNone(cache.load(show_file))
+        cache.save(show_file, compiled)
+        self.assertEqual(compiled, cache.load(show_file))
+
+        # a change to the show file invalidates its cache entry
+        mtime = os.path.getmtime(show_file)
+        os.utime(show_file, (mtime + 10, mtime + 10))
+        self.assertIsNone(cache.load(show_file))
+
+        # as does a change to the devices
+        cache.save(show_file, compiled)
+        cache._config_hash = None
+        self.machine.leds.led1.tags.append('new_tag')
+        self.assertIsNone(cache.load(show_file))
+
+    def test_show_schedule(self):
+        controller = self.machine.light_controller
+        shows = [controller.run_script([{'color': 'ff0000', 'tocks': 1}] * 2,
+                                       leds='led1', priority=i,
+                                       tocks_per_sec=1, key=str(i))
+                 for i in range(20)]
+        self.machine_run()
+
+        # every show stepped once and is scheduled one tock (30 ticks) later
+        next_tick = self.machine.tick_num + 30
+        self.assertEqual(20, len(controller.running_shows))
+        self.assertEqual(set([next_tick]),
+                         set(x.next_action_tick for x in shows))
+        self.assertEqual(next_tick, controller.show_schedule[0][0])
+
+        locations = [x.current_location for x in shows]
+        for _ in range(29):
+            self.machine_run()
+        self.assertEqual(locations, [x.current_location for x in shows])
+
+        self.machine_run()
+        self.assertNotEqual(locations, [x.current_location for x in shows])
+
+        # a stopped show's entry stays in the heap but is skipped
+        shows[0].stop()
+        self.assertNotIn(shows[0], controller.running_shows)
+        location = shows[0].current_location
+        for _ in range(31):
+            self.machine_run()
+        self.assertEqual(location, shows[0].current_location)
+        self.assertEqual(19, len(controller.show_schedule))
+
+    def test_playlist_stops_while_queue_is_serviced(self):
+        controller = self.machine.light_controller
+        calls = list()
+
+        class FakePlaylist(object):
+            def __init__(self, name, stop):
+                self.name = name
+                self.stop = stop
+
+            def advance(self):
+                calls.append(self.name)
+
+                if self.stop:
+                    controller._remove_from_queue(self)
+
+        now = controller.current_time
+        controller._add_to_queue({'action_time': now,
+                                  'playlist': FakePlaylist('a', True)})
+        controller._add_to_queue({'action_time': now,
+                                  'playlist': FakePlaylist('b', False)})
+
+        self.advance_time(1)
+        self.machine_run()
+        self.advance_time(1)
+        self.machine_run()
+
+        self.assertEqual(['a', 'b'], calls)
+        self.assertEqual([], controller.queue)
+
+    def test_baked_show(self):
+        controller = self.machine.light_controller
+        live_led = self.machine.leds.led1
+        baked_led = self.machine.leds.led2
+        script = [{'color': 'ff0000', 'tocks': 1},
+                  {'color': '0000ff-f1', 'tocks': 2},
+                  {'color': '00ff00', 'tocks': 1}]
+
+        live = controller.run_script(script, leds='led1', tocks_per_sec=10)
+        baked = controller.run_script(script, leds='led2', tocks_per_sec=10,
+                                      bake=True)
+
+        self.assertIsNone(live.baked)
+        self.assertEqual(12, baked.baked.num_frames)
+        self.assertEqual(12 * 3, controller.baked_bytes)
+
+        # after the first loop (where the live fade starts from off) the
+        # baked frames match the live show tick for tick
+        for tick in range(36):
+            self.advance_time(1 / 30.0)
+            self.machine_run()
+
+            if tick >= 12:
+                self.assertEqual(live_led.state['color'],
+                                 baked_led.state['color'])
+
+        # the baked show only wakes up on the frames where its LED changes:
+        # red, two fade frames, blue and green
+        self.assertEqual(5, len(baked.baked.changes))
+
+        # shows with events are played live
+        show = controller.create_show_from_script(script, leds='led1')
+        show.show_steps[0] = show.show_steps[0][:3] + (('event',),) + \
+            show.show_steps[0][4:]
+        show.play(repeat=True, bake=True)
+        self.assertIsNone(show.baked)
+
+    def _change_ticks(self, led, count):
+        # Returns the ticks between the next count color changes of an LED
+        ticks = list()
+        color = led.state['color']
+        tick = 0
+
+        while len(ticks) < count:
+            self.advance_time(1 / 30.0)
+            self.machine_run()
+            tick += 1
+
+            if led.state['color'] != color:
+                color = led.state['color']
+                ticks.append(tick)
+                tick = 0
+
+        return ticks
+
+    def test_baked_show_change_speed(self):
+        controller = self.machine.light_controller
+        led = self.machine.leds.led1
+        script = [{'color': 'ff0000', 'tocks': 1},
+                  {'color': '0000ff', 'tocks': 1}]
+
+        show = controller.run_script(script, leds='led1', tocks_per_sec=10,
+                                     bake=True)
+        baked = show.baked
+        self._change_ticks(led, 1)
+        self.assertEqual([3, 3, 3], self._change_ticks(led, 3))
+
+        show.change_speed(30)
+        self.assertIsNot(baked, show.baked)
+        self.assertEqual(30, show.baked.tocks_per_sec)
+        self._change_ticks(led, 1)
+        self.assertEqual([1, 1, 1], self._change_ticks(led, 3))
+
+        # no room for a baked version at the new rate, so it's played live
+        controller.config['bake_max_kb'] = 0
+        show.change_speed(15)
+        self.assertIsNone(show.baked)
+        self._change_ticks(led, 1)
+        self.assertEqual([2, 2, 2], self._change_ticks(led, 3))
@@ -0,0 +1,52 @@
+import unittest
+
+from mock import MagicMock, patch
+from mpf.platform.openpixel import OpenPixelClient
+
+
+class TestOpenPixel(unittest.TestCase):
+
+    def setUp(self):
+        with patch('mpf.platform.openpixel.OPCThread'):
+            self.client = OpenPixelClient(MagicMock(), dict())
+
+        self.client.sending_queue = MagicMock()
+
+    def test_frames(self):
+        self.client.add_pixel(0, 1)
+        self.client.add_pixel(2, 0)
+
+        self.assertEqual(3, len(self.client.channels))
+        self.assertEqual(bytearray([0, 0, 0, 6, 0, 0, 0, 0, 0, 0]),
+                         self.client.channels[0])
+        self.assertEqual(bytearray([1, 0, 0, 0]), self.client.channels[1])
+        self.assertEqual(bytearray([2, 0, 0, 3, 0, 0, 0]),
+                         self.client.channels[2])
+
+        frame = self.client.channels[0]
+        self.client.set_pixel_color(0, 1, [255, 16, 1])
+        self.client.set_pixel_color(0, 0, (300, -1, 2.5))
+        self.assertIs(frame, self.client.channels[0])
+        self.assertEqual(bytearray([0, 0, 0, 6, 255, 0, 2, 255, 16, 1]),
+                         frame)
+
+    def test_dirty_channels(self):
+        put = self.client.sending_queue.put_frame
+        self.client.add_pixel(0, 0)
+        self.client.add_pixel(1, 0)
+        self.client.tick()
+        self.assertEqual(2, put.call_count)
+
+        self.client.tick()
+        self.assertEqual(2, put.call_count)
+
+        self.client.set_pixel_color(1, 0, [1, 2, 3])
+        self.client.tick()
+        self.assertEqual(3, put.call_count)
+
+        # the frame itself is queued, not a copy
+        self.assertIs(self.client.channels[1], put.call_args[0][1])
+
+        self.client.update_every_tick = True
+        self.client.tick()
+        self.assertEqual(5, put.call_count)
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+
+from MpfTestCase import MpfTestCase
+from mock import MagicMock
+from mpf.system.tasks import DelayManager, Task
+
+
+class TestProfiler(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_switch_controller.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/switch_controller/'
+
+    def tearDown(self):
+        # the Task and DelayManager profilers are class attributes
+        self.machine.profiler.disable()
+        super(TestProfiler, self).tearDown()
+
+    def _slow_handler(self, **kwargs):
+        self.advance_time(.01)
+
+    def _task(self):
+        while True:
+            self.advance_time(.002)
+            yield
+
+    def test_disabled_by_default(self):
+        self.assertFalse(self.machine.profiler.enabled)
+        self.assertIsNone(self.machine.events.profiler)
+        self.assertIsNone(DelayManager.profiler)
+
+        self.machine.events.add_handler('test_event', self._slow_handler)
+        self.machine.events.post('test_event')
+        self.assertEqual([], self.machine.profiler.get_stats())
+
+    def test_profiler(self):
+        profiler = self.machine.profiler
+        profiler.enable()
+
+        self.machine.events.add_handler('test_event', self._slow_handler)
+        self.machine.events.post('test_event')
+        self.machine.events.post('test_event')
+
+        self.machine.switch_controller.add_switch_handler(
+            's_test1', self._slow_handler)
+        self.machine.switch_controller.process_switch('s_test1', 1)
+
+        delay = DelayManager()
+        delay.add(10, self._slow_handler)
+        task = Task.create(self._task)
+
+        self.advance_time_and_run(1)
+        self.advance_time_and_run(1)
+        task.stop()
+
+        stats = dict((x['name'], x) for x in profiler.get_stats())
+
+        name = '{!r}._slow_handler'.format(self)
+
+        event_stats = stats['event|test_event|' + name]
+        self.assertEqual(2, event_stats['count'])
+        self.assertAlmostEqual(20, event_stats['total_ms'], places=2)
+        self.assertAlmostEqual(10, event_stats['mean_ms'], places=2)
+        self.assertAlmostEqual(10, event_stats['p99_ms'], places=2)
+
+        self.assertEqual(1, stats['switch|s_test1-1|' + name]['count'])
+        self.assertEqual(1, stats['delay|' + name]['count'])
+        self.assertIn('task|{!r}._task'.format(self), stats)
+        self.assertIn('tick|SwitchController._tick', stats)
+        self.assertTrue(profiler.worst_ticks)
+
+        # dump to a file
+        dump_file = tempfile.mktemp()
+        try:
+            profiler.dump(dump_file)
+            with open(dump_file) as f:
+                self.assertIn('event|test_event', f.read())
+        finally:
+            os.remove(dump_file)
+
+        # query via BCP
+        self.machine.bcp.send = MagicMock()
+        self.machine.events.post('bcp_get_profiler')
+        kwargs = self.machine.bcp.send.call_args[1]
+        self.assertEqual('set', self.machine.bcp.send.call_args[0][0])
+        self.assertTrue(json.loads(kwargs['profiler'])['enabled'])
+
+        profiler.disable()
+        self.assertIsNone(self.machine.events.profiler)
+        self.assertIsNone(Task.profiler)
@@ -0,0 +1,99 @@
+import unittest
+
+from MpfTestCase import MpfTestCase
+from mock import MagicMock
+import time
+
+
+class TestRunLoop(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_run_loop.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/run_loop/'
+
+    def setUp(self):
+        super(TestRunLoop, self).setUp()
+        self.realSleep = time.sleep
+        time.sleep = MagicMock(side_effect=self.advance_time)
+        self._ticks = 0
+        self._stall_on_tick = None
+
+    def tearDown(self):
+        time.sleep = self.realSleep
+        super(TestRunLoop, self).tearDown()
+
+    def _tick(self):
+        self._ticks += 1
+
+        if self._ticks == self._stall_on_tick:
+            self.advance_time(1)
+
+        if self._ticks >= 30:
+            self.machine.done = True
+
+    def _overrun(self, **kwargs):
+        self._overrun_kwargs.append(kwargs)
+
+    def test_deadline_loop(self):
+        self.machine.events.add_handler('timer_tick', self._tick)
+        start_time = time.time()
+
+        self.machine._mpf_timer_run_loop()
+
+        # 30 ticks at 30Hz should take one second, with the first tick
+        # happening right away
+        self.assertAlmostEqual(29 / 30.0, time.time() - start_time, 2)
+        self.assertEqual(0, self.machine.ticks_dropped)
+
+        for call in time.sleep.call_args_list:
+            self.assertTrue(call[0][0] > 0)
+
+    def test_deadline_loop_drops_ticks_after_stall(self):
+        self.machine.events.add_handler('timer_tick', self._tick)
+        self._stall_on_tick = 5
+
+        self.machine._mpf_timer_run_loop()
+
+        # a one second stall at 30Hz means 29 missed ticks, 3 of which are
+        # caught up and the rest are dropped
+        self.assertEqual(26, self.machine.ticks_dropped)
+        self.assertTrue(self.machine.max_tick_lateness >= .96)
+
+    def test_sleep_loop(self):
+        self.machine.config['timing']['loop_mode'] = 'sleep'
+        self.machine.events.add_handler('timer_tick', self._tick)
+
+        self.machine._mpf_timer_run_loop()
+
+        self.assertEqual(30, self._ticks)
+        time.sleep.assert_called_with(.001)
+
+    def test_tick_overrun(self):
+        self.machine.events.add_handler('timer_tick', self._tick)
+        self._stall_on_tick = 5
+        self.machine.events.add_handler('tick_overrun', self._overrun)
+        self._overrun_kwargs = list()
+        overruns = self.machine.loop_metrics.overruns
+
+        self.machine._mpf_timer_run_loop()
+
+        self.assertEqual(overruns + 1, self.machine.loop_metrics.overruns)
+        self.assertEqual(1, len(self._overrun_kwargs))
+        self.assertEqual(1000, self._overrun_kwargs[0]['duration_ms'])
+
+        # the stall is in the last bucket since it's longer than all of them
+        self.assertEqual(1, self.machine.loop_metrics.get_histogram()[-1][1])
+
+    def test_loop_metrics_machine_vars(self):
+        self.machine.events.add_handler('timer_tick', self._tick)
+
+        self.machine._mpf_timer_run_loop()
+        self.machine.loop_metrics.publish()
+
+        self.assertTrue(self.machine.get_machine_var('loop_tick_rate') > 0)
+        self.assertTrue(self.machine.get_machine_var('loop_poll_rate') > 0)
+        self.assertEqual(0, self.machine.get_machine_var('loop_ticks_dropped'))
+        self.assertTrue(
+            self.machine.get_machine_var('loop_event_queue_max') >= 0)
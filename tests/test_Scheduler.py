@@ -0,0 +1,178 @@
+import unittest
+
+from mock import MagicMock
+import time
+
+from mpf.system.timing import Scheduler, Timing
+from mpf.system.tasks import DelayManager, Task
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.realTime = time.time
+        self.testTime = 1000.0
+        time.time = MagicMock(return_value=self.testTime)
+        self.calls = list()
+
+    def tearDown(self):
+        time.time = self.realTime
+        DelayManager.scheduler.clear()
+        Task.scheduler.clear()
+        Task.Tasks = set()
+        Task.NewTasks = list()
+
+    def advance_time(self, delta):
+        self.testTime += delta
+        time.time.return_value = self.testTime
+
+    def _callback(self, value=None):
+        self.calls.append(value)
+
+    def test_run_order(self):
+        scheduler = Scheduler()
+        scheduler.add(3, self._callback, 'c')
+        scheduler.add(1, self._callback, 'a')
+        scheduler.add(2, self._callback, 'b1')
+        scheduler.add(2, self._callback, 'b2')
+        scheduler.add(10, self._callback, 'd')
+
+        scheduler.run(5)
+
+        self.assertEqual(['a', 'b1', 'b2', 'c'], self.calls)
+        self.assertEqual(1, len(scheduler))
+
+    def test_cancel(self):
+        scheduler = Scheduler()
+        entries = [scheduler.add(i, self._callback, i) for i in range(200)]
+
+        for entry in entries[:150]:
+            scheduler.cancel(entry)
+            scheduler.cancel(entry)
+
+        self.assertEqual(50, len(scheduler))
+
+        scheduler.run(1000)
+        self.assertEqual(range(150, 200), self.calls)
+        self.assertEqual(0, len(scheduler))
+
+    def test_entries_added_while_running_wait_for_next_run(self):
+        scheduler = Scheduler()
+
+        def add_another():
+            scheduler.add(0, self._callback, 'new')
+
+        scheduler.add(0, add_another)
+        scheduler.run(0)
+        self.assertEqual([], self.calls)
+
+        scheduler.run(0)
+        self.assertEqual(['new'], self.calls)
+
+    def test_delay_manager(self):
+        delay = DelayManager()
+        delay.add(100, self._callback, 'd1', value=1)
+        delay.add(200, self._callback, 'd2', value=2)
+        delay.add(300, self._callback, 'd3', value=3)
+
+        # replacing a delay cancels the old one
+        delay.add(150, self._callback, 'd1', value=4)
+        delay.remove('d3')
+        self.assertEqual('d2', delay.check('d2'))
+        self.assertEqual(None, delay.check('d3'))
+
+        self.advance_time(.12)
+        DelayManager.timer_tick()
+        self.assertEqual([], self.calls)
+
+        self.advance_time(.1)
+        DelayManager.timer_tick()
+        self.assertEqual([4, 2], self.calls)
+        self.assertEqual({}, delay.delays)
+
+    def test_delay_manager_clear(self):
+        delay = DelayManager()
+        delay.add(100, self._callback, value=1)
+        delay.add(100, self._callback, value=2)
+        delay.clear()
+
+        self.advance_time(1)
+        DelayManager.timer_tick()
+        self.assertEqual([], self.calls)
+
+    def test_task(self):
+        def task_gen():
+            self.calls.append(1)
+            yield .5
+            self.calls.append(2)
+            yield
+            self.calls.append(3)
+
+        task = Task.create(task_gen)
+
+        # tasks start on the tick after they were created
+        Task.timer_tick()
+        Task.timer_tick()
+        self.assertEqual([], self.calls)
+        Task.timer_tick()
+        self.assertEqual([1], self.calls)
+
+        self.advance_time(.1)
+        Task.timer_tick()
+        self.assertEqual([1], self.calls)
+
+        self.advance_time(.5)
+        Task.timer_tick()
+        self.assertEqual([1, 2], self.calls)
+
+        Task.timer_tick()
+        self.assertEqual([1, 2, 3], self.calls)
+        self.assertNotIn(task, Task.Tasks)
+
+    def test_task_stop(self):
+        def task_gen():
+            while True:
+                self.calls.append(1)
+                yield
+
+        task = Task.create(task_gen)
+        Task.timer_tick()
+        Task.timer_tick()
+        Task.timer_tick()
+        self.assertEqual([1], self.calls)
+
+        task.stop()
+        Task.timer_tick()
+        self.assertEqual([1], self.calls)
+        self.assertEqual(0, len(Task.scheduler))
+
+    def test_tick_subscribers(self):
+        timing = Timing(MagicMock(config=dict()))
+        Timing.tick = 0
+
+        timing.add_tick_subscriber(lambda: self.calls.append('low'), 0)
+        timing.add_tick_subscriber(lambda: self.calls.append('high'), 100)
+        timing.add_tick_subscriber(lambda: self.calls.append('div'), 10,
+                                   divider=2)
+
+        timing.timer_tick()
+        self.assertEqual(['high', 'low'], self.calls)
+
+        self.calls = list()
+        timing.timer_tick()
+        self.assertEqual(['high', 'div', 'low'], self.calls)
+
+    def test_remove_tick_subscriber(self):
+        timing = Timing(MagicMock(config=dict()))
+
+        timing.add_tick_subscriber(self._callback)
+        timing.add_tick_subscriber(self._callback, priority=5)
+        self.assertEqual(1, len(timing.tick_dispatch))
+
+        timing.timer_tick()
+        self.assertEqual([None], self.calls)
+
+        timing.remove_tick_subscriber(self._callback)
+        timing.remove_tick_subscriber(self._callback)
+        timing.timer_tick()
+        self.assertEqual([None], self.calls)
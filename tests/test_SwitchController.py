@@ -0,0 +1,129 @@
+import unittest
+
+from MpfTestCase import MpfTestCase
+
+
+class TestSwitchController(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_switch_controller.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/switch_controller/'
+
+    def test_process_switch_by_number(self):
+        platform = self.machine.default_platform
+
+        self.assertEqual(self.machine.switches.s_test2,
+                         self.machine.switch_controller.get_switch_by_number(
+                             '2', platform))
+
+        self.machine.switch_controller.process_switch(num='2', state=1,
+                                                      platform=platform)
+        self.assertTrue(self.machine.switch_controller.is_active('s_test2'))
+        self.assertFalse(self.machine.switch_controller.is_active('s_test1'))
+
+        # without a platform all platforms are searched
+        self.machine.switch_controller.process_switch(num='1', state=1)
+        self.assertTrue(self.machine.switch_controller.is_active('s_test1'))
+
+        # NC switch reported by its hardware state
+        self.machine.switch_controller.process_switch(num='3', state=0,
+                                                      platform=platform)
+        self.assertTrue(self.machine.switch_controller.is_active('s_test_nc'))
+
+    def test_unknown_switch_number(self):
+        self.assertIsNone(
+            self.machine.switch_controller.get_switch_by_number('99'))
+
+        # this should only log a warning
+        self.machine.switch_controller.process_switch(num='99', state=1)
+
+    def _timed_callback(self, value):
+        self.timed_calls.append(value)
+
+    def test_timed_switch_handlers(self):
+        self.timed_calls = list()
+        controller = self.machine.switch_controller
+
+        controller.add_switch_handler('s_test1', self._timed_callback, 1, 100,
+                                      callback_kwargs={'value': 'on100'})
+        controller.add_switch_handler('s_test1', self._timed_callback, 1, 500,
+                                      callback_kwargs={'value': 'on500'})
+        controller.add_switch_handler('s_test1', self._timed_callback, 0, 100,
+                                      callback_kwargs={'value': 'off100'})
+        controller.add_switch_handler('s_test2', self._timed_callback, 1, 300,
+                                      callback_kwargs={'value': 's2on300'})
+
+        controller.process_switch('s_test1', 1)
+        controller.process_switch('s_test2', 1)
+        self.advance_time_and_run(.05)
+        self.assertEqual([], self.timed_calls)
+
+        self.advance_time_and_run(.1)
+        self.assertEqual(['on100'], self.timed_calls)
+
+        # releasing s_test1 cancels its pending active handler but not the
+        # one of s_test2
+        controller.process_switch('s_test1', 0)
+        self.advance_time_and_run(.2)
+        self.assertEqual(['on100', 'off100', 's2on300'], self.timed_calls)
+
+        self.advance_time_and_run(1)
+        self.assertEqual(['on100', 'off100', 's2on300'], self.timed_calls)
+        self.assertEqual({}, dict(controller.active_timed_switches))
+        self.assertEqual(0, len(controller.timed_switch_scheduler))
+
+    def test_process_switch_batch(self):
+        controller = self.machine.switch_controller
+        platform = self.machine.default_platform
+        changes = list()
+        controller.add_monitor(lambda name, state:
+                               changes.append((name, state)))
+
+        controller.process_switch_batch([('1', 1, True, None),
+                                         ('1', 1, True, None),
+                                         ('2', 1, False, None),
+                                         ('99', 1, True, None),
+                                         ('3', 0, True, 12345),
+                                         ('1', 0, True, None),
+                                         ('1', 1, True, None)],
+                                        platform=platform)
+
+        # duplicates are coalesced, non-debounced changes are ignored for
+        # debounced switches, and a pulse on s_test1 is still seen
+        self.assertEqual([('s_test1', 1), ('s_test_nc', 1), ('s_test1', 0),
+                          ('s_test1', 1)], changes)
+        self.assertTrue(controller.is_active('s_test1'))
+        self.assertFalse(controller.is_active('s_test2'))
+        self.assertTrue(controller.is_active('s_test_nc'))
+        self.assertEqual(12345, self.machine.switches.s_test_nc.hw_timestamp)
+
+    def test_switch_timestamps(self):
+        self.timed_calls = list()
+        controller = self.machine.switch_controller
+        controller.add_switch_handler('s_test1', self._timed_callback, 1, 100,
+                                      callback_kwargs={'value': 'on100'})
+
+        # the switch changed 40ms before it was processed
+        controller.process_switch_batch(
+            [('1', 1, True, self.testTime - .04)],
+            platform=self.machine.default_platform)
+
+        self.assertAlmostEqual(40, controller.ms_since_change('s_test1'),
+                               places=2)
+        self.assertEqual(dict(avg_ms=40.0, max_ms=40.0, last_ms=40.0,
+                              count=1),
+                         controller.get_ingestion_latency())
+
+        self.advance_time_and_run(.05)
+        self.assertEqual([], self.timed_calls)
+        self.advance_time_and_run(.02)
+        self.assertEqual(['on100'], self.timed_calls)
+
+        # timestamps from the future are ignored
+        controller.process_switch('s_test1', 0, logical=True,
+                                  timestamp=self.testTime + 1)
+        self.assertAlmostEqual(0, controller.ms_since_change('s_test1'),
+                               places=2)
+        self.assertEqual(1, controller.get_ingestion_latency()['count'])
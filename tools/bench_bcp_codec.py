@@ -0,0 +1,139 @@
+"""Benchmarks encoding and decoding BCP command strings."""
+# bench_bcp_codec.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# Encodes and decodes a mix of the BCP commands MPF and the media controller
+# send most often, comparing bcp_codec with the urlparse based functions
+# bcp.py used before.
+
+import os
+import sys
+import time
+import urllib
+import urlparse
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+from mpf.system.bcp_codec import (decode_command_string,
+                                  encode_command_string,
+                                  encode_typed_command_string)
+
+COMMANDS = (('player_variable', dict(name='score', value=123450,
+                                     prev_value=123000, change=450,
+                                     player_num=1)),
+            ('switch', dict(name='s_left_flipper', state=1)),
+            ('trigger', dict(name='light_show_step')),
+            ('timer', dict(name='ball_save', action='tick', ticks=5,
+                           ticks_remaining=15)),
+            ('mode_start', dict(name='Mode 1: Multiball!', priority=200)))
+
+
+def legacy_decode(bcp_string):
+    bcp_command = urlparse.urlsplit(bcp_string)
+    try:
+        kwargs = urlparse.parse_qs(bcp_command.query)
+
+    except AttributeError:
+        kwargs = dict()
+
+    return (bcp_command.path.lower(),
+            dict((k.lower(), urllib.unquote(v[0]))
+                for k,v in kwargs.iteritems()))
+
+
+def legacy_encode(bcp_command, **kwargs):
+    kwarg_string = ''
+
+    try:
+        for k, v in kwargs.iteritems():
+            kwarg_string += (urllib.quote(k.lower(), '') + '=' +
+                             urllib.quote(str(v), '') + '&')
+
+        kwarg_string = kwarg_string[:-1]
+
+    except (TypeError, AttributeError):
+        pass
+
+    return unicode(urlparse.urlunparse((None, None, bcp_command.lower(), None,
+                                        kwarg_string, None)), 'utf-8')
+
+
+def bench(encode, decode, loops):
+    start = time.time()
+    for _ in xrange(loops):
+        for command, kwargs in COMMANDS:
+            encode(command, **kwargs)
+    encode_secs = time.time() - start
+
+    strings = [encode(command, **kwargs) for command, kwargs in COMMANDS]
+
+    start = time.time()
+    for _ in xrange(loops):
+        for bcp_string in strings:
+            decode(bcp_string)
+    decode_secs = time.time() - start
+
+    return encode_secs, decode_secs
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-l', '--loops', type='int', default=20000,
+                      help='number of times to encode and decode every '
+                           'command (default 20000)')
+    options, _ = parser.parse_args()
+
+    for command, kwargs in COMMANDS:
+        assert (legacy_encode(command, **kwargs) ==
+                encode_command_string(command, **kwargs))
+
+    messages = options.loops * len(COMMANDS)
+    results = dict()
+
+    for name, encode, decode in (
+            ('legacy', legacy_encode, legacy_decode),
+            ('codec', encode_command_string, decode_command_string),
+            ('typed', encode_typed_command_string, decode_command_string)):
+        results[name] = bench(encode, decode, options.loops)
+
+        print('{0:>8}: encode {1:6.2f} us/msg, decode {2:6.2f} us/msg'.format(
+              name, results[name][0] / messages * 1000000,
+              results[name][1] / messages * 1000000))
+
+    for name in ('codec', 'typed'):
+        print('{0:>8}: encode {1:.1f}x faster, decode {2:.1f}x faster'.format(
+              name, results['legacy'][0] / results[name][0],
+              results['legacy'][1] / results[name][1]))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -0,0 +1,230 @@
+"""Benchmarks receiving DMD frames over a BCP socket."""
+# bench_bcp_dmd.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# Streams color DMD frames mixed with a few BCP commands through a local
+# socket pair, the way the media controller sends them, and measures the CPU
+# time the receiving side spends per frame. It compares the string
+# concatenation receive loop BCPClientSocket used before with
+# BCPReceiveBuffer reading legacy 'dmd_frame?' frames and binary frames.
+# Then it encodes a sequence of frames where a score-sized part of the display
+# changes every other frame, and compares the bytes sent and the time it takes
+# to encode and decode full frames with keyframes and deltas.
+
+import os
+import socket
+import sys
+import time
+from multiprocessing import Process
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+from mpf.system.bcp_framing import (BCPReceiveBuffer, DMD_FRAME,
+                                    DMDFrameDecoder, DMDFrameEncoder,
+                                    encode_frame)
+
+COMMANDS = ('player_score?value=1234&prev_value=1000&change=234',
+            'switch?name=s_left_flipper&state=1',
+            'trigger?name=light_show_step')
+
+
+def receive_legacy(sock, frame_length, num_frames):
+    # The receive loop from before BCPReceiveBuffer, minus the DMD update
+    socket_bytes = ''
+    frames = 0
+    commands = 0
+
+    while frames < num_frames:
+        socket_bytes += sock.recv(8192)
+
+        while socket_bytes.startswith('dmd_frame'):
+            socket_bytes = socket_bytes[10:]
+
+            while len(socket_bytes) < frame_length:
+                socket_bytes += sock.recv(8192)
+
+            dmd_data = socket_bytes[:frame_length]
+            socket_bytes = socket_bytes[frame_length + 1:]
+            frames += 1
+
+        while '\n' in socket_bytes and not socket_bytes.startswith(
+                'dmd_frame'):
+            message, socket_bytes = socket_bytes.split('\n', 1)
+            commands += 1
+
+    return commands
+
+
+def receive_buffer(sock, frame_length, num_frames):
+    receive_buffer = BCPReceiveBuffer(legacy_frame_length=frame_length)
+    frames = 0
+    commands = 0
+
+    while frames < num_frames:
+        receive_buffer.recv_into(sock)
+
+        for message_type, data in receive_buffer.get_messages():
+            if message_type == 'dmd_frame':
+                frames += 1
+            else:
+                commands += 1
+
+    return commands
+
+
+def send(sock, messages):
+    for message in messages:
+        sock.sendall(message)
+
+
+def run(receive, messages, frame_length, num_frames):
+    sender, receiver = socket.socketpair()
+    # the sender is a separate process so only the receiving side's CPU
+    # time is counted
+    process = Process(target=send, args=(sender, messages))
+    process.start()
+
+    start = time.clock()
+    receive(receiver, frame_length, num_frames)
+    cpu_secs = time.clock() - start
+
+    process.join()
+    sender.close()
+    receiver.close()
+
+    return cpu_secs
+
+
+def score_frames(width, height, num_frames):
+    # A static background with a 24x8 pixel score box that changes every
+    # other frame
+    background = bytearray(os.urandom(width * height * 3))
+    frames = list()
+
+    for i in xrange(num_frames):
+        frame = bytearray(background)
+
+        for row in range(height / 2, height / 2 + 8):
+            start = (row * width + width / 2) * 3
+            frame[start:start + 72] = chr(i / 2 % 256) * 72
+
+        frames.append(str(frame))
+
+    return frames
+
+
+def encode_frames(encoder, frames):
+    decoder = DMDFrameDecoder()
+    sent = 0
+
+    for frame in frames:
+        message = encoder.encode(frame)
+
+        if not message:
+            continue
+
+        sent += len(message)
+
+        if message.startswith('dmd_frame?'):
+            decoder.keyframe(message[10:])
+        elif ord(message[1]) == DMD_FRAME:
+            decoder.keyframe(message[6:])
+        else:
+            decoder.delta(message[6:])
+
+    return sent
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-W', '--width', type='int', default=128,
+                      help='DMD width in pixels (default 128)')
+    parser.add_option('-H', '--height', type='int', default=32,
+                      help='DMD height in pixels (default 32)')
+    parser.add_option('-f', '--frames', type='int', default=3000,
+                      help='number of frames to send (default 3000)')
+    options, _ = parser.parse_args()
+
+    frame_length = options.width * options.height * 3
+    frames = [os.urandom(frame_length) for _ in range(10)]
+
+    def messages(binary):
+        for i in xrange(options.frames):
+            frame = frames[i % len(frames)]
+
+            if binary:
+                yield encode_frame(DMD_FRAME, frame)
+            else:
+                yield 'dmd_frame?' + frame + '\n'
+
+            yield COMMANDS[i % len(COMMANDS)] + '\n'
+
+    print('{0} {1}x{2} color frames ({3} bytes each)'.format(
+          options.frames, options.width, options.height, frame_length))
+
+    results = dict()
+
+    for name, receive, binary in (('legacy', receive_legacy, False),
+                                  ('buffer', receive_buffer, False),
+                                  ('binary', receive_buffer, True)):
+        results[name] = run(receive, messages(binary), frame_length,
+                            options.frames)
+        us_per_frame = results[name] / options.frames * 1000000
+
+        print('{0:>8}: {1:8.1f} us/frame, {2:5.2f}% of a core at 60 fps'.format(
+              name, us_per_frame, us_per_frame * 60 / 10000))
+
+    print('Speedup: {0:.2f}x (buffer), {1:.2f}x (binary)'.format(
+          results['legacy'] / results['buffer'],
+          results['legacy'] / results['binary']))
+
+    frames = score_frames(options.width, options.height, options.frames)
+    full_bytes = options.frames * (frame_length + 11)
+
+    print('Score changing every other frame, {0} bytes unencoded'.format(
+          full_bytes))
+
+    for name, binary in (('legacy', False), ('delta', True)):
+        encoder = DMDFrameEncoder()
+        encoder.reset(binary=binary)
+
+        start = time.clock()
+        sent = encode_frames(encoder, frames)
+        us_per_frame = (time.clock() - start) / options.frames * 1000000
+
+        print('{0:>8}: {1:10} bytes ({2:5.1f}%), {3:6.1f} us/frame '
+              'encode+decode'.format(name, sent, sent * 100.0 / full_bytes,
+                                     us_per_frame))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -0,0 +1,129 @@
+"""Benchmarks the delay scheduler with many pending delays."""
+# bench_delays.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# Schedules a large number of pending delays spread across many
+# DelayManagers and reports how long adding them, running them tick by tick
+# and removing them takes. The clock is simulated so the results only
+# measure the scheduler itself.
+
+import os
+import sys
+import time
+import random
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+from mpf.system.tasks import DelayManager
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-d', '--delays', type='int', default=10000,
+                      help='number of pending delays (default 10000)')
+    parser.add_option('-m', '--managers', type='int', default=100,
+                      help='number of DelayManagers (default 100)')
+    parser.add_option('-t', '--ticks', type='int', default=300,
+                      help='number of ticks to run (default 300)')
+    parser.add_option('--hz', type='int', default=30,
+                      help='simulated tick rate (default 30)')
+    options, _ = parser.parse_args()
+
+    real_time = time.time
+    clock = FakeClock()
+    random.seed(1)
+
+    managers = [DelayManager() for _ in range(options.managers)]
+    fired = [0]
+
+    def callback():
+        fired[0] += 1
+
+    secs_per_tick = 1.0 / options.hz
+    max_ms = int(options.ticks * secs_per_tick * 1000)
+
+    time.time = clock
+    try:
+        start = real_time()
+        for i in range(options.delays):
+            managers[i % options.managers].add(random.randint(1, max_ms),
+                                               callback, 'delay' + str(i))
+        add_secs = real_time() - start
+
+        start = real_time()
+        for _ in range(options.ticks):
+            clock.now += secs_per_tick
+            DelayManager.timer_tick()
+        run_secs = real_time() - start
+
+        for i in range(options.delays):
+            managers[i % options.managers].add(max_ms, callback,
+                                               'delay' + str(i))
+
+        start = real_time()
+        for i in range(options.delays):
+            managers[i % options.managers].remove('delay' + str(i))
+        remove_secs = real_time() - start
+
+        # one more tick so the cancelled entries are drained
+        start = real_time()
+        clock.now += max_ms / 1000.0 + 1
+        DelayManager.timer_tick()
+        drain_secs = real_time() - start
+
+    finally:
+        time.time = real_time
+
+    print('Delays: {0} across {1} managers, {2} ticks at {3}Hz'.format(
+          options.delays, options.managers, options.ticks, options.hz))
+    print('Fired: {0}'.format(fired[0]))
+    print('Add:    {0:8.2f} us per delay'.format(
+          add_secs / options.delays * 1000000))
+    print('Tick:   {0:8.2f} us per tick'.format(
+          run_secs / options.ticks * 1000000))
+    print('Remove: {0:8.2f} us per delay'.format(
+          remove_secs / options.delays * 1000000))
+    print('Drain:  {0:8.2f} ms after removing all delays'.format(
+          drain_secs * 1000))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -0,0 +1,179 @@
+"""Benchmarks event posting through the EventManager."""
+# bench_events.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# Posts a large number of events across a few hundred registered handlers and
+# compares the compiled dispatch tables in the EventManager with the previous
+# dispatch path (uuid keys, a re-sort on each add_handler() and a list copy
+# plus kwargs merge for every handler call).
+
+import os
+import sys
+import time
+import uuid
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+from mpf.system.events import EventManager, QueuedEvent
+
+
+class LegacyEventManager(EventManager):
+    """EventManager with the dispatch path MPF used before the compiled
+    dispatch tables."""
+
+    def add_handler(self, event, handler, priority=1, **kwargs):
+        event = event.lower()
+
+        if not event in self.registered_handlers:
+            self.registered_handlers[event] = []
+
+        key = uuid.uuid4()
+
+        self.registered_handlers[event].append((handler, priority, kwargs, key))
+        if self.debug:
+            self.log.debug("Registered %s as a handler for '%s', priority: %s, "
+                           "kwargs: %s",
+                           (str(handler).split(' '))[2], event, priority, kwargs)
+
+        self.registered_handlers[event].sort(key=lambda x: x[1], reverse=True)
+
+        return key
+
+    def _process_event(self, event, ev_type, callback=None, **kwargs):
+        result = None
+        queue = None
+
+        for monitor in self.registered_monitors:
+            monitor(event=event, ev_type=ev_type, callback=callback,
+                    kwargs=kwargs)
+
+        if event in self.registered_handlers:
+
+            if ev_type == 'queue' and callback:
+                queue = QueuedEvent(callback, **kwargs)
+                kwargs['queue'] = queue
+
+            for handler in self.registered_handlers[event][:]:
+                merged_kwargs = dict(handler[2].items() + kwargs.items())
+
+                if self.debug and event != 'timer_tick':
+                    self.log.debug("%s (priority: %s) responding to event '%s'"
+                                   " with args %s",
+                                   (str(handler[0]).split(' '))[2], handler[1],
+                                   event, merged_kwargs)
+
+                result = handler[0](**merged_kwargs)
+
+                if ((ev_type == 'boolean' or ev_type == 'queue') and
+                        result is False):
+                    kwargs['ev_result'] = False
+                    break
+
+                elif ev_type == 'relay' and type(result) is dict:
+                    kwargs.update(result)
+
+        if queue and queue.is_empty():
+            queue = None
+            del kwargs['queue']
+
+        if callback and not queue:
+            if result:
+                kwargs['ev_result'] = result
+            self.callback_queue.append((callback, kwargs))
+
+
+class Target(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def handler(self, **kwargs):
+        self.count += 1
+
+
+def run(manager_class, options):
+    events = manager_class(None, setup_event_player=False)
+    events.debug = options.debug
+    target = Target()
+
+    event_names = ['event' + str(i) for i in range(options.events)]
+
+    start = time.time()
+    for i in range(options.handlers):
+        event = event_names[i % options.events]
+        if i % 2:
+            events.add_handler(event, target.handler, priority=i % 7,
+                               number=i)
+        else:
+            events.add_handler(event, target.handler, priority=i % 7)
+    add_secs = time.time() - start
+
+    start = time.time()
+    for i in range(options.posts):
+        events.post(event_names[i % options.events])
+    events.post('timer_tick')
+    post_secs = time.time() - start
+
+    return add_secs, post_secs, target.count
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-p', '--posts', type='int', default=100000,
+                      help='number of events to post (default 100000)')
+    parser.add_option('-n', '--handlers', type='int', default=500,
+                      help='number of handlers (default 500)')
+    parser.add_option('-e', '--events', type='int', default=100,
+                      help='number of event names (default 100)')
+    parser.add_option('-d', '--debug', action='store_true', default=False,
+                      help='run with the EventManager debug flag set')
+    options, _ = parser.parse_args()
+
+    print('{0} posts across {1} handlers on {2} events (debug: {3})'.format(
+          options.posts, options.handlers, options.events, options.debug))
+
+    results = dict()
+
+    for name, manager_class in (('legacy', LegacyEventManager),
+                                ('compiled', EventManager)):
+        add_secs, post_secs, calls = run(manager_class, options)
+        results[name] = post_secs
+        print('{0:>9}: add {1:7.2f} us/handler, post {2:7.2f} us/event, '
+              '{3} handler calls'.format(
+              name, add_secs / options.handlers * 1000000,
+              post_secs / options.posts * 1000000, calls))
+
+    print('Speedup: {0:.2f}x'.format(results['legacy'] / results['compiled']))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
@@ -0,0 +1,278 @@
+"""Benchmarks loading and advancing compiled shows."""
+# bench_shows.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# Loads every show of a machine (demo_man by default) three ways: parsing the
+# YAML and compiling it, reading the compiled show back from the show cache,
+# and resolving the device indexes of a compiled show. Then it plays every
+# step of every show through a stub light controller, comparing the compiled
+# step tuples with the step dicts and item type string checks Show.advance()
+# used before.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+from mpf.system.device_manager import DeviceCollection
+from mpf.system.file_manager import FileManager
+from mpf.system.show_compiler import ShowCache, ShowCompiler
+from mpf.system.utility_functions import Util
+
+
+class Device(object):
+
+    def __init__(self, name, config):
+        self.name = name
+        self.tags = Util.string_to_list((config or dict()).get('tags'))
+
+
+class Machine(object):
+    """Just enough of a MachineController to compile shows against the
+    devices in a machine's config files."""
+
+    def __init__(self, machine_path):
+        self.machine_path = machine_path
+        self.config = dict(mpf=dict(paths=dict(show_cache='')))
+
+        config = dict()
+        config_path = os.path.join(machine_path, 'config')
+
+        for file_name in sorted(os.listdir(config_path)):
+            if file_name.endswith('.yaml'):
+                config.update(FileManager.load(os.path.join(config_path,
+                                                            file_name)) or {})
+
+        for collection, section in (('lights', 'matrix_lights'),
+                                    ('leds', 'leds'),
+                                    ('coils', 'coils'),
+                                    ('gi', 'gis'),
+                                    ('flashers', 'flashers')):
+            devices = DeviceCollection(self, collection, section)
+
+            for name, device_config in (config.get(section) or {}).iteritems():
+                devices[name] = Device(name, device_config)
+
+            setattr(self, collection, devices)
+
+
+class LightController(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def _add_to_light_update_list(self, **kwargs):
+        self.count += 1
+
+    def _add_to_led_update_list(self, **kwargs):
+        self.count += 1
+
+    def _add_to_event_queue(self, event):
+        self.count += 1
+
+    def _add_to_coil_queue(self, **kwargs):
+        self.count += 1
+
+    def _add_to_gi_queue(self, **kwargs):
+        self.count += 1
+
+    def _add_to_flasher_queue(self, **kwargs):
+        self.count += 1
+
+
+def legacy_steps(steps):
+    # Converts compiled steps back to the step dicts Show used to hold
+    output = list()
+
+    for tocks, lights, leds, events, coils, gis, flashers in steps:
+        step = dict(tocks=tocks)
+
+        if lights:
+            step['lights'] = dict(lights)
+        if leds:
+            step['leds'] = dict((led, list(color) + [fade])
+                                for led, color, fade in leds)
+        if events:
+            step['events'] = list(events)
+        if coils:
+            step['coils'] = dict(coils)
+        if gis:
+            step['gis'] = dict(gis)
+        if flashers:
+            step['flashers'] = set(flashers)
+
+        output.append(step)
+
+    return output
+
+
+def advance_legacy(controller, step):
+    for item_type, item_dict in step.iteritems():
+        if item_type == 'lights':
+            for light_obj, brightness in item_dict.iteritems():
+                controller._add_to_light_update_list(
+                    light=light_obj, brightness=brightness, priority=0,
+                    blend=False, source=None)
+        elif item_type == 'leds':
+            current_time = time.time()
+            for led_obj, led_dict in item_dict.iteritems():
+                controller._add_to_led_update_list(
+                    led=led_obj, color=[led_dict[0], led_dict[1], led_dict[2]],
+                    fade_ms=led_dict[3], priority=0, blend=False, source=None)
+        elif item_type == 'events':
+            for event in item_dict:
+                controller._add_to_event_queue(event)
+        elif item_type == 'coils':
+            for coil_obj, coil_action in item_dict.iteritems():
+                controller._add_to_coil_queue(coil=coil_obj,
+                                              action=coil_action)
+        elif item_type == 'gis':
+            for gi, value in item_dict.iteritems():
+                controller._add_to_gi_queue(gi=gi, value=value)
+        elif item_type == 'flashers':
+            for flasher in item_dict:
+                controller._add_to_flasher_queue(flasher=flasher)
+
+
+def advance_compiled(controller, step):
+    _, lights, leds, events, coils, gis, flashers = step
+
+    for light_obj, brightness in lights:
+        controller._add_to_light_update_list(
+            light=light_obj, brightness=brightness, priority=0, blend=False,
+            source=None)
+
+    if leds:
+        current_time = time.time()
+
+    for led_obj, color, fade_tocks in leds:
+        controller._add_to_led_update_list(
+            led=led_obj, color=color, fade_ms=fade_tocks, priority=0,
+            blend=False, source=None)
+
+    for event in events:
+        controller._add_to_event_queue(event)
+
+    for coil_obj, coil_action in coils:
+        controller._add_to_coil_queue(coil=coil_obj, action=coil_action)
+
+    for gi, value in gis:
+        controller._add_to_gi_queue(gi=gi, value=value)
+
+    for flasher in flashers:
+        controller._add_to_flasher_queue(flasher=flasher)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-m', '--machine', default='demo_man',
+                      help='machine folder in machine_files (default demo_man)')
+    parser.add_option('-l', '--loads', type='int', default=20,
+                      help='number of times to load every show (default 20)')
+    parser.add_option('-a', '--advances', type='int', default=1000,
+                      help='number of times to play every show (default 1000)')
+    options, _ = parser.parse_args()
+
+    FileManager.init()
+
+    machine_path = os.path.join(os.path.dirname(__file__), os.pardir,
+                                'machine_files', options.machine)
+    show_path = os.path.join(machine_path, 'shows')
+    show_files = [os.path.join(show_path, x) for x in
+                  sorted(os.listdir(show_path)) if x.endswith('.yaml')]
+
+    machine = Machine(machine_path)
+    compiler = ShowCompiler(machine)
+    cache = ShowCache(machine)
+    cache.path = tempfile.mkdtemp()
+
+    try:
+        print('{0} shows from {1}'.format(len(show_files), options.machine))
+
+        start = time.time()
+        for _ in range(options.loads):
+            for show_file in show_files:
+                compiled = compiler.compile(FileManager.load(show_file))
+        parse_secs = time.time() - start
+
+        for show_file in show_files:
+            cache.save(show_file, compiler.compile(
+                FileManager.load(show_file)))
+
+        start = time.time()
+        for _ in range(options.loads):
+            shows = [cache.load(show_file) for show_file in show_files]
+        cache_secs = time.time() - start
+
+        start = time.time()
+        for _ in range(options.loads):
+            steps = [compiler.resolve(show) for show in shows]
+        resolve_secs = time.time() - start
+
+    finally:
+        shutil.rmtree(cache.path)
+
+    loads = options.loads * len(show_files)
+
+    print('     parse: {0:8.1f} us/show (YAML + compile)'.format(
+          parse_secs / loads * 1000000))
+    print('     cache: {0:8.1f} us/show ({1:.1f}x faster)'.format(
+          cache_secs / loads * 1000000, parse_secs / cache_secs))
+    print('   resolve: {0:8.1f} us/show'.format(
+          resolve_secs / loads * 1000000))
+
+    steps = [step for show in steps for step in show]
+    results = dict()
+
+    for name, advance, show_steps in (
+            ('legacy', advance_legacy, legacy_steps(steps)),
+            ('compiled', advance_compiled, steps)):
+        controller = LightController()
+
+        start = time.time()
+        for _ in range(options.advances):
+            for step in show_steps:
+                advance(controller, step)
+        results[name] = time.time() - start
+
+        print('{0:>10}: {1:8.2f} us/step, {2} updates'.format(
+              name, results[name] / (options.advances * len(show_steps)) *
+              1000000, controller.count))
+
+    print('Speedup: {0:.2f}x'.format(results['legacy'] / results['compiled']))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
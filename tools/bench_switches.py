@@ -0,0 +1,145 @@
+"""Benchmarks switch processing by hardware number."""
+# bench_switches.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+# Builds a virtual machine with a configurable number of switches and measures
+# the throughput of SwitchController.process_switch() when switches are
+# reported by number (like the P-ROC, P3-ROC and FAST platforms do), comparing
+# the per-platform number index with the previous linear scan over all the
+# switches, and with process_switch_batch() which the platforms use for the
+# switch changes they receive in a tick.
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+mpf_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, mpf_path)
+
+from mpf.system.machine import MachineController
+
+
+def create_machine(num_switches):
+    machine_path = tempfile.mkdtemp()
+    config_file = os.path.join(machine_path, 'bench.yaml')
+
+    with open(config_file, 'w') as f:
+        f.write('#config_version=3\n\nswitches:\n')
+        for i in range(num_switches):
+            f.write('    s_bench{0}:\n        number: {0}\n'.format(i))
+
+    options = {
+        'physical_hw': False,
+        'mpfconfigfile': os.path.join(mpf_path, 'mpf', 'mpfconfig.yaml'),
+        'machinepath': machine_path,
+        'configfile': [config_file],
+        'debug': False
+        }
+
+    try:
+        machine = MachineController(options)
+    finally:
+        shutil.rmtree(machine_path)
+
+    machine.default_platform.timer_initialize()
+    machine.events.post('init_phase_1')
+    machine.events.post('init_phase_2')
+
+    return machine
+
+
+def legacy_process_switch(machine, state, num):
+    # The lookup process_switch() used before the switch number index
+    for switch in machine.switches:
+        if switch.number == num:
+            machine.switch_controller.process_switch(state=state, obj=switch)
+            return
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-s', '--switches', type='int', default=150,
+                      help='number of switches (default 150)')
+    parser.add_option('-n', '--events', type='int', default=100000,
+                      help='number of switch changes (default 100000)')
+    options, _ = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    machine = create_machine(options.switches)
+    platform = machine.default_platform
+    process_switch = machine.switch_controller.process_switch
+
+    # report the switches with the highest numbers since those are found last
+    # by the linear scan
+    numbers = [str(options.switches - 1 - (i % 10)) for i in range(20)]
+
+    print('{0} switch changes on a machine with {1} switches'.format(
+          options.events, options.switches))
+
+    results = dict()
+
+    batch = [(numbers[i], (i // 10) % 2 ^ 1, True, None) for i in range(20)]
+
+    for name in ('legacy', 'indexed', 'batched'):
+        start = time.time()
+
+        if name == 'batched':
+            for _ in range(options.events // 20):
+                machine.switch_controller.process_switch_batch(
+                    batch, platform=platform)
+
+        for i in range(options.events if name != 'batched' else 0):
+            num = numbers[i % 20]
+            state = (i // 10) % 2 ^ 1
+
+            if name == 'legacy':
+                legacy_process_switch(machine, state, num)
+            else:
+                process_switch(state=state, num=num, platform=platform)
+
+        secs = time.time() - start
+        results[name] = secs
+
+        print('{0:>8}: {1:7.2f} us per switch change, {2:9.0f} changes/sec'
+              .format(name, secs / options.events * 1000000,
+                      options.events / secs))
+
+    print('Speedup: {0:.2f}x indexed, {1:.2f}x batched'.format(
+          results['legacy'] / results['indexed'],
+          results['legacy'] / results['batched']))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.